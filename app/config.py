@@ -6,6 +6,123 @@ load_dotenv()
 class Config:
     GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+
+    # GitHub HTTP client
+    GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+    GITHUB_POOL_SIZE = int(os.getenv('GITHUB_POOL_SIZE', '20'))
+    GITHUB_TIMEOUT = float(os.getenv('GITHUB_TIMEOUT', '15'))
+    GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', '3'))
+    GITHUB_BACKOFF_FACTOR = float(os.getenv('GITHUB_BACKOFF_FACTOR', '0.5'))
+
+    # GitHub response cache (ETag / conditional requests)
+    GITHUB_CACHE_ENABLED = os.getenv('GITHUB_CACHE_ENABLED', '1') == '1'
+    GITHUB_CACHE_MAX_BYTES = int(os.getenv('GITHUB_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    GITHUB_CACHE_DIR = os.getenv('GITHUB_CACHE_DIR', '')
+    GITHUB_CACHE_IMMUTABLE_TTL = float(os.getenv('GITHUB_CACHE_IMMUTABLE_TTL', '86400'))
+    # Seconds a response is served without revalidation, per endpoint
+    GITHUB_CACHE_TTLS = {
+        'repo': float(os.getenv('GITHUB_CACHE_TTL_REPO', '300')),
+        'contents': float(os.getenv('GITHUB_CACHE_TTL_CONTENTS', '60')),
+        'tree': float(os.getenv('GITHUB_CACHE_TTL_TREE', '60')),
+        'commits': float(os.getenv('GITHUB_CACHE_TTL_COMMITS', '30')),
+        'default': float(os.getenv('GITHUB_CACHE_TTL_DEFAULT', '0')),
+    }
+
+    # Repository backend: 'api' reads every file through the GitHub API,
+    # 'snapshot' downloads one archive per commit and reads files locally,
+    # 'mirror' keeps a bare git mirror on disk and fetches incrementally.
+    # REPO_BACKENDS overrides it per repository, e.g. "octo/big=snapshot,octo/*=api"
+    REPO_BACKEND = os.getenv('REPO_BACKEND', 'api')
+    REPO_BACKENDS = dict(
+        (key.strip(), value.strip())
+        for key, _, value in (item.partition('=') for item in os.getenv('REPO_BACKENDS', '').split(','))
+        if key.strip() and value.strip()
+    )
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join('~', '.cache', 'gitsage', 'snapshots'))
+    # Least recently used snapshots are deleted beyond this many bytes; 0 keeps them all
+    SNAPSHOT_MAX_BYTES = int(os.getenv('SNAPSHOT_MAX_BYTES', str(5 * 1024 ** 3)))
+
+    # Local bare mirrors for REPO_BACKEND / REPO_BACKENDS value 'mirror'
+    GIT_MIRROR_DIR = os.getenv('GIT_MIRROR_DIR', os.path.join('~', '.cache', 'gitsage', 'mirrors'))
+    GIT_MIRROR_URL = os.getenv('GIT_MIRROR_URL', 'https://github.com/{owner}/{repo}.git')
+    GIT_MIRROR_REFRESH_INTERVAL = float(os.getenv('GIT_MIRROR_REFRESH_INTERVAL', '300'))
+
+    # Raw file streaming (/raw); bytes read from the backend per chunk
+    RAW_FILE_CHUNK_BYTES = int(os.getenv('RAW_FILE_CHUNK_BYTES', str(64 * 1024)))
+    # Binary detection: leading bytes sniffed, and blob SHAs whose result is kept
+    FILE_SNIFF_BYTES = int(os.getenv('FILE_SNIFF_BYTES', '4096'))
+    # Smaller files are read whole and classified from their bytes instead of sniffed first
+    FILE_SNIFF_MIN_SIZE = int(os.getenv('FILE_SNIFF_MIN_SIZE', str(64 * 1024)))
+    FILE_CLASS_CACHE_SIZE = int(os.getenv('FILE_CLASS_CACHE_SIZE', '100000'))
+
+    # Repository analysis
+    ANALYSIS_FETCH_CONCURRENCY = int(os.getenv('ANALYSIS_FETCH_CONCURRENCY', '16'))
+    ANALYSIS_FILE_TIMEOUT = float(os.getenv('ANALYSIS_FILE_TIMEOUT', '20'))
+    ANALYSIS_TIMEOUT = float(os.getenv('ANALYSIS_TIMEOUT', '240'))
+    # Worker processes for code metrics (0 = one per CPU core)
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '0'))
+    # Per-blob analysis results; set ANALYSIS_CACHE_PATH to a SQLite file to persist them
+    ANALYSIS_CACHE_MAX_BYTES = int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    ANALYSIS_CACHE_PATH = os.getenv('ANALYSIS_CACHE_PATH', '')
+    # Background analysis jobs (/analyze/jobs): concurrent jobs, time limit per job and
+    # finished jobs kept in memory. Results are saved per commit under ANALYSIS_RESULTS_DIR
+    # ('' keeps them in memory only)
+    ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', '2'))
+    ANALYSIS_JOB_TIMEOUT = float(os.getenv('ANALYSIS_JOB_TIMEOUT', '3600'))
+    ANALYSIS_JOB_HISTORY = int(os.getenv('ANALYSIS_JOB_HISTORY', '100'))
+    ANALYSIS_RESULTS_DIR = os.getenv('ANALYSIS_RESULTS_DIR', os.path.join('~', '.cache', 'gitsage', 'analysis'))
+
+    # Repository context used by /context and /chat
+    REPO_CONTEXT_TTL = float(os.getenv('REPO_CONTEXT_TTL', '300'))
+    REPO_CONTEXT_CACHE_SIZE = int(os.getenv('REPO_CONTEXT_CACHE_SIZE', '64'))
+    # Compact tree indexes served by the paged /tree API and used for repository summaries
+    TREE_INDEX_CACHE_SIZE = int(os.getenv('TREE_INDEX_CACHE_SIZE', '32'))
+    # Entries of the tree embedded in the repository page, across all expanded levels
+    INITIAL_TREE_MAX_ENTRIES = int(os.getenv('INITIAL_TREE_MAX_ENTRIES', '300'))
+
+    # Prefetch when a repository page is opened: seconds the page waits for the tree
+    # before rendering without it, minimum seconds between prefetches of one repository,
+    # parallel key-file reads, how many key files and the largest key file read ahead
+    PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', '1') == '1'
+    PREFETCH_TREE_WAIT = float(os.getenv('PREFETCH_TREE_WAIT', '2'))
+    PREFETCH_MIN_INTERVAL = float(os.getenv('PREFETCH_MIN_INTERVAL', '60'))
+    PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '8'))
+    PREFETCH_MAX_FILES = int(os.getenv('PREFETCH_MAX_FILES', '10'))
+    PREFETCH_MAX_FILE_BYTES = int(os.getenv('PREFETCH_MAX_FILE_BYTES', str(1024 * 1024)))
+    # Repositories kept warm in the background, e.g. "octo/app,octo/lib"
+    WARM_REPOS = [name.strip() for name in os.getenv('WARM_REPOS', '').split(',') if '/' in name]
+    WARM_REPOS_INTERVAL = float(os.getenv('WARM_REPOS_INTERVAL', '600'))
+
+    # LLM client and scheduler; set GROQ_BASE_URL to point at another (e.g. local) endpoint
+    GROQ_BASE_URL = os.getenv('GROQ_BASE_URL', '')
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '30'))
+    LLM_TOKENS_PER_MINUTE = float(os.getenv('LLM_TOKENS_PER_MINUTE', '12000'))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+    LLM_BACKOFF_FACTOR = float(os.getenv('LLM_BACKOFF_FACTOR', '1.0'))
+    # Input token budget per prompt; repository context keeps at least LLM_REPO_CONTEXT_MIN_TOKENS of it
+    LLM_PROMPT_TOKEN_BUDGET = int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', '6000'))
+    LLM_REPO_CONTEXT_MIN_TOKENS = int(os.getenv('LLM_REPO_CONTEXT_MIN_TOKENS', '1000'))
+    LLM_RETRIEVAL_MIN_TOKENS = int(os.getenv('LLM_RETRIEVAL_MIN_TOKENS', '1500'))
+
+    # LLM response cache; only requests at or below LLM_CACHE_MAX_TEMPERATURE are cached
+    LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+    LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '86400'))
+    LLM_CACHE_MAX_TEMPERATURE = float(os.getenv('LLM_CACHE_MAX_TEMPERATURE', '0.3'))
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '')
+
+    # Retrieval index over repository chunks used to pick relevant code for chat
+    RETRIEVAL_ENABLED = os.getenv('RETRIEVAL_ENABLED', '1') == '1'
+    RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '8'))
+    RETRIEVAL_MAX_FILES = int(os.getenv('RETRIEVAL_MAX_FILES', '5000'))
+    # The api backend spends one contents request per file against a 5000/hour
+    # token budget, so its indexes cover far fewer files than snapshot/mirror ones
+    RETRIEVAL_API_MAX_FILES = int(os.getenv('RETRIEVAL_API_MAX_FILES', '300'))
+    RETRIEVAL_MAX_FILE_BYTES = int(os.getenv('RETRIEVAL_MAX_FILE_BYTES', str(256 * 1024)))
+    RETRIEVAL_INDEX_CACHE_SIZE = int(os.getenv('RETRIEVAL_INDEX_CACHE_SIZE', '4'))
+    # Repositories whose newest index is kept to answer queries while a new commit builds
+    RETRIEVAL_LATEST_CACHE_SIZE = int(os.getenv('RETRIEVAL_LATEST_CACHE_SIZE', '16'))
+    RETRIEVAL_CHUNK_CACHE_BYTES = int(os.getenv('RETRIEVAL_CHUNK_CACHE_BYTES', str(128 * 1024 * 1024)))
     
     if not GITHUB_TOKEN:
         raise ValueError("GitHub token not found! Please set GITHUB_TOKEN environment variable.")
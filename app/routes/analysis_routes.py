@@ -2,9 +2,14 @@ from fastapi import APIRouter, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-import requests
-from app.config import Config
-from typing import Callable
+from app.services.github_client import get_async_client, get_response_cache
+from app.services.github_service import get_analysis_cache
+from app.services.repo_context_service import context_cache
+from app.services.singleflight import flights
+from app.services.ai_service import chat_metrics, scheduler, response_cache
+from app.services.retrieval_service import retrieval_store
+from app.services.analysis_jobs import analysis_jobs
+from app.services.prefetch_service import prefetcher
 
 router = APIRouter()
 templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
@@ -22,12 +27,27 @@ async def index(request: Request):
 
 @router.get("/repo/{owner}/{repo}")
 async def repo_overview(request: Request, owner: str, repo: str):
-    headers = {'Authorization': f'token {Config.GITHUB_TOKEN}'}
-    repo_url = f'https://api.github.com/repos/{owner}/{repo}'
-    
-    repo_info = requests.get(repo_url, headers=headers).json()
+    response = await get_async_client().get(f'/repos/{owner}/{repo}')
+    repo_info = response.json()
     return templates.TemplateResponse("dashboard.html", {"request": request, "repo": repo_info})
 
 @router.get("/api/files/{owner}/{repo}")
 async def get_files(owner: str, repo: str):
-    return {"files": []}
\ No newline at end of file
+    return {"files": []}
+
+@router.get("/api/stats")
+async def get_stats():
+    """Runtime cache and client statistics"""
+    cache = get_response_cache()
+    return {
+        "github_cache": cache.stats() if cache else None,
+        "analysis_cache": get_analysis_cache().stats(),
+        "repo_context_cache": context_cache.stats(),
+        "singleflight": flights.stats(),
+        "chat": chat_metrics.stats(),
+        "llm_scheduler": scheduler.stats(),
+        "llm_cache": response_cache.stats(),
+        "retrieval": retrieval_store.stats(),
+        "analysis_jobs": analysis_jobs.stats(),
+        "prefetch": prefetcher.stats()
+    }
@@ -1,17 +1,33 @@
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+import asyncio
+import json
+import mimetypes
+import re
+import time
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Literal, Tuple
 from pydantic import BaseModel
 
 from ..services.github_service import (
     get_repo_info, get_repo_contents, read_file_content,
-    get_directory_tree, analyze_complexity,
-    get_dependencies, get_commit_history
+    get_directory_tree, get_tree_index, get_commit_history, iter_commit_history,
+    classify_file, describe_binary_file, iter_file_bytes, get_file_outline,
+    FileStreamError
 )
-from ..services.ai_service import get_code_explanation, chat_with_repo
-from ..services.repo_context_service import extract_repo_summary, format_repo_context_for_prompt
+from ..services.ai_service import (
+    get_code_explanation, chat_with_repo, stream_chat_with_repo,
+    ChatResponse, chat_metrics
+)
+from ..services.repo_context_service import get_cached_repo_context
+from ..services.analysis_jobs import analysis_jobs, DONE, FINISHED
+from ..services.prefetch_service import prefetcher
+from ..config import Config
+from ..services.retrieval_service import retrieve_chunks
+from ..services.tree_index import MAX_DEPTH, MAX_PAGE_SIZE
+from ..services.symbol_outline import format_outline, outline_language
 
 router = APIRouter(prefix="/repo")
 templates = Jinja2Templates(directory=str(Path(__file__).parent.parent / "templates"))
@@ -21,10 +37,13 @@ class ChatRequest(BaseModel):
     context: Dict[str, str] = {}
     repo_owner: Optional[str] = None
     repo_name: Optional[str] = None
+    # Response cache control: "refresh" regenerates and stores, "bypass" skips the cache
+    cache: Literal["use", "refresh", "bypass"] = "use"
 
 class CodeExplanationRequest(BaseModel):
     code: str
     path: str
+    cache: Literal["use", "refresh", "bypass"] = "use"
 
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request):
@@ -38,7 +57,10 @@ async def index(request: Request):
 
 @router.get("/{owner}/{repo}")
 async def get_repository(request: Request, owner: str, repo: str):
-    repo_info = get_repo_info(owner, repo)
+    # Warm the context, README and key files while the page loads
+    if Config.PREFETCH_ENABLED:
+        prefetcher.schedule(owner, repo)
+    repo_info, initial_tree = await asyncio.gather(get_repo_info(owner, repo), _initial_tree(owner, repo))
     if isinstance(repo_info, tuple):
         raise HTTPException(status_code=repo_info[1], detail=repo_info[0])
     return templates.TemplateResponse(
@@ -46,13 +68,39 @@ async def get_repository(request: Request, owner: str, repo: str):
         {
             "request": request,
             "repo": repo_info,
+            "initial_tree": initial_tree,
             "static": lambda path: f"/static/{path}"
         }
     )
 
+async def _initial_tree(owner: str, repo: str) -> Optional[Dict[str, Any]]:
+    """
+    The root directory with its top-level directories expanded, embedded in
+    the page so the tree needs no request of its own. If the tree takes
+    longer than PREFETCH_TREE_WAIT the page renders without it and the
+    browser fetches it, from the cache the still-running fetch fills.
+    """
+    if not Config.PREFETCH_ENABLED:
+        return None
+    tree_task = asyncio.ensure_future(get_tree_index(owner, repo))
+    try:
+        tree_data, index = await asyncio.wait_for(asyncio.shield(tree_task), Config.PREFETCH_TREE_WAIT)
+        return {"ref": tree_data['ref'], "sha": tree_data['sha'], **index.list('', 2, None, 200, Config.INITIAL_TREE_MAX_ENTRIES)}
+    except asyncio.TimeoutError:
+        return None
+    except Exception as e:
+        print(f"Error embedding tree for {owner}/{repo}: {e}")
+        return None
+
 @router.get("/{owner}/{repo}/contents/{file_path:path}")
 async def get_file_content(owner: str, repo: str, file_path: str):
-    content = read_file_content(owner, repo, file_path)
+    # Binary files are recognised from tree metadata, or for large files a
+    # sniff of their first bytes, so only their metadata is transferred;
+    # small files are read once and classified from their bytes
+    binary_info = await describe_binary_file(owner, repo, file_path)
+    if binary_info is not None:
+        return binary_info
+    content = await read_file_content(owner, repo, file_path)
     
     if content is None:
         raise HTTPException(status_code=404, detail="File not found or unable to read")
@@ -68,7 +116,7 @@ async def get_file_content(owner: str, repo: str, file_path: str):
 @router.get("/{owner}/{repo}/binary/{file_path:path}")
 async def get_binary_file(owner: str, repo: str, file_path: str):
     """Proxy binary file content from GitHub"""
-    content_info = read_file_content(owner, repo, file_path)
+    content_info = await read_file_content(owner, repo, file_path)
     
     if content_info is None or not isinstance(content_info, dict):
         raise HTTPException(status_code=404, detail="File not found")
@@ -81,33 +129,212 @@ async def get_binary_file(owner: str, repo: str, file_path: str):
     from fastapi.responses import RedirectResponse
     return RedirectResponse(url=content_info['download_url'])
 
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) with end exclusive for a single-range Range header, or None
+    to serve the whole file. Raises ValueError for unsatisfiable ranges.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        # No range, or several ranges: serve the whole file
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    if start >= size or end <= start:
+        raise ValueError(header)
+    return start, end
+
+async def _prepend(first: bytes, rest):
+    if first:
+        yield first
+    if rest is not None:
+        async for chunk in rest:
+            yield chunk
+
+@router.get("/{owner}/{repo}/raw/{file_path:path}")
+async def get_raw_file(request: Request, owner: str, repo: str, file_path: str, ref: Optional[str] = None):
+    """
+    Stream a file's bytes without buffering it. Honours a single byte range
+    (Range: bytes=start-end), which the file viewer uses to page through
+    large files. The first chunk is read before any headers are sent, so a
+    backend failure is a 502 rather than a body shorter than Content-Length.
+    """
+    info = await classify_file(owner, repo, file_path, ref)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    size = info['size']
+    try:
+        byte_range = _parse_range(request.headers.get('range'), size)
+    except ValueError:
+        return Response(status_code=416, headers={'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Length': str(end - start),
+        'X-File-Size': str(size),
+        'X-File-Binary': '1' if info['is_binary'] else '0',
+        'X-File-Type': info['type']
+    }
+    if info['sha']:
+        headers['ETag'] = f'"{info["sha"]}"'
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    chunks = iter_file_bytes(owner, repo, file_path, ref, start, end, info['sha']) if end > start else None
+    try:
+        first = await anext(chunks, b'') if chunks is not None else b''
+    except FileStreamError as e:
+        print(f"Error streaming {owner}/{repo}/{file_path}: {e}")
+        raise HTTPException(status_code=502, detail="Could not read the file from the repository backend")
+    if chunks is not None and not first:
+        raise HTTPException(status_code=502, detail="Could not read the file from the repository backend")
+    return StreamingResponse(
+        _prepend(first, chunks),
+        status_code=206 if byte_range else 200,
+        media_type=mimetypes.guess_type(file_path)[0] or 'application/octet-stream',
+        headers=headers
+    )
+
+@router.get("/{owner}/{repo}/outline/{file_path:path}")
+async def get_outline(owner: str, repo: str, file_path: str, ref: Optional[str] = None):
+    """Classes, functions and methods defined in a source file, with their line numbers"""
+    if outline_language(file_path) is None:
+        raise HTTPException(status_code=415, detail="Outlines are available for Python, JavaScript/TypeScript, Go and Java files")
+    outline = await get_file_outline(owner, repo, file_path, ref)
+    if outline is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return outline
+
 @router.get("/{owner}/{repo}/contents/{path:path}")
 async def list_contents(owner: str, repo: str, path: str = ""):
-    return get_repo_contents(owner, repo, path)
+    return await get_repo_contents(owner, repo, path)
 
 @router.get("/{owner}/{repo}/tree")
-async def get_tree(owner: str, repo: str):
-    return get_directory_tree(owner, repo)
+async def get_tree(
+    owner: str,
+    repo: str,
+    ref: Optional[str] = None,
+    path: Optional[str] = None,
+    depth: Optional[int] = Query(None, ge=1, le=MAX_DEPTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE)
+):
+    """
+    Without path, depth or cursor this returns the complete nested tree.
+    Otherwise it returns one page of the children of `path` (the root by
+    default), expanded `depth` levels deep with at most `limit` entries in
+    total; pass `next_cursor` back as `cursor` for the following page.
+    """
+    if path is None and depth is None and cursor is None:
+        return await get_directory_tree(owner, repo, ref)
 
-@router.get("/{owner}/{repo}/analyze")
-async def analyze_repository(owner: str, repo: str):
-    complexity = analyze_complexity(owner, repo)
-    dependencies = get_dependencies(owner, repo)
+    tree_data, index = await get_tree_index(owner, repo, ref)
+    path = (path or '').strip('/')
+    try:
+        listing = index.list(path, depth or 1, cursor, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Directory not found: {path}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "complexity": complexity,
-        "dependencies": dependencies
+        "ref": tree_data['ref'],
+        "sha": tree_data['sha'],
+        "truncated": tree_data['truncated'],
+        **listing
     }
 
+@router.get("/{owner}/{repo}/analyze")
+async def analyze_repository(owner: str, repo: str, ref: Optional[str] = None):
+    """
+    Analyze and wait for the result. This runs as a background job, so a
+    dropped connection does not lose the work and repeated calls for the
+    same commit share it; use /analyze/jobs to poll instead of waiting.
+    """
+    job = await analysis_jobs.submit(owner, repo, ref)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Repository or ref not found")
+    await analysis_jobs.wait(job)
+    if job.status != DONE:
+        raise HTTPException(status_code=500, detail=job.error or f"Analysis {job.status}")
+    return job.result
+
+@router.post("/{owner}/{repo}/analyze/jobs")
+async def create_analysis_job(owner: str, repo: str, ref: Optional[str] = None):
+    """Start analysing a ref in the background, or return the job already doing it"""
+    job = await analysis_jobs.submit(owner, repo, ref)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Repository or ref not found")
+    return JSONResponse(job.to_dict(include_result=False), status_code=200 if job.status in FINISHED else 202)
+
+def _get_job(owner: str, repo: str, job_id: str):
+    job = analysis_jobs.get(job_id)
+    if job is None or (job.owner, job.repo) != (owner, repo):
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
+
+@router.get("/{owner}/{repo}/analyze/jobs/{job_id}")
+async def get_analysis_job(owner: str, repo: str, job_id: str):
+    """Status, progress and the results so far (all of them once the job is done)"""
+    return _get_job(owner, repo, job_id).to_dict()
+
+@router.delete("/{owner}/{repo}/analyze/jobs/{job_id}")
+async def cancel_analysis_job(owner: str, repo: str, job_id: str):
+    job = _get_job(owner, repo, job_id)
+    if not analysis_jobs.cancel(job):
+        raise HTTPException(status_code=409, detail=f"Analysis job already {job.status}")
+    # Cancellation takes effect at the job's next await
+    await analysis_jobs.wait(job)
+    return job.to_dict(include_result=False)
+
 @router.get("/{owner}/{repo}/history")
-async def get_history(owner: str, repo: str):
-    return get_commit_history(owner, repo)
+async def get_history(
+    owner: str,
+    repo: str,
+    ref: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    path: Optional[str] = None,
+    author: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    stream: bool = False
+):
+    """
+    Commit history, newest first. With stream=true the commits are sent as
+    NDJSON (one JSON object per line) while later pages are still being
+    fetched, and the full history is streamed unless `limit` is given;
+    otherwise a JSON list of up to `limit` (default 100) commits is returned.
+    """
+    filters = {"ref": ref, "since": since, "until": until, "path": path, "author": author}
+    if not stream:
+        return await get_commit_history(owner, repo, limit=limit or 100, **filters)
+
+    async def lines():
+        history = iter_commit_history(owner, repo, **filters)
+        sent = 0
+        try:
+            async for commit in history:
+                yield json.dumps(commit) + "\n"
+                sent += 1
+                if limit is not None and sent >= limit:
+                    break
+        finally:
+            await history.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.get("/{owner}/{repo}/context")
 async def get_repo_context(owner: str, repo: str):
     """Get preloaded repository context for chat"""
     try:
-        repo_summary = extract_repo_summary(owner, repo)
-        repo_context = format_repo_context_for_prompt(repo_summary)
+        cached = await get_cached_repo_context(owner, repo)
+        repo_summary = cached["summary"]
+        repo_context = cached["context"]
         
         return {
             "context": repo_context,
@@ -122,7 +349,7 @@ async def get_repo_context(owner: str, repo: str):
 
 @router.post("/explain")
 async def explain_code_route(request: CodeExplanationRequest):
-    explanation = get_code_explanation(request.code, request.path)
+    explanation = await get_code_explanation(request.code, request.path, cache=request.cache)
     return {"text": explanation}
 
 @router.get("/debug", response_class=HTMLResponse)
@@ -136,51 +363,60 @@ async def debug_page(request: Request):
         }
     )
 
+async def _prepare_chat(request: ChatRequest) -> Dict[str, Any]:
+    """Collect the chat_with_repo arguments for a request, loading repo context"""
+    # Large files are fitted into the prompt's token budget by ai_service
+    if request.context.get('content'):
+        content_length = len(request.context['content'])
+        if content_length > 10000:
+            print(f"Large file detected: {request.context.get('path', 'unknown file')} ({content_length} chars)")
+    
+    repo_context = ""
+    retrieved_chunks = []
+    outline = ""
+    file_path = request.context.get('path', '')
+    
+    if request.repo_owner and request.repo_name:
+        # Use the repo_context_service to get comprehensive repository context
+        try:
+            cached = await get_cached_repo_context(request.repo_owner, request.repo_name)
+            repo_context = cached["context"]
+            print(f"Repository context generated for {request.repo_owner}/{request.repo_name}")
+            # Code relevant to the question, from the commit's retrieval index
+            retrieved_chunks = retrieve_chunks(request.repo_owner, request.repo_name, cached["sha"], request.query)
+        except Exception as e:
+            print(f"Error getting repository context: {str(e)}")
+        # Structure of the open file, kept in the prompt when the file itself is cut down
+        if file_path and outline_language(file_path):
+            try:
+                file_outline = await get_file_outline(request.repo_owner, request.repo_name, file_path)
+                if file_outline:
+                    outline = format_outline(file_outline['symbols'])
+            except Exception as e:
+                print(f"Error getting outline for {file_path}: {str(e)}")
+    
+    return {
+        "query": request.query,
+        "code_context": request.context.get('content', ''),
+        "file_path": file_path,
+        "repo_owner": request.repo_owner,
+        "repo_name": request.repo_name,
+        "repo_context": repo_context,
+        "cache": request.cache,
+        "retrieved_chunks": retrieved_chunks,
+        "outline": outline
+    }
+
+def _sse_event(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 @router.post("/chat")
 async def chat(request: ChatRequest):
     try:
         print(f"Chat request received: query='{request.query}', repo={request.repo_owner}/{request.repo_name}")
         
-        # Always check file content size
-        if 'content' in request.context and request.context['content']:
-            file_path = request.context.get('path', 'unknown file')
-            content_length = len(request.context['content'])
-            
-            # For all files over 10KB, add file size info
-            if content_length > 10000:
-                print(f"Large file detected: {file_path} ({content_length} chars)")
-                
-            # For very large files, automatically truncate
-            if content_length > 50000:
-                print(f"Warning: Very large file content ({content_length} chars) for {file_path}")
-                from ..services.ai_service import truncate_large_text
-                request.context['content'] = truncate_large_text(
-                    request.context['content'], 
-                    request.context.get('path', '')
-                )
-        
-        # Get repo tree and README summary if repo info is provided
-        repo_tree = None
-        readme_summary = ""
-        repo_context = ""
-        
-        if request.repo_owner and request.repo_name:
-            # Use the repo_context_service to get comprehensive repository context
-            try:
-                repo_summary = extract_repo_summary(request.repo_owner, request.repo_name)
-                repo_context = format_repo_context_for_prompt(repo_summary)
-                print(f"Repository context generated for {request.repo_owner}/{request.repo_name}")
-            except Exception as e:
-                print(f"Error getting repository context: {str(e)}")
-        
-        response = await chat_with_repo(
-            query=request.query,
-            code_context=request.context.get('content', ''),
-            file_path=request.context.get('path', ''),
-            repo_owner=request.repo_owner,
-            repo_name=request.repo_name,
-            repo_context=repo_context
-        )
+        response = await chat_with_repo(**await _prepare_chat(request))
         
         if not response:
             print("AI service returned empty response")
@@ -191,3 +427,51 @@ async def chat(request: ChatRequest):
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Stream the chat answer as server-sent events: one `data: {"text": ...}`
+    event per chunk, then a `done` event with timings (or an `error` event).
+    If the client goes away the upstream Groq stream is closed.
+    """
+    print(f"Streaming chat request received: query='{request.query}', repo={request.repo_owner}/{request.repo_name}")
+    chat_kwargs = await _prepare_chat(request)
+
+    async def events():
+        response = ChatResponse()
+        started = time.perf_counter()
+        ttft = None
+        chat_metrics.streams += 1
+        chunks = stream_chat_with_repo(**chat_kwargs)
+        try:
+            async for text in chunks:
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                    chat_metrics.record_first_token(ttft)
+                    print(f"Chat first token after {ttft:.3f}s")
+                response.add_chunk(text)
+                yield _sse_event({"text": text})
+                if await http_request.is_disconnected():
+                    chat_metrics.cancelled += 1
+                    print("Client disconnected, cancelling chat stream")
+                    return
+            chat_metrics.completed += 1
+            total = time.perf_counter() - started
+            print(f"Chat stream finished in {total:.3f}s ({len(response.get_content())} chars)")
+            yield _sse_event({"ttft": round(ttft or total, 4), "total": round(total, 4)}, event="done")
+        except asyncio.CancelledError:
+            chat_metrics.cancelled += 1
+            print("Chat stream cancelled")
+            raise
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield _sse_event({"error": str(e)}, event="error")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
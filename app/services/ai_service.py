@@ -1,6 +1,8 @@
-from groq import Groq
-from typing import Optional, List, Dict, Any
+from groq import AsyncGroq
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Tuple
 from ..config import Config
+from .llm_scheduler import LLMScheduler, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from .llm_cache import LLMResponseCache, CACHE_USE
 import re
 
 class ChatResponse:
@@ -17,28 +19,227 @@ def is_greeting_or_general(query: str) -> bool:
     greetings = ["hi", "hello", "hey", "greetings"]
     return any(query.lower().startswith(g) for g in greetings)
 
-# Initialize Groq client
-client = Groq(api_key=Config.GROQ_API_KEY)
+# Initialize Groq client; retries on 429 are left to the scheduler
+client = AsyncGroq(
+    api_key=Config.GROQ_API_KEY,
+    base_url=Config.GROQ_BASE_URL or None,
+    max_retries=0
+)
 
-async def get_code_explanation(code: str, path: str) -> str:
+scheduler = LLMScheduler(
+    requests_per_minute=Config.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=Config.LLM_TOKENS_PER_MINUTE,
+    max_concurrency=Config.LLM_MAX_CONCURRENCY,
+    max_retries=Config.LLM_MAX_RETRIES,
+    backoff_factor=Config.LLM_BACKOFF_FACTOR
+)
+
+# Approximates BPE splitting: short letter runs, digit groups, runs of
+# indentation and every other non-space character each count as one token
+_TOKEN_RE = re.compile(r"[A-Za-z]{1,8}|\d{1,3}| {2,16}|\S")
+_TOKEN_SAMPLE_CHARS = 1024
+
+def estimate_tokens(*texts: str) -> int:
+    """
+    Approximate the model's token count without a tokenizer.
+    Long texts are counted on three fixed-size samples (start, middle, end)
+    and scaled, so the cost does not grow with the input.
+    """
+    total = 0
+    sample = _TOKEN_SAMPLE_CHARS
+    for text in texts:
+        length = len(text)
+        if length <= 3 * sample:
+            total += len(_TOKEN_RE.findall(text))
+        else:
+            middle = (length - sample) // 2
+            counted = (
+                len(_TOKEN_RE.findall(text, 0, sample)) +
+                len(_TOKEN_RE.findall(text, middle, middle + sample)) +
+                len(_TOKEN_RE.findall(text, length - sample))
+            )
+            total += counted * length // (3 * sample)
+    return total + 1
+
+class PromptSection:
+    """One part of a prompt competing for the token budget"""
+
+    def __init__(
+        self,
+        name: str,
+        text: str,
+        priority: int = 0,
+        required: bool = False,
+        min_tokens: int = 0,
+        degrade: Optional[Callable[[str, int], str]] = None
+    ):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority
+        self.required = required
+        self.min_tokens = min_tokens
+        # degrade(text, max_chars) returns a smaller form, e.g. the file's structure
+        self.degrade = degrade
+
+def pack_prompt(sections: List[PromptSection], budget: int) -> Dict[str, str]:
+    """
+    Fit prompt sections into a token budget, most valuable (lowest priority
+    number) first. Required sections are always kept whole. Optional sections
+    are kept whole when they fit, otherwise replaced by their degraded form
+    and, as a last resort, cut to size. Each later section keeps min_tokens
+    reserved so one large file cannot crowd out everything else.
+    """
+    packed = {}
+    remaining = budget
+    for section in sections:
+        if section.required:
+            packed[section.name] = section.text
+            remaining -= estimate_tokens(section.text)
+
+    optional = sorted((s for s in sections if not s.required), key=lambda s: s.priority)
+    costs = [estimate_tokens(s.text) if s.text else 0 for s in optional]
+    for i, section in enumerate(optional):
+        reserve = sum(min(cost, later.min_tokens) for later, cost in zip(optional[i + 1:], costs[i + 1:]))
+        allowance = max(0, remaining - reserve)
+        text, cost = section.text, costs[i]
+        if cost > allowance:
+            text = _shrink_section(section, cost, allowance)
+            cost = allowance
+        packed[section.name] = text
+        remaining -= cost
+    return packed
+
+def _shrink_section(section: PromptSection, cost: int, allowance: int) -> str:
+    if allowance <= 0:
+        return ""
+    chars_per_token = len(section.text) / cost
+    notice = f"\n\n...\n[{section.name} truncated to fit the prompt budget]"
+    if section.degrade is not None:
+        degraded = section.degrade(section.text, int(allowance * chars_per_token))
+        spare = allowance - estimate_tokens(degraded)
+        if spare >= 0:
+            # Spend what the structure summary leaves over on the start of the original
+            excerpt_chars = int(spare * chars_per_token) - len(notice) - 2
+            if excerpt_chars <= 0:
+                return degraded
+            return section.text[:excerpt_chars] + notice + "\n\n" + degraded
+    return section.text[:max(0, int(allowance * chars_per_token) - len(notice))] + notice
+
+response_cache = LLMResponseCache(
+    max_bytes=Config.LLM_CACHE_MAX_BYTES,
+    ttl=Config.LLM_CACHE_TTL,
+    max_temperature=Config.LLM_CACHE_MAX_TEMPERATURE,
+    db_path=Config.LLM_CACHE_PATH or None
+)
+
+MODEL = "llama-3.3-70b-versatile"
+
+def _messages(system_message: str, prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": system_message
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+async def _complete(
+    system_message: str,
+    prompt: str,
+    priority: int,
+    temperature: float = 0.3,
+    max_tokens: int = 1000,
+    cache: str = CACHE_USE
+) -> str:
+    """Run one completion through the response cache and the scheduler"""
+    use_cache = response_cache.cacheable(temperature)
+    key = response_cache.make_key(MODEL, system_message, prompt, temperature, max_tokens) if use_cache else None
+    if use_cache:
+        cached = await response_cache.get_async(key, cache)
+        if cached is not None:
+            return cached
+
+    completion = await scheduler.run(
+        lambda: client.chat.completions.create(
+            model=MODEL,
+            messages=_messages(system_message, prompt),
+            temperature=temperature,
+            max_tokens=max_tokens
+        ),
+        priority=priority,
+        tokens=estimate_tokens(system_message, prompt) + max_tokens
+    )
+    text = completion.choices[0].message.content
+    if use_cache:
+        await response_cache.set_async(key, text, cache)
+    return text
+
+async def _stream_complete(
+    system_message: str,
+    prompt: str,
+    priority: int,
+    temperature: float = 0.3,
+    max_tokens: int = 1000,
+    cache: str = CACHE_USE
+) -> AsyncIterator[str]:
+    """Streaming counterpart of _complete; a cached answer is yielded as a single chunk"""
+    use_cache = response_cache.cacheable(temperature)
+    key = response_cache.make_key(MODEL, system_message, prompt, temperature, max_tokens) if use_cache else None
+    if use_cache:
+        cached = await response_cache.get_async(key, cache)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = scheduler.stream(
+        lambda: client.chat.completions.create(
+            model=MODEL,
+            messages=_messages(system_message, prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        ),
+        priority=priority,
+        tokens=estimate_tokens(system_message, prompt) + max_tokens
+    )
+    response = ChatResponse()
+    finished = False
+    try:
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                response.add_chunk(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        finished = True
+    finally:
+        await chunks.aclose()
+    # Only complete answers are cached, never ones cut off by a disconnect
+    if finished and use_cache:
+        await response_cache.set_async(key, response.get_content(), cache)
+
+async def get_code_explanation(
+    code: str,
+    path: str,
+    priority: int = PRIORITY_BACKGROUND,
+    cache: str = CACHE_USE
+) -> str:
     """Get AI explanation for code"""
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert code reviewer and technical writer."
-                },
-                {
-                    "role": "user",
-                    "content": f"Please explain this code from {path}:\n\n{code}"
-                }
-            ],
-            temperature=0.3,
-            max_tokens=1000
+        system_message = "You are an expert code reviewer and technical writer."
+        instruction = f"Please explain this code from {path}:\n\n"
+        packed = pack_prompt([
+            PromptSection("system", system_message, required=True),
+            PromptSection("instruction", instruction, required=True),
+            PromptSection("code", code, degrade=lambda text, max_chars: truncate_large_text(text, path, max_chars))
+        ], Config.LLM_PROMPT_TOKEN_BUDGET)
+        return await _complete(
+            system_message,
+            instruction + packed["code"],
+            priority=priority,
+            cache=cache
         )
-        return completion.choices[0].message.content
     except Exception as e:
         return f"Error analyzing code: {str(e)}"
 
@@ -63,153 +264,216 @@ def truncate_large_text(content: str, file_path: str, max_chars: int = 10000) ->
     # Handle different file types
     if file_ext in ['md', 'markdown']:
         # For markdown files, preserve headers and structure
-        return _truncate_markdown(content, max_chars)
+        result = _truncate_markdown(content, max_chars)
     elif file_ext in ['py', 'js', 'java', 'c', 'cpp', 'cs', 'go']:
         # For code files, preserve imports/includes and function signatures
-        return _truncate_code(content, file_ext, max_chars)
+        result = _truncate_code(content, file_ext, max_chars)
     elif file_ext in ['json', 'yaml', 'yml', 'xml']:
         # For structured data files, preserve structure
-        return _truncate_structured_data(content, file_ext, max_chars)
+        result = _truncate_structured_data(content, file_ext, max_chars)
     elif file_ext in ['bpe', 'vocab', 'dict', 'txt', 'csv', 'tsv']:
         # For vocabulary/dictionary files, sample entries
-        return _truncate_dictionary_file(content, max_chars)
+        result = _truncate_dictionary_file(content, max_chars)
     else:
         # Default truncation for unknown file types
-        return _truncate_generic(content, max_chars)
+        result = _truncate_generic(content, max_chars)
+    # Matched lines can be arbitrarily long (e.g. minified code), so cap the summary too
+    return result[:max_chars]
+
+# Deletes every control character except tab, newline and carriage return
+_CONTROL_CHARS = dict.fromkeys(c for c in range(32) if chr(c) not in '\n\r\t')
 
 def _is_likely_binary(content: str, sample_size: int = 1000) -> bool:
     """Check if content is likely binary data"""
     # Take a sample of the content to check
     sample = content[:sample_size]
-    # Count non-printable/control characters
-    control_char_count = sum(1 for c in sample if ord(c) < 32 and c not in '\n\r\t')
+    if not sample:
+        return False
+    # Count non-printable/control characters by deleting them in C
+    control_char_count = len(sample) - len(sample.translate(_CONTROL_CHARS))
     # If more than 10% are control characters, it's likely binary
     return (control_char_count / len(sample)) > 0.10
 
+def _head_lines(content: str, count: int, max_chars: int) -> str:
+    """The first `count` lines of content, at most max_chars of them, without splitting the rest"""
+    if count <= 0 or max_chars <= 0:
+        return ''
+    end = -1
+    for _ in range(count):
+        end = content.find('\n', end + 1, max_chars)
+        if end == -1:
+            return content[:max_chars]
+    return content[:end]
+
+def _tail_lines(content: str, count: int, max_chars: int) -> str:
+    """The last `count` lines of content, at most max_chars of them"""
+    if count <= 0 or max_chars <= 0:
+        return ''
+    start = len(content)
+    limit = max(0, len(content) - max_chars)
+    for _ in range(count):
+        start = content.rfind('\n', limit, start)
+        if start == -1:
+            return content[limit:]
+    return content[start + 1:]
+
+def _collect(regex: re.Pattern, content: str, limit: int) -> Tuple[List[str], bool]:
+    """
+    The first `limit` lines matched by a line regex, and whether there are
+    more. Scanning stops as soon as the limit is reached.
+    """
+    found = []
+    for match in regex.finditer(content):
+        if len(found) == limit:
+            return found, True
+        found.append(match.group())
+    return found, False
+
+_MARKDOWN_HEADER_RE = re.compile(r'^[ \t]*#.*$', re.M)
+
 def _truncate_markdown(content: str, max_chars: int) -> str:
     """Truncate markdown preserving structure"""
-    lines = content.split('\n')
-    
-    # Extract all headers
-    headers = [line for line in lines if line.strip().startswith('#')]
+    headers, more_headers = _collect(_MARKDOWN_HEADER_RE, content, 20)
     
     # Take beginning and some end
-    beginning = '\n'.join(lines[:max(10, max_chars//200)])
+    beginning = _head_lines(content, max(10, max_chars//200), max_chars // 2)
     
     # Build summary
     result = f"{beginning}\n\n...\n\n[Content truncated - file is {len(content)} characters]\n\n"
     
     if headers:
         result += "## Document Structure:\n"
-        for h in headers[:20]:
+        for h in headers:
             result += f"{h}\n"
-        if len(headers) > 20:
-            result += f"\n... and {len(headers) - 20} more headers\n"
+        if more_headers:
+            result += "\n... and more headers\n"
     
     return result
 
+# Import lines per language
+_IMPORT_RES = {
+    ext: re.compile(pattern, re.M) for ext, pattern in {
+        'py': r'^[ \t]*(?:import|from)[ \t].*$',
+        'js': r'^[ \t]*(?:import[ \t]|from[ \t]|require\().*$',
+        'java': r'^[ \t]*import[ \t].*$',
+        'c': r'^[ \t]*#include.*$',
+        'cpp': r'^[ \t]*#include.*$',
+        'cs': r'^[ \t]*using[ \t].*$',
+        'go': r'^[ \t]*import[ \t(].*$',
+    }.items()
+}
+
+# Function, class and type definition lines per language
+_C_FUNCTION = r'^(?![ \t]*(?:if|for|while|switch|else|do|return)\b)[^;\n]*\)[ \t]*\{[ \t]*$'
+_JVM_SIGNATURE = (
+    r'^[ \t]*(?:(?:public|private|protected|internal|static|final|abstract|sealed|partial|override|virtual|async|synchronized)[ \t]+)*'
+    r'(?:class|interface|enum|struct|record|[\w<>\[\],.?]+[ \t]+\w+[ \t]*\()[^;\n]*$'
+)
+_DEFINITION_RES = {
+    ext: re.compile(pattern, re.M) for ext, pattern in {
+        'py': r'^[ \t]*(?:async[ \t]+)?(?:def|class)[ \t].*$',
+        'js': r'^[ \t]*(?:export[ \t]+)?(?:default[ \t]+)?(?:async[ \t]+)?(?:function\b|class[ \t]|(?:const|let|var)[ \t]+\w+[ \t]*=[ \t]*(?:async[ \t]*)?(?:\(|function\b|\w+[ \t]*=>)).*$',
+        'java': _JVM_SIGNATURE,
+        'c': _C_FUNCTION,
+        'cpp': _C_FUNCTION + r'|^[ \t]*(?:class|struct)[ \t]+\w+[^;\n]*$',
+        'cs': _JVM_SIGNATURE,
+        'go': r'^(?:func|type)[ \t].*$',
+    }.items()
+}
+
 def _truncate_code(content: str, ext: str, max_chars: int) -> str:
     """Truncate code files preserving imports and function definitions"""
-    lines = content.split('\n')
-    
     # Extract imports, class definitions, and function definitions
-    imports = []
-    definitions = []
-    
-    import_patterns = {
-        'py': ['import ', 'from '],
-        'js': ['import ', 'require(', 'from '],
-        'java': ['import '],
-        'c': ['#include'],
-        'cpp': ['#include'],
-        'cs': ['using '],
-        'go': ['import ']
-    }
-    
-    def_patterns = {
-        'py': ['def ', 'class '],
-        'js': ['function ', 'class ', 'const ', 'let ', 'var '],
-        'java': ['class ', 'interface ', 'enum ', 'public ', 'private ', 'protected '],
-        'c': [') {', ') \{'],
-        'cpp': [') {', ') \{', 'class ', 'struct '],
-        'cs': ['class ', 'void ', 'public ', 'private '],
-        'go': ['func ', 'type ']
-    }
-    
-    patterns = import_patterns.get(ext, [])
-    for i, line in enumerate(lines):
-        if any(line.strip().startswith(p) for p in patterns):
-            imports.append((i, line))
-    
-    patterns = def_patterns.get(ext, [])
-    for i, line in enumerate(lines):
-        if any(p in line for p in patterns) and '{' in line or '):' in line:
-            definitions.append((i, line))
+    imports, more_imports = _collect(_IMPORT_RES[ext], content, 20)
+    definitions, more_definitions = _collect(_DEFINITION_RES[ext], content, 30)
     
     # Build a useful summary
     # First, add the first 20-30 lines, which often include imports and setup
-    start_section = '\n'.join(lines[:min(30, len(lines)//10)])
+    start_section = _head_lines(content, max(1, min(30, (content.count('\n') + 1)//10)), max_chars // 2)
     
     result = f"{start_section}\n\n...\n\n[Code file truncated - {len(content)} characters total]\n\n"
     
     # Add imports section if we found imports
     if imports:
         result += "## Imports/Includes:\n```\n"
-        for _, line in imports[:20]:
+        for line in imports:
             result += f"{line}\n"
-        if len(imports) > 20:
-            result += f"# ... and {len(imports) - 20} more imports\n"
+        if more_imports:
+            result += "# ... and more imports\n"
         result += "```\n\n"
     
     # Add function/class definitions
     if definitions:
         result += "## Function/Class Definitions:\n```\n"
-        for _, line in definitions[:30]:
+        for line in definitions:
             result += f"{line}\n"
-        if len(definitions) > 30:
-            result += f"# ... and {len(definitions) - 30} more definitions\n"
+        if more_definitions:
+            result += "# ... and more definitions\n"
         result += "```\n"
     
     return result
 
+_JSON_KEY_RE = re.compile(r'"([^"]+)"\s*:')
+_JSON_KEY_WINDOW = 16 * 1024
+# Large JSON files repeat the same record shapes, so their keys show up early
+_JSON_KEY_SCAN_CHARS = 256 * 1024
+
+def _json_keys(content: str, limit: int) -> Tuple[List[str], bool, bool]:
+    """
+    The first `limit` distinct keys of JSON text in order of appearance,
+    whether there are more, and whether scanning stopped at
+    _JSON_KEY_SCAN_CHARS. Windows end at line breaks, which JSON strings
+    cannot contain, so no key is split between two windows.
+    """
+    keys = {}
+    position = 0
+    scan_end = min(len(content), _JSON_KEY_SCAN_CHARS)
+    while position < scan_end:
+        window_end = content.find('\n', position + _JSON_KEY_WINDOW, scan_end)
+        if window_end == -1:
+            window_end = scan_end
+        for key in _JSON_KEY_RE.findall(content, position, window_end):
+            if key not in keys:
+                if len(keys) == limit:
+                    return list(keys), True, False
+                keys[key] = None
+        position = window_end + 1
+    return list(keys), False, scan_end < len(content)
+
 def _truncate_structured_data(content: str, ext: str, max_chars: int) -> str:
     """Truncate structured data files (JSON, YAML, XML)"""
-    lines = content.split('\n')
-    
-    # Take some from beginning and some from end
-    beginning = '\n'.join(lines[:max(15, max_chars//200)])
+    # Take some from beginning
+    beginning = _head_lines(content, max(15, max_chars//200), max_chars // 2)
     
     # Build summary
     result = f"{beginning}\n\n...\n\n[Content truncated - file is {len(content)} characters]\n\n"
     
     # Try to extract structure based on file type
     if ext == 'json':
-        # Look for top-level keys
-        import re
-        keys = re.findall(r'"([^"]+)"\s*:', content)
+        keys, more, partial = _json_keys(content, 20)
         if keys:
             result += "## Structure (top-level keys):\n"
-            for key in sorted(set(keys))[:20]:
+            for key in sorted(keys):
                 result += f"- \"{key}\"\n"
-            if len(keys) > 20:
-                result += f"... and {len(set(keys)) - 20} more keys\n"
+            if more:
+                result += "... and more keys\n"
+            elif partial:
+                result += f"(keys from the first {_JSON_KEY_SCAN_CHARS // 1024} KB)\n"
     
     return result
 
 def _truncate_dictionary_file(content: str, max_chars: int) -> str:
     """Handle dictionary/vocabulary files (common in ML models)"""
-    lines = content.split('\n')
-    
     # Calculate number of entries
-    num_entries = len(lines)
+    num_entries = content.count('\n') + 1
     entry_sample_size = min(10, num_entries)
     
     # Take samples from beginning, middle and end
-    beginning = '\n'.join(lines[:entry_sample_size])
-    middle_start = max(0, num_entries // 2 - entry_sample_size // 2)
-    middle = '\n'.join(lines[middle_start:middle_start+entry_sample_size])
-    end_start = max(0, num_entries - entry_sample_size)
-    ending = '\n'.join(lines[end_start:])
+    beginning = _head_lines(content, entry_sample_size, max_chars // 4)
+    # The middle sample starts at the first line break past the middle character
+    middle_start = content.find('\n', len(content) // 2) + 1 if num_entries > entry_sample_size * 2 else 0
+    middle = _head_lines(content[middle_start:middle_start + max_chars], entry_sample_size, max_chars // 4)
+    ending = _tail_lines(content, entry_sample_size, max_chars // 4)
     
     # Build informative summary
     result = f"Dictionary/vocabulary file with {num_entries} entries ({len(content)} characters).\n\n"
@@ -225,94 +489,188 @@ def _truncate_generic(content: str, max_chars: int) -> str:
     half_size = max_chars // 2
     return content[:half_size] + f"\n\n...\n[Content truncated - file is {len(content)} characters]...\n\n" + content[-half_size:]
 
-async def chat_with_repo(
-    query: str, 
-    code_context: str = "", 
-    file_path: str = "",
-    repo_owner: Optional[str] = None,
-    repo_name: Optional[str] = None,
-    repo_context: str = ""
-) -> str:
-    """Chat about repository code with context of the entire repository"""
-    try:
-        # Truncate large text files to prevent API token limit errors
-        if code_context and file_path:
-            code_context = truncate_large_text(code_context, file_path)
-            
-        # Also truncate repository context if it's too large
-        if repo_context and len(repo_context) > 20000:
-            repo_context = repo_context[:20000] + "\n\n...\n[Repository context truncated due to size]"
-        
-        # Check if the query is a greeting or general question
-        is_greeting = is_greeting_or_general(query)
-        
-        # Prepare system message based on query type
-        if is_greeting:
-            system_message = """You are GitSage, a helpful assistant for GitHub repositories. 
+# Tokens used by the fixed wording around the sections in _build_chat_prompt
+_PROMPT_TEMPLATE_TOKENS = 64
+
+def _format_chunks(chunks: List[Dict[str, Any]], max_chars: Optional[int] = None) -> str:
+    """Render retrieved chunks best first, keeping only whole chunks that fit in max_chars"""
+    parts = []
+    used = 0
+    for chunk in chunks:
+        part = f"{chunk['path']} (lines {chunk['start_line']}-{chunk['end_line']}):\n```\n{chunk['text']}\n```\n"
+        if max_chars is not None and used + len(part) > max_chars:
+            continue
+        parts.append(part)
+        used += len(part)
+    return "\n".join(parts)
+
+def _degrade_file(content: str, file_path: str, outline: str, max_chars: int) -> str:
+    """A file cut down to max_chars, led by as much of its symbol outline as fits in half of them"""
+    room = max_chars // 2
+    if len(outline) > room:
+        cut = outline.rfind('\n', 0, room - 4)
+        outline = outline[:cut] + "\n..." if cut > 0 else ""
+    if not outline:
+        return truncate_large_text(content, file_path, max_chars)
+    header = f"Outline (line: definition):\n{outline}\n\nExcerpt:\n"
+    return header + truncate_large_text(content, file_path, max_chars - len(header))
+
+def _build_chat_prompt(
+    query: str,
+    code_context: str,
+    file_path: str,
+    repo_context: str,
+    retrieved_chunks: Optional[List[Dict[str, Any]]] = None,
+    outline: str = ""
+):
+    """Build the (system message, user prompt) pair for a chat query"""
+    # Check if the query is a greeting or general question
+    is_greeting = is_greeting_or_general(query)
+    
+    # Prepare system message based on query type
+    if is_greeting:
+        system_message = """You are GitSage, a helpful assistant for GitHub repositories. 
 You help users understand code repositories, explain code, and answer questions about software projects.
 When greeting users, be friendly and brief, and mention that you can help them explore and understand the repository.
 Always include info about the repository in your greeting if it's available.
 """
-        else:
-            system_message = """You are GitSage, a helpful AI assistant for understanding code repositories.
+    else:
+        system_message = """You are GitSage, a helpful AI assistant for understanding code repositories.
 Focus on explaining code clearly and precisely with awareness of the entire repository structure.
 Aim to provide useful technical insights about the code and repository organization.
 Only make statements about the repository based on the information provided in the context.
 """
 
-        # Create a prompt with all available context
-        if is_greeting:
-            # For greetings, provide a friendly response that includes repo info if available
-            if repo_context:
-                prompt = f"""User greeting: {query}
-                
+    # Fit the file, retrieved code and repository context into the token
+    # budget, in that order since questions are usually about the open file
+    sections = [
+        PromptSection("system", system_message, required=True),
+        PromptSection("question", query, required=True),
+        PromptSection("repository context", repo_context, priority=2, min_tokens=Config.LLM_REPO_CONTEXT_MIN_TOKENS)
+    ]
+    if not is_greeting:
+        sections.append(PromptSection(
+            "file", code_context, priority=0,
+            degrade=lambda text, max_chars: _degrade_file(text, file_path, outline, max_chars)
+        ))
+        # The open file is already in the prompt
+        chunks = [c for c in retrieved_chunks or [] if not (code_context and c['path'] == file_path)]
+        sections.append(PromptSection(
+            "relevant code", _format_chunks(chunks), priority=1,
+            min_tokens=Config.LLM_RETRIEVAL_MIN_TOKENS,
+            degrade=lambda text, max_chars: _format_chunks(chunks, max_chars)
+        ))
+    packed = pack_prompt(sections, Config.LLM_PROMPT_TOKEN_BUDGET - _PROMPT_TEMPLATE_TOKENS)
+    repo_context = packed["repository context"]
+    code_context = packed.get("file", code_context)
+    relevant_code = packed.get("relevant code", "")
+    if relevant_code:
+        relevant_code = f"\nRelevant code from the repository:\n{relevant_code}\n"
+
+    # Create a prompt with all available context
+    if is_greeting:
+        # For greetings, provide a friendly response that includes repo info if available
+        if repo_context:
+            prompt = f"""User greeting: {query}
+            
 Repository context:
 {repo_context}
 
 Respond with a friendly greeting that mentions what the repository appears to be about.
 Be brief but informative in your introduction."""
-            else:
-                prompt = f"""User greeting: {query}
-                
+        else:
+            prompt = f"""User greeting: {query}
+            
 Respond with a friendly greeting and offer to help understand the repository once a file is selected."""
 
-        elif not code_context and not file_path:
-            # General repository question
-            prompt = f"""Repository context:
+    elif not code_context and not file_path:
+        # General repository question
+        prompt = f"""Repository context:
 {repo_context}
-
+{relevant_code}
 Question: {query}
 
 Please provide a clear and helpful response about this repository based on the available context."""
-        else:
-            # File-specific question
-            prompt = f"""Repository context:
+    else:
+        # File-specific question
+        prompt = f"""Repository context:
 {repo_context}
 Current file: {file_path}
 
 Code:
 {code_context}
-
+{relevant_code}
 Question: {query}
 
 Please provide a clear and specific answer based on the code shown above and the repository context."""
 
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_message
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        return completion.choices[0].message.content
+    return system_message, prompt
+
+async def chat_with_repo(
+    query: str, 
+    code_context: str = "", 
+    file_path: str = "",
+    repo_owner: Optional[str] = None,
+    repo_name: Optional[str] = None,
+    repo_context: str = "",
+    cache: str = CACHE_USE,
+    retrieved_chunks: Optional[List[Dict[str, Any]]] = None,
+    outline: str = ""
+) -> str:
+    """Chat about repository code with context of the entire repository"""
+    try:
+        system_message, prompt = _build_chat_prompt(query, code_context, file_path, repo_context, retrieved_chunks, outline)
+        return await _complete(system_message, prompt, priority=PRIORITY_INTERACTIVE, cache=cache)
     except Exception as e:
-        return f"Error: {str(e)}"
\ No newline at end of file
+        return f"Error: {str(e)}"
+
+async def stream_chat_with_repo(
+    query: str,
+    code_context: str = "",
+    file_path: str = "",
+    repo_owner: Optional[str] = None,
+    repo_name: Optional[str] = None,
+    repo_context: str = "",
+    cache: str = CACHE_USE,
+    retrieved_chunks: Optional[List[Dict[str, Any]]] = None,
+    outline: str = ""
+) -> AsyncIterator[str]:
+    """
+    Stream a chat answer chunk by chunk as Groq generates it.
+    Closing the generator (e.g. when the client disconnects) closes the
+    upstream stream, which stops generation.
+    """
+    system_message, prompt = _build_chat_prompt(query, code_context, file_path, repo_context, retrieved_chunks, outline)
+    chunks = _stream_complete(system_message, prompt, priority=PRIORITY_INTERACTIVE, cache=cache)
+    try:
+        async for text in chunks:
+            yield text
+    finally:
+        await chunks.aclose()
+
+class ChatMetrics:
+    """Latency counters for streamed chats; time to first token is the headline number"""
+
+    def __init__(self):
+        self.streams = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.ttft_total = 0.0
+        self.ttft_count = 0
+        self.last_ttft = 0.0
+
+    def record_first_token(self, seconds: float):
+        self.ttft_total += seconds
+        self.ttft_count += 1
+        self.last_ttft = seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": self.streams,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "avg_ttft": round(self.ttft_total / self.ttft_count, 4) if self.ttft_count else 0.0,
+            "last_ttft": round(self.last_ttft, 4)
+        }
+
+chat_metrics = ChatMetrics()
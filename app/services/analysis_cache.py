@@ -0,0 +1,93 @@
+import asyncio
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+from .lru_cache import ByteLRUCache
+
+
+class AnalysisCache:
+    """
+    Per-blob cache of analysis results.
+
+    Keys are (kind, analyzer version, git blob SHA): a blob SHA identifies
+    file contents exactly, so a result stays valid across commits for as
+    long as the file is unchanged and the analyzer is not bumped. Results
+    live in a byte-bounded LRU, optionally backed by a SQLite file.
+    Async callers use get_async/set_async, which run SQLite in a worker
+    thread.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, db_path: Optional[str] = None):
+        self.memory = ByteLRUCache(max_bytes)
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS analysis ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(kind: str, version: Any, blob_sha: str) -> str:
+        return f"{kind}:{version}:{blob_sha}"
+
+    def get(self, kind: str, version: Any, blob_sha: Optional[str]) -> Optional[Any]:
+        if not blob_sha:
+            return None
+        key = self.make_key(kind, version, blob_sha)
+        entry = self.memory.get(key)
+        if entry is None and self._db is not None:
+            with self._db_lock:
+                row = self._db.execute('SELECT value FROM analysis WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                entry = json.loads(row[0])
+                self.memory.set(key, entry, size=len(row[0]))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def set(self, kind: str, version: Any, blob_sha: Optional[str], value: Any):
+        if not blob_sha:
+            return
+        key = self.make_key(kind, version, blob_sha)
+        serialized = json.dumps(value)
+        self.memory.set(key, value, size=len(serialized))
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO analysis (key, value) VALUES (?, ?)',
+                    (key, serialized)
+                )
+                self._db.commit()
+
+    async def get_async(self, kind: str, version: Any, blob_sha: Optional[str]) -> Optional[Any]:
+        if self._db is None or not blob_sha or self.make_key(kind, version, blob_sha) in self.memory:
+            return self.get(kind, version, blob_sha)
+        return await asyncio.to_thread(self.get, kind, version, blob_sha)
+
+    async def set_async(self, kind: str, version: Any, blob_sha: Optional[str], value: Any):
+        if self._db is None:
+            self.set(kind, version, blob_sha, value)
+        else:
+            await asyncio.to_thread(self.set, kind, version, blob_sha, value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+            **self.memory.stats()
+        }
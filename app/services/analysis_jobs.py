@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .code_metrics import ANALYZER_VERSION
+from .github_service import (
+    DEPENDENCY_PARSER_VERSION, AnalysisProgress, analyze_complexity, get_dependencies, resolve_commit_sha
+)
+from ..config import Config
+
+# Saved results are ignored when either analyzer changes
+RESULT_VERSION = f"{ANALYZER_VERSION}.{DEPENDENCY_PARSER_VERSION}"
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = frozenset((DONE, FAILED, CANCELLED))
+
+
+class AnalysisJob:
+    """One repository analysis at one commit, run in the background"""
+
+    def __init__(self, owner: str, repo: str, commit_sha: str):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.repo = repo
+        self.commit_sha = commit_sha
+        self.status = QUEUED
+        self.progress = AnalysisProgress()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # True when the result was loaded from a previous run
+        self.from_store = False
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.done = asyncio.Event()
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return self.owner, self.repo, self.commit_sha
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+        self.done.set()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        job = {
+            "id": self.id,
+            "owner": self.owner,
+            "repo": self.repo,
+            "commit": self.commit_sha,
+            "status": self.status,
+            "from_store": self.from_store,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.result["progress"] if self.result else self.progress.to_dict(),
+            "error": self.error
+        }
+        if include_result:
+            # Files analyzed so far while the job runs, the full result once done
+            job["result"] = self.result or {
+                "complexity": dict(self.progress.results),
+                "dependencies": None
+            }
+        return job
+
+
+class AnalysisJobQueue:
+    """
+    In-process queue of repository analyses run by a fixed number of
+    worker tasks.
+
+    Jobs are deduplicated per (owner, repo, commit): submitting an analysis
+    that is already queued, running or finished with a complete result
+    returns that job. Complete results are saved as JSON per commit, so
+    after a restart they are served without re-analysing. Running jobs can
+    be cancelled, which stops their outstanding fetches.
+    """
+
+    def __init__(self, workers: int = 2, results_dir: str = '', history: int = 100, timeout: float = 3600):
+        self.workers = workers
+        self.results_dir = os.path.expanduser(results_dir) if results_dir else ''
+        self.history = history
+        self.timeout = timeout
+        self._jobs: 'OrderedDict[str, AnalysisJob]' = OrderedDict()
+        self._by_key: Dict[Tuple[str, str, str], AnalysisJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.loaded = 0
+
+    async def submit(self, owner: str, repo: str, ref: Optional[str] = None) -> Optional[AnalysisJob]:
+        """Start (or join) the analysis of a ref; None if the ref cannot be resolved"""
+        commit_sha = await resolve_commit_sha(owner, repo, ref)
+        if commit_sha is None:
+            return None
+        key = (owner, repo, commit_sha)
+        job = self._by_key.get(key)
+        if job is not None and job.status not in (FAILED, CANCELLED):
+            return job
+
+        job = AnalysisJob(owner, repo, commit_sha)
+        self._jobs[job.id] = job
+        self._by_key[key] = job
+        saved = await asyncio.to_thread(self._load, key)
+        if saved is not None:
+            job.result = saved
+            job.from_store = True
+            self.loaded += 1
+            job.finish(DONE)
+            self._trim()
+            return job
+
+        self._start_workers()
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job: AnalysisJob) -> bool:
+        """Cancel a queued or running job; False if it had already finished"""
+        if job.status in FINISHED:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+        else:
+            # Still queued; the worker skips it
+            self.cancelled += 1
+            job.finish(CANCELLED)
+        return True
+
+    async def wait(self, job: AnalysisJob) -> AnalysisJob:
+        """Wait for a job to finish without cancelling it if the waiter goes away"""
+        await asyncio.shield(job.done.wait())
+        return job
+
+    def _start_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        loop = asyncio.get_running_loop()
+        while len(self._workers) < self.workers:
+            self._workers.append(loop.create_task(self._work()))
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                continue
+            job.task = asyncio.get_running_loop().create_task(self._run(job))
+            # asyncio.wait does not raise when the job is cancelled
+            await asyncio.wait([job.task])
+            self._trim()
+
+    async def _run(self, job: AnalysisJob):
+        job.status = RUNNING
+        job.started_at = time.time()
+        print(f"Analysis job {job.id} started for {job.owner}/{job.repo}@{job.commit_sha[:12]}")
+        try:
+            complexity, dependencies = await asyncio.gather(
+                analyze_complexity(job.owner, job.repo, job.progress, job.commit_sha, timeout=self.timeout),
+                get_dependencies(job.owner, job.repo, job.commit_sha)
+            )
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            job.finish(CANCELLED)
+            raise
+        except Exception as e:
+            print(f"Analysis job {job.id} failed: {e}")
+            self.failed += 1
+            job.finish(FAILED, str(e))
+            return
+
+        job.result = {
+            "commit": job.commit_sha,
+            "complexity": complexity,
+            "dependencies": dependencies,
+            "progress": job.progress.to_dict()
+        }
+        self.completed += 1
+        job.finish(DONE)
+        print(f"Analysis job {job.id} finished in {job.finished_at - job.started_at:.2f}s")
+        # Partial results (timeouts, unreadable files) are neither saved nor
+        # handed to later submissions, which start a fresh job instead
+        if job.progress.failed:
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+            return
+        try:
+            await asyncio.to_thread(self._save, job.key, job.result)
+        except OSError as e:
+            print(f"Error saving analysis of {job.owner}/{job.repo}@{job.commit_sha}: {e}")
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        finished = [job for job in self._jobs.values() if job.status in FINISHED]
+        for job in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def _result_path(self, key: Tuple[str, str, str]) -> str:
+        owner, repo, commit_sha = key
+        return os.path.join(self.results_dir, owner, repo, f"{commit_sha}.json")
+
+    def _load(self, key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+        if not self.results_dir:
+            return None
+        try:
+            with open(self._result_path(key), 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get('version') != RESULT_VERSION:
+            return None
+        return saved['result']
+
+    def _save(self, key: Tuple[str, str, str], result: Dict[str, Any]):
+        if not self.results_dir:
+            return
+        path = self._result_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': RESULT_VERSION, 'result': result}, f)
+        os.replace(tmp_path, path)
+
+    async def close(self):
+        """Cancel the workers and any running jobs"""
+        for job in list(self._jobs.values()):
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "jobs": statuses,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "loaded_from_store": self.loaded,
+            "persistent": bool(self.results_dir)
+        }
+
+
+analysis_jobs = AnalysisJobQueue(
+    workers=Config.ANALYSIS_JOB_WORKERS,
+    results_dir=Config.ANALYSIS_RESULTS_DIR,
+    history=Config.ANALYSIS_JOB_HISTORY,
+    timeout=Config.ANALYSIS_JOB_TIMEOUT
+)
@@ -0,0 +1,219 @@
+import ast
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+from .symbol_outline import LineIndex
+
+# Bump when the shape or meaning of analyze_source output changes
+ANALYZER_VERSION = 1
+
+_BLOCK_NODES = frozenset(
+    getattr(ast, name) for name in
+    ('If', 'For', 'AsyncFor', 'While', 'With', 'AsyncWith', 'Try', 'TryStar', 'Match')
+    if hasattr(ast, name)
+)
+_SIMPLE_DECISION_NODES = frozenset(
+    getattr(ast, name) for name in
+    ('If', 'For', 'AsyncFor', 'While', 'IfExp', 'ExceptHandler', 'match_case')
+    if hasattr(ast, name)
+)
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class _MetricsWalker:
+    """
+    Single walk over a module collecting decision points per function.
+
+    Cyclomatic complexity follows McCabe: 1 + if/elif, loops, except
+    clauses, conditional expressions, comprehension clauses, extra boolean
+    operands and match cases.
+    """
+
+    def __init__(self, sloc_prefix: List[int]):
+        self.sloc_prefix = sloc_prefix
+        self.functions: List[Dict[str, Any]] = []
+        self.module_decisions = 0
+        self._frame: Optional[Dict[str, int]] = None
+
+    def walk(self, node):
+        node_type = type(node)
+        if node_type in _FUNCTION_NODES:
+            self._walk_function(node)
+            return
+
+        decisions = 0
+        if node_type in _SIMPLE_DECISION_NODES:
+            decisions = 1
+        elif node_type is ast.BoolOp:
+            decisions = len(node.values) - 1
+        elif node_type is ast.comprehension:
+            decisions = 1 + len(node.ifs)
+        frame = self._frame
+        if decisions:
+            self.module_decisions += decisions
+            if frame is not None:
+                frame['decisions'] += decisions
+
+        if frame is not None and node_type in _BLOCK_NODES:
+            frame['depth'] += 1
+            if frame['depth'] > frame['max_depth']:
+                frame['max_depth'] = frame['depth']
+            for child in ast.iter_child_nodes(node):
+                self.walk(child)
+            frame['depth'] -= 1
+        else:
+            for child in ast.iter_child_nodes(node):
+                self.walk(child)
+
+    def _walk_function(self, node):
+        # Decorators and defaults belong to the enclosing scope
+        for child in node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d]:
+            self.walk(child)
+
+        outer = self._frame
+        frame = self._frame = {'decisions': 0, 'depth': 0, 'max_depth': 0}
+        for child in node.body:
+            self.walk(child)
+        self._frame = outer
+
+        end_line = getattr(node, 'end_lineno', None) or node.lineno
+        self.functions.append({
+            'name': node.name,
+            'parameters': _format_parameters(node.args),
+            'line_number': node.lineno,
+            'end_line': end_line,
+            'is_async': isinstance(node, ast.AsyncFunctionDef),
+            'cyclomatic_complexity': frame['decisions'] + 1,
+            'nesting_depth': frame['max_depth'],
+            'loc': end_line - node.lineno + 1,
+            'sloc': self.sloc_prefix[end_line] - self.sloc_prefix[node.lineno - 1]
+        })
+
+
+def _format_parameters(args: ast.arguments) -> List[str]:
+    """Render parameters the way they appear in the signature, one string each"""
+    def render(arg, default=None):
+        text = arg.arg
+        if arg.annotation is not None:
+            text += f": {ast.unparse(arg.annotation)}"
+        if default is not None:
+            text += f" = {ast.unparse(default)}" if arg.annotation is not None else f"={ast.unparse(default)}"
+        return text
+
+    params = []
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        params.append(render(arg, default))
+        if args.posonlyargs and i == len(args.posonlyargs) - 1:
+            params.append('/')
+    if args.vararg is not None:
+        params.append('*' + render(args.vararg))
+    elif args.kwonlyargs:
+        params.append('*')
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(render(arg, default))
+    if args.kwarg is not None:
+        params.append('**' + render(args.kwarg))
+    return params
+
+
+def _sloc_prefix(lines: List[str]) -> List[int]:
+    """Prefix sums of source lines (non-blank, non-comment); index i covers lines 1..i"""
+    flags = [0]
+    for line in lines:
+        stripped = line.strip()
+        flags.append(1 if stripped and not stripped.startswith('#') else 0)
+    return list(accumulate(flags))
+
+
+# Per-function keys only the AST walk can fill in
+_AST_FUNCTION_KEYS = ('end_line', 'is_async', 'cyclomatic_complexity', 'nesting_depth', 'loc', 'sloc')
+
+
+def analyze_source(code: str) -> Dict[str, Any]:
+    """
+    Compute complexity metrics for Python source in one AST walk.
+
+    The result keeps the keys analyze_complexity has always returned
+    (cyclomatic_complexity, lines_of_code, functions with name, parameters
+    and line_number) and adds sloc plus per-function complexity, nesting
+    depth, loc and sloc. Sources that do not parse, or nest too deeply to
+    parse or walk, fall back to the regex heuristics.
+    """
+    lines = code.splitlines()
+    sloc_prefix = _sloc_prefix(lines)
+    walker = _MetricsWalker(sloc_prefix)
+    try:
+        walker.walk(ast.parse(code))
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        # Deeply nested expressions (e.g. a long chain of `+`) exceed the
+        # recursion limit of the parser or the walk
+        return {
+            'cyclomatic_complexity': calculate_cyclomatic_complexity(code),
+            'lines_of_code': len(lines),
+            'sloc': sloc_prefix[-1],
+            # Same keys as the AST result; what the regexes cannot tell is None
+            'functions': [dict(function, **dict.fromkeys(_AST_FUNCTION_KEYS)) for function in analyze_functions(code)]
+        }
+
+    functions = sorted(walker.functions, key=lambda f: f['line_number'])
+    return {
+        'cyclomatic_complexity': walker.module_decisions + 1,
+        'lines_of_code': len(lines),
+        'sloc': sloc_prefix[-1],
+        'functions': functions
+    }
+
+
+def calculate_cyclomatic_complexity(code):
+    """Calculate cyclomatic complexity of Python code"""
+    # Simple implementation - counts control flow statements
+    control_structures = len(re.findall(r'\b(if|for|while|except|with|def|class)\b', code))
+    return control_structures + 1
+
+
+def analyze_functions(code):
+    """Analyze functions in Python code"""
+    functions = []
+    lines = LineIndex(code)
+    for match in re.finditer(r'def\s+(\w+)\s*\((.*?)\):', code):
+        functions.append({
+            'name': match.group(1),
+            'parameters': [p.strip() for p in match.group(2).split(',') if p.strip()],
+            'line_number': lines.line_of(match.start())
+        })
+    return functions
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return the shared process pool used for CPU-bound analysis"""
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+    return _process_pool
+
+
+def reset_process_pool(broken: Optional[ProcessPoolExecutor] = None):
+    """
+    Drop the shared pool, e.g. after a worker crashed and broke it. With
+    `broken`, only that pool is dropped, so callers that saw the same crash
+    do not also drop the fresh pool the first of them started.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if broken is not None and _process_pool is not broken:
+            return
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
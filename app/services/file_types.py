@@ -0,0 +1,101 @@
+import codecs
+from typing import Optional, Tuple
+
+# General type per extension; every extension listed here is treated as binary
+FILE_TYPES = {
+    **dict.fromkeys(('jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg', 'webp'), 'image'),
+    **dict.fromkeys(('mp3', 'wav', 'ogg', 'm4a'), 'audio'),
+    **dict.fromkeys(('mp4', 'avi', 'mov', 'mkv', 'webm'), 'video'),
+    **dict.fromkeys(('pdf', 'doc', 'docx', 'ppt', 'pptx', 'xls', 'xlsx'), 'document'),
+    **dict.fromkeys(('zip', 'rar', 'tar', 'gz', '7z'), 'archive'),
+    # Compiled, other binary, ML models and data
+    **dict.fromkeys((
+        'ico', 'exe', 'dll', 'so', 'class', 'pyc', 'bin', 'dat', 'iso', 'img', 'pkl', 'model', 'onnx', 'pb'
+    ), 'binary'),
+}
+
+# Leading bytes of common binary formats and the type they indicate. Formats
+# whose signature could plausibly start a text file are left to the NUL and
+# UTF-8 checks.
+MAGIC_NUMBERS: Tuple[Tuple[bytes, str], ...] = (
+    (b'\x89PNG\r\n\x1a\n', 'image'),
+    (b'\xff\xd8\xff', 'image'),
+    (b'GIF87a', 'image'),
+    (b'GIF89a', 'image'),
+    (b'\x00\x00\x01\x00', 'image'),
+    (b'%PDF-', 'document'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'document'),
+    (b'PK\x03\x04', 'archive'),
+    (b'\x1f\x8b', 'archive'),
+    (b'7z\xbc\xaf\x27\x1c', 'archive'),
+    (b'Rar!\x1a\x07', 'archive'),
+    (b'\xfd7zXZ\x00', 'archive'),
+    (b'OggS', 'audio'),
+    (b'fLaC', 'audio'),
+    (b'\x1aE\xdf\xa3', 'video'),
+    (b'\x7fELF', 'binary'),
+    (b'\xca\xfe\xba\xbe', 'binary'),
+    (b'\xcf\xfa\xed\xfe', 'binary'),
+    (b'\x00asm', 'binary'),
+    (b'SQLite format 3\x00', 'binary'),
+)
+
+SYMLINK_MODE = '120000'
+
+
+def extension(path: str) -> str:
+    name = path.rpartition('/')[2]
+    return name.rpartition('.')[2].lower() if '.' in name else ''
+
+
+def is_likely_binary_file(path: str) -> bool:
+    """
+    Check if a file is likely binary based on its extension
+    """
+    return extension(path) in FILE_TYPES
+
+
+def get_file_type(path: str) -> str:
+    """
+    Get the general file type based on extension
+    """
+    return FILE_TYPES.get(extension(path), 'binary')
+
+
+def classify_entry(path: str, mode: Optional[str], size: int) -> Optional[Tuple[bool, str]]:
+    """
+    Classify a file from its tree entry alone. Returns (is_binary, type), or
+    None when only its bytes can tell.
+    """
+    if mode == SYMLINK_MODE or size == 0:
+        # A symlink's blob is its target path
+        return False, 'text'
+    file_type = FILE_TYPES.get(extension(path))
+    if file_type is not None:
+        return True, file_type
+    return None
+
+
+def sniff(head: bytes, complete: bool = False) -> Tuple[bool, str]:
+    """
+    Classify a file from its first bytes: known magic numbers, NUL bytes
+    (which text never contains) and UTF-8 validity. `complete` says the
+    bytes are the whole file, so a multi-byte character cut off at the end
+    counts as invalid rather than truncated.
+    """
+    for magic, file_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return True, file_type
+    if head[4:8] == b'ftyp':
+        return True, 'video'
+    if head.startswith(b'RIFF'):
+        # RIFF containers hold images, audio and video
+        form = head[8:12]
+        return True, 'image' if form == b'WEBP' else 'audio' if form == b'WAVE' else 'video'
+    if b'\x00' in head:
+        return True, 'binary'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=complete)
+    except UnicodeDecodeError:
+        return True, 'binary'
+    return False, 'text'
@@ -0,0 +1,345 @@
+import base64
+import heapq
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class GitMirrorError(Exception):
+    pass
+
+
+class GitMirror:
+    """
+    A bare mirror of one repository on local disk.
+
+    Object reads go through a single long-lived `git cat-file --batch`
+    process, so serving a file, resolving a ref or walking history costs a
+    pipe round trip rather than a process spawn. Full tree listings use one
+    `git ls-tree -r` per commit and the most recent `max_trees` are cached,
+    since a commit never changes.
+    """
+
+    def __init__(self, url: str, path: str, auth_token: Optional[str] = None, max_trees: int = 8):
+        self.url = url
+        self.path = path
+        self.auth_token = auth_token
+        self.last_fetch = 0.0
+        self._batch: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self.max_trees = max_trees
+        self._trees: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+
+    def _git_env(self, remote: bool = False) -> Dict[str, str]:
+        env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0'}
+        if remote and self.auth_token and self.url.startswith('https://'):
+            # Passed as config through the environment, where `ps` cannot see it
+            credentials = base64.b64encode(f"x-access-token:{self.auth_token}".encode()).decode()
+            env.update({
+                'GIT_CONFIG_COUNT': '1',
+                'GIT_CONFIG_KEY_0': 'http.extraHeader',
+                'GIT_CONFIG_VALUE_0': f'Authorization: basic {credentials}'
+            })
+        return env
+
+    def _run(self, *args: str, remote: bool = False) -> bytes:
+        cmd = ['git', '--git-dir', self.path] + list(args)
+        env = self._git_env(remote)
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        if result.returncode != 0:
+            raise GitMirrorError(result.stderr.decode('utf-8', errors='replace').strip())
+        return result.stdout
+
+    def ensure(self):
+        """Clone the mirror if it does not exist on disk yet"""
+        with self._fetch_lock:
+            if os.path.exists(os.path.join(self.path, 'HEAD')):
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            print(f"Cloning mirror of {self.url}")
+            cmd = ['git', 'clone', '--mirror', '--quiet', self.url, self.path]
+            env = self._git_env(remote=True)
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+            if result.returncode != 0:
+                raise GitMirrorError(result.stderr.decode('utf-8', errors='replace').strip())
+            self.last_fetch = time.time()
+
+    def fetch(self):
+        """Incrementally update the mirror from its remote"""
+        with self._fetch_lock:
+            self._fetch_locked()
+
+    def _fetch_locked(self):
+        self._run('fetch', '--prune', '--quiet', 'origin', remote=True)
+        self.last_fetch = time.time()
+        # Restart cat-file so it sees the updated refs and packs
+        self.close()
+
+    def refresh_if_stale(self, max_age: float):
+        """Fetch if the last fetch is older than max_age; concurrent callers do not wait"""
+        if time.time() - self.last_fetch <= max_age:
+            return
+        if not self._fetch_lock.acquire(blocking=False):
+            return
+        try:
+            self._fetch_locked()
+        except GitMirrorError as e:
+            print(f"Error refreshing mirror {self.path}: {e}")
+        finally:
+            self._fetch_lock.release()
+
+    def _read_object_locked(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        if self._batch is None or self._batch.poll() is not None:
+            self._batch = subprocess.Popen(
+                ['git', '--git-dir', self.path, 'cat-file', '--batch'],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+        self._batch.stdin.write(spec.encode('utf-8') + b'\n')
+        self._batch.stdin.flush()
+        header = self._batch.stdout.readline()
+        if not header:
+            self._close_locked()
+            raise GitMirrorError("git cat-file exited unexpectedly")
+        header = header.rstrip(b'\n')
+        # "<spec> missing" / "<spec> ambiguous"; the spec may contain spaces
+        if header.endswith((b' missing', b' ambiguous')):
+            return None
+        meta, size = header.rsplit(b' ', 1)
+        sha, _, obj_type = meta.decode().partition(' ')
+        data = self._batch.stdout.read(int(size))
+        self._batch.stdout.read(1)
+        return sha, obj_type, data
+
+    def read_object(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        """Read an object by any revision spec; returns (sha, type, data) or None"""
+        if '\n' in spec:
+            return None
+        with self._lock:
+            return self._read_object_locked(spec)
+
+    def resolve(self, ref: Optional[str] = None) -> Optional[str]:
+        """Resolve a ref (HEAD if omitted) to a commit SHA"""
+        obj = self.read_object(f"{ref or 'HEAD'}^{{commit}}")
+        return obj[0] if obj else None
+
+    def read_file(self, commit_sha: str, path: str) -> Optional[bytes]:
+        obj = self.read_object(f"{commit_sha}:{path.strip('/')}")
+        if obj is None or obj[1] != 'blob':
+            return None
+        return obj[2]
+
+    def iter_blob(self, blob_sha: str, start: int = 0, end: Optional[int] = None,
+                  chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """
+        Yield bytes [start, end) of a blob in chunks. Uses its own `git
+        cat-file blob` process so a large file neither passes through memory
+        at once nor holds up the shared batch process.
+        """
+        process = subprocess.Popen(
+            ['git', '--git-dir', self.path, 'cat-file', 'blob', blob_sha],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        try:
+            position = 0
+            while end is None or position < end:
+                chunk = process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                chunk_end = position + len(chunk)
+                if chunk_end > start:
+                    yield chunk[max(0, start - position):len(chunk) if end is None else min(len(chunk), end - position)]
+                position = chunk_end
+        finally:
+            process.kill()
+            process.wait()
+
+    def tree_entries(self, commit_sha: str) -> List[Dict[str, Any]]:
+        """List every entry of a commit's tree in the shape of GitHub's git tree API"""
+        entries = self._trees.get(commit_sha)
+        if entries is not None:
+            self._trees.move_to_end(commit_sha)
+            return entries
+        output = self._run('ls-tree', '-r', '-t', '-l', '-z', commit_sha)
+        entries = []
+        for record in output.split(b'\0'):
+            if not record:
+                continue
+            meta, _, path = record.partition(b'\t')
+            mode, obj_type, sha, size = meta.split()
+            entry = {
+                'path': path.decode('utf-8', errors='replace'),
+                'mode': mode.decode(),
+                'type': obj_type.decode(),
+                'sha': sha.decode()
+            }
+            if size != b'-':
+                entry['size'] = int(size)
+            entries.append(entry)
+        self._trees[commit_sha] = entries
+        while len(self._trees) > self.max_trees:
+            self._trees.popitem(last=False)
+        return entries
+
+    def iter_commits(self, ref: Optional[str] = None, since: Optional[int] = None,
+                     until: Optional[int] = None, path: Optional[str] = None,
+                     author: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Walk history from a ref, newest committer date first (like `git log`),
+        reading each commit through the cat-file process.
+
+        since/until are Unix timestamps compared with the committer date; the
+        walk stops at the first commit older than `since`. `path` keeps only
+        commits that change that file or directory relative to their parents
+        and `author` matches the author's name or email, case-insensitively.
+        """
+        start = self.resolve(ref)
+        if start is None:
+            return
+        path = path.strip('/') if path else None
+        author = author.lower() if author else None
+        seen = {start}
+        heap = []
+        commit = self._parse_commit(start)
+        if commit:
+            heapq.heappush(heap, (-commit['committed_at'], start, commit))
+        while heap:
+            _, sha, commit = heapq.heappop(heap)
+            if since is not None and commit['committed_at'] < since:
+                return
+            if self._matches(commit, until, path, author):
+                yield commit
+            for parent in commit['parents']:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                parent_commit = self._parse_commit(parent)
+                if parent_commit:
+                    heapq.heappush(heap, (-parent_commit['committed_at'], parent, parent_commit))
+
+    def _matches(self, commit: Dict[str, Any], until: Optional[int], path: Optional[str],
+                 author: Optional[str]) -> bool:
+        if until is not None and commit['committed_at'] > until:
+            return False
+        if author is not None:
+            info = commit.get('author') or {}
+            if author not in (info.get('name', '').lower(), info.get('email', '').lower()):
+                return False
+        if path is not None:
+            current = self._path_sha(commit['tree'], path)
+            if not commit['parents']:
+                return current is not None
+            # Changed relative to every parent, like git log's history simplification
+            for parent in commit['parents']:
+                parent_commit = self._parse_commit(parent)
+                if parent_commit and self._path_sha(parent_commit['tree'], path) == current:
+                    return False
+        return True
+
+    def _path_sha(self, tree_sha: Optional[str], path: str) -> Optional[str]:
+        """Object SHA at a path inside a tree, reading only the trees along the way"""
+        for name in path.split('/'):
+            if tree_sha is None:
+                return None
+            obj = self.read_object(tree_sha)
+            if obj is None or obj[1] != 'tree':
+                return None
+            tree_sha = _find_tree_entry(obj[2], name.encode('utf-8'))
+        return tree_sha
+
+    def _parse_commit(self, sha: str) -> Optional[Dict[str, Any]]:
+        obj = self.read_object(sha)
+        if obj is None or obj[1] != 'commit':
+            return None
+        raw_headers, _, message = obj[2].partition(b'\n\n')
+        commit = {'sha': sha, 'tree': None, 'parents': [], 'committed_at': 0}
+        for line in raw_headers.split(b'\n'):
+            key, _, value = line.partition(b' ')
+            if key == b'tree':
+                commit['tree'] = value.decode()
+            elif key == b'parent':
+                commit['parents'].append(value.decode())
+            elif key in (b'author', b'committer'):
+                name, _, rest = value.decode('utf-8', errors='replace').rpartition(' <')
+                email, _, stamp = rest.partition('> ')
+                timestamp = int(stamp.split()[0]) if stamp else 0
+                commit[key.decode()] = {'name': name, 'email': email, 'timestamp': timestamp}
+                if key == b'committer':
+                    commit['committed_at'] = timestamp
+        commit['message'] = message.decode('utf-8', errors='replace').rstrip('\n')
+        return commit
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        if self._batch is not None:
+            try:
+                self._batch.stdin.close()
+                self._batch.wait(timeout=5)
+            except Exception:
+                self._batch.kill()
+            self._batch = None
+
+
+def _find_tree_entry(data: bytes, name: bytes) -> Optional[str]:
+    """Find an entry in a raw tree object ("<mode> <name>\\0<20-byte sha>" records)"""
+    pos = 0
+    while pos < len(data):
+        space = data.index(b' ', pos)
+        nul = data.index(b'\0', space)
+        if data[space + 1:nul] == name:
+            return data[nul + 1:nul + 21].hex()
+        pos = nul + 21
+    return None
+
+
+def format_commit(commit: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a parsed commit like the entries returned by get_commit_history"""
+    author = commit.get('author') or {}
+    return {
+        'sha': commit['sha'],
+        'author': author.get('name', ''),
+        'date': datetime.fromtimestamp(author.get('timestamp', 0), timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'message': commit['message']
+    }
+
+
+class GitMirrorStore:
+    """Mirrors kept under one base directory, one per (owner, repo)"""
+
+    def __init__(self, base_dir: str, url_template: str, auth_token: Optional[str] = None,
+                 refresh_interval: float = 300):
+        self.base_dir = os.path.expanduser(base_dir)
+        self.url_template = url_template
+        self.auth_token = auth_token
+        self.refresh_interval = refresh_interval
+        self._mirrors: Dict[Tuple[str, str], GitMirror] = {}
+        self._lock = threading.Lock()
+
+    def get(self, owner: str, repo: str) -> GitMirror:
+        """Return the mirror for a repository, cloning or refreshing it as needed (blocking)"""
+        with self._lock:
+            mirror = self._mirrors.get((owner, repo))
+            if mirror is None:
+                mirror = GitMirror(
+                    self.url_template.format(owner=owner, repo=repo),
+                    os.path.join(self.base_dir, owner, f"{repo}.git"),
+                    self.auth_token
+                )
+                self._mirrors[(owner, repo)] = mirror
+        if not os.path.exists(os.path.join(mirror.path, 'HEAD')):
+            mirror.ensure()
+        else:
+            mirror.refresh_if_stale(self.refresh_interval)
+        return mirror
+
+    def close(self):
+        with self._lock:
+            for mirror in self._mirrors.values():
+                mirror.close()
@@ -0,0 +1,244 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from .lru_cache import ByteLRUCache
+
+_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+class CachedResponse:
+    """
+    Response served from the cache.
+
+    Exposes the subset of the requests/httpx response interface that the
+    GitHub services use (status_code, headers, content, text, json()).
+    """
+
+    def __init__(self, entry: Dict[str, Any]):
+        self._entry = entry
+        self.status_code = 200
+        self.headers = entry.get('headers', {})
+        self.from_cache = True
+
+    @property
+    def content(self) -> bytes:
+        return self._entry['body']
+
+    @property
+    def text(self) -> str:
+        return self._entry['body'].decode('utf-8', errors='replace')
+
+    def json(self):
+        # Parsed afresh each time, so no caller can change what others get
+        return json.loads(self._entry['body'])
+
+
+def classify_endpoint(url: str) -> Tuple[str, bool]:
+    """
+    Classify an API URL into a cache endpoint name.
+    Returns (endpoint, immutable) where immutable is True for objects
+    addressed by a full SHA, which can never change.
+    """
+    path = urlsplit(url).path
+    parts = [p for p in path.split('/') if p]
+    if len(parts) < 3 or parts[0] != 'repos':
+        return 'default', False
+    if len(parts) == 3:
+        return 'repo', False
+    section = parts[3]
+    if section == 'git' and len(parts) > 5 and parts[4] == 'trees':
+        return 'tree', bool(_SHA_RE.match(parts[5]))
+    if section == 'contents':
+        return 'contents', False
+    if section == 'commits':
+        return 'commits', len(parts) > 4 and bool(_SHA_RE.match(parts[4]))
+    return 'default', False
+
+
+class GitHubResponseCache:
+    """
+    Conditional-request cache for GitHub API GET responses.
+
+    Bodies are stored with their ETag/Last-Modified validators in a
+    byte-bounded LRU, optionally backed by a directory on disk. Fresh entries
+    (within their endpoint TTL) are served without a request; stale entries
+    are revalidated with If-None-Match / If-Modified-Since, and a 304 (which
+    does not count against the rate limit) is answered from the cache.
+    Disk reads and writes run in worker threads, off the event loop.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttls: Optional[Dict[str, float]] = None,
+        immutable_ttl: float = 86400,
+        disk_dir: Optional[str] = None
+    ):
+        self.memory = ByteLRUCache(max_bytes, sizeof=lambda entry: len(entry['body']))
+        self.ttls = ttls or {}
+        self.immutable_ttl = immutable_ttl
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]] = None,
+                 headers: Optional[Dict[str, str]] = None) -> str:
+        key = url
+        if params:
+            key += '?' + urlencode(sorted(params.items()))
+        accept = (headers or {}).get('Accept')
+        if accept:
+            key += '#' + accept
+        return key
+
+    def ttl_for(self, url: str) -> float:
+        endpoint, immutable = classify_endpoint(url)
+        if immutable:
+            return self.immutable_ttl
+        return self.ttls.get(endpoint, self.ttls.get('default', 0))
+
+    async def lookup(self, key: str, url: str) -> Tuple[Optional[CachedResponse], Dict[str, str]]:
+        """
+        Look up a request before it is sent.
+        Returns (response, conditional_headers): a CachedResponse if the entry
+        is still fresh, otherwise the validator headers to revalidate with.
+        """
+        entry = await self._get_entry(key)
+        if entry is None:
+            return None, {}
+
+        if time.time() - entry['stored_at'] < self.ttl_for(url):
+            self._count('hits')
+            return CachedResponse(entry), {}
+
+        conditional = {}
+        if entry.get('etag'):
+            conditional['If-None-Match'] = entry['etag']
+        elif entry.get('last_modified'):
+            conditional['If-Modified-Since'] = entry['last_modified']
+        return None, conditional
+
+    async def update(self, key: str, status_code: int, headers, body: bytes):
+        """
+        Record the upstream response for a request.
+        Returns a CachedResponse to use in place of a 304, otherwise None;
+        a 304 whose entry was evicted meanwhile also gives None, and the
+        request has to be repeated without validators.
+        """
+        if status_code == 304:
+            entry = await self._get_entry(key)
+            if entry is not None:
+                self._count('not_modified')
+                entry['stored_at'] = time.time()
+                await self._persist(key, entry)
+                return CachedResponse(entry)
+            return None
+
+        self._count('misses')
+        if status_code != 200:
+            return None
+
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        entry = {
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': time.time(),
+            'headers': {
+                k: v for k, v in headers.items()
+                if k.lower() in ('content-type', 'etag', 'last-modified', 'link')
+            }
+        }
+        self.memory.set(key, entry)
+        await self._persist(key, entry)
+        return None
+
+    def clear(self):
+        self.memory.clear()
+
+    async def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.memory.get(key)
+        if entry is None and self.disk_dir:
+            entry = await asyncio.to_thread(self._load_from_disk, key)
+        return entry
+
+    async def _persist(self, key: str, entry: Dict[str, Any]):
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_to_disk, key, entry)
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, digest[:2], f"{digest}.json")
+
+    def _load_from_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if stored.get('key') != key or 'body_b64' not in stored:
+            return None
+        entry = {
+            'body': base64.b64decode(stored['body_b64']),
+            'etag': stored.get('etag'),
+            'last_modified': stored.get('last_modified'),
+            'stored_at': stored.get('stored_at', 0),
+            'headers': stored.get('headers', {})
+        }
+        self._count('disk_hits')
+        self.memory.set(key, entry)
+        return entry
+
+    def _write_to_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'key': key,
+                    # Bodies may be raw file bytes, which need not be UTF-8
+                    'body_b64': base64.b64encode(entry['body']).decode('ascii'),
+                    'etag': entry.get('etag'),
+                    'last_modified': entry.get('last_modified'),
+                    'stored_at': entry['stored_at'],
+                    'headers': entry.get('headers', {})
+                }, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing GitHub cache entry: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.not_modified
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "disk_hits": self.disk_hits,
+            "hit_ratio": round((self.hits + self.not_modified) / lookups, 4) if lookups else 0.0,
+            "rate_limit_saved": self.hits + self.not_modified,
+            **self.memory.stats()
+        }
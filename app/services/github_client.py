@@ -0,0 +1,182 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ..config import Config
+from .github_cache import GitHubResponseCache
+from .singleflight import flights
+
+GITHUB_API_URL = "https://api.github.com"
+
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_delay(status_code: int, headers, attempt: int, backoff_factor: float) -> Optional[float]:
+    """
+    Return how long to wait before retrying a response, or None if it should
+    not be retried. GitHub signals secondary rate limits with a 403 (or 429)
+    carrying a Retry-After header, so 403 is only retried when that header
+    is present.
+    """
+    retry_after = headers.get('Retry-After')
+    if status_code not in RETRY_STATUS_CODES and not (status_code == 403 and retry_after):
+        return None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return backoff_factor * (2 ** attempt)
+
+
+class AsyncGitHubClient:
+    """
+    Shared HTTP client for the GitHub REST API, built on httpx.AsyncClient.
+
+    Keeps one pool of keep-alive connections so repeated calls reuse TCP/TLS
+    connections, and a slow GitHub call only suspends the awaiting request
+    instead of blocking the whole event loop.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str],
+        base_url: str = GITHUB_API_URL,
+        pool_size: int = 20,
+        timeout: float = 15.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache: Optional[GitHubResponseCache] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        headers = {
+            'Accept': 'application/vnd.github+json',
+            'User-Agent': 'GitSage'
+        }
+        if token:
+            headers['Authorization'] = f'token {token}'
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size
+            ),
+            follow_redirects=True,
+            # Tests and benchmarks pass an httpx.MockTransport in place of GitHub
+            transport=transport
+        )
+
+    def url(self, path: str) -> str:
+        """Build an absolute API URL from a path such as /repos/{owner}/{repo}"""
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None, cache: bool = True):
+        """
+        Issue a GET request, retrying with backoff on 5xx and rate-limit responses.
+        Responses are served from / stored in the response cache unless cache=False.
+        """
+        url = self.url(path)
+        # Identical concurrent requests share one round trip
+        key = GitHubResponseCache.make_key(url, params, headers)
+        return await flights.do_async(('GET', key, cache), self._get, url, key, params, headers, cache)
+
+    async def _get(self, url, key, params, headers, cache):
+        if not (cache and self.cache is not None):
+            return await self._send(url, params, headers)
+
+        cached, conditional = await self.cache.lookup(key, url)
+        if cached is not None:
+            return cached
+        response = await self._send(url, params, {**(headers or {}), **conditional})
+        cached = await self.cache.update(key, response.status_code, response.headers, response.content)
+        if cached is None and response.status_code == 304:
+            # The entry was evicted while revalidating; fetch it again in full
+            response = await self._send(url, params, headers)
+            cached = await self.cache.update(key, response.status_code, response.headers, response.content)
+        return cached or response
+
+    def stream(self, path: str, params: Optional[Dict[str, Any]] = None,
+               headers: Optional[Dict[str, str]] = None):
+        """Open a streamed GET response (used for archives and raw files, never cached)"""
+        return self.client.stream('GET', self.url(path), params=params, headers=headers)
+
+    async def _send(self, url: str, params: Optional[Dict[str, Any]],
+                    headers: Optional[Dict[str, str]]) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.get(url, params=params, headers=headers)
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                attempt += 1
+                continue
+
+            delay = retry_delay(response.status_code, response.headers, attempt, self.backoff_factor)
+            if delay is None or attempt >= self.max_retries:
+                return response
+            await response.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_async_client: Optional[AsyncGitHubClient] = None
+_cache: Optional[GitHubResponseCache] = None
+_client_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[GitHubResponseCache]:
+    """Return the shared response cache, or None if disabled"""
+    global _cache
+    if _cache is None and Config.GITHUB_CACHE_ENABLED:
+        with _client_lock:
+            if _cache is None:
+                _cache = GitHubResponseCache(
+                    max_bytes=Config.GITHUB_CACHE_MAX_BYTES,
+                    ttls=Config.GITHUB_CACHE_TTLS,
+                    immutable_ttl=Config.GITHUB_CACHE_IMMUTABLE_TTL,
+                    disk_dir=Config.GITHUB_CACHE_DIR or None
+                )
+    return _cache
+
+
+def get_async_client() -> AsyncGitHubClient:
+    """Return the process-wide async GitHub client, creating it on first use"""
+    global _async_client
+    if _async_client is None:
+        cache = get_response_cache()
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncGitHubClient(
+                    token=Config.GITHUB_TOKEN,
+                    base_url=Config.GITHUB_API_URL,
+                    pool_size=Config.GITHUB_POOL_SIZE,
+                    timeout=Config.GITHUB_TIMEOUT,
+                    max_retries=Config.GITHUB_MAX_RETRIES,
+                    backoff_factor=Config.GITHUB_BACKOFF_FACTOR,
+                    cache=cache
+                )
+    return _async_client
+
+
+async def close_clients():
+    """Close pooled connections held by the shared client"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -1,32 +1,59 @@
-import requests
-import base64
+import httpx
+from .github_client import get_async_client
+from .snapshot_backend import SnapshotArchive, SnapshotStore
+from .git_mirror import GitMirror, GitMirrorError, GitMirrorStore, format_commit
+from .analysis_cache import AnalysisCache
+from .singleflight import coalesced
+from .tree_index import CompactTree
+from .file_types import classify_entry, is_likely_binary_file, sniff
+from .symbol_outline import OUTLINE_VERSION, build_outline, outline_language
+from .code_metrics import ANALYZER_VERSION, analyze_source, get_process_pool, reset_process_pool
 from ..config import Config
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+import asyncio
+import itertools
+import json
 import re
-from collections import defaultdict
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-def get_repo_info(owner: str, repo: str):
+_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+RAW_HEADERS = {'Accept': 'application/vnd.github.raw'}
+_snapshot_store: Optional[SnapshotStore] = None
+_mirror_store: Optional[GitMirrorStore] = None
+_analysis_cache: Optional[AnalysisCache] = None
+_tree_indexes: 'OrderedDict[Tuple[str, str, str], Tuple[Dict[str, Any], CompactTree]]' = OrderedDict()
+_file_classes: 'OrderedDict[str, Tuple[bool, str]]' = OrderedDict()
+
+# Bump when the dependency extraction output changes
+DEPENDENCY_PARSER_VERSION = 1
+
+class FileStreamError(Exception):
+    """The backend could not deliver a file's bytes"""
+
+async def get_repo_info(owner: str, repo: str):
     """Get repository information"""
-    headers = {'Authorization': f'token {Config.GITHUB_TOKEN}'}
-    url = f'https://api.github.com/repos/{owner}/{repo}'
-    
-    response = requests.get(url, headers=headers)
+    try:
+        response = await get_async_client().get(f'/repos/{owner}/{repo}')
+    except httpx.HTTPError:
+        return {"error": "Unable to reach GitHub"}, 502
     if response.status_code != 200:
         return {"error": "Repository not found"}, 404
     return response.json()
 
-def get_repo_contents(owner: str, repo: str, path: str = ""):
+async def get_repo_contents(owner: str, repo: str, path: str = ""):
     """Get repository contents"""
-    headers = {'Authorization': f'token {Config.GITHUB_TOKEN}'}
-    url = f'https://api.github.com/repos/{owner}/{repo}/contents/{path}'
-    
-    response = requests.get(url, headers=headers)
+    try:
+        response = await get_async_client().get(f'/repos/{owner}/{repo}/contents/{path}')
+    except httpx.HTTPError:
+        return []
     if response.status_code != 200:
         return []
     return response.json()
 
-def read_file_content(owner: str, repo: str, path: str):
+@coalesced('read_file_content')
+async def read_file_content(owner: str, repo: str, path: str, ref: Optional[str] = None):
     """
     Read file content from GitHub
     Returns:
@@ -34,221 +61,766 @@ def read_file_content(owner: str, repo: str, path: str):
     - For binary files: a dict with metadata including size and download_url
     - None if file not found
     """
-    headers = {'Authorization': f'token {Config.GITHUB_TOKEN}'}
-    url = f'https://api.github.com/repos/{owner}/{repo}/contents/{path}'
-    
+    if is_likely_binary_file(path):
+        # Metadata comes from the tree; the content is never downloaded
+        binary_info = await describe_binary_file(owner, repo, path, ref)
+        if binary_info is not None:
+            return binary_info
+
+    backend = get_repo_backend(owner, repo)
+    if backend == 'mirror':
+        mirror = await get_mirror(owner, repo)
+        if mirror is not None:
+            commit_sha = await asyncio.to_thread(mirror.resolve, ref)
+            if commit_sha is None:
+                return None
+            data = await asyncio.to_thread(mirror.read_file, commit_sha, path)
+            if data is None:
+                return None
+            return _decode_file(owner, repo, commit_sha, path, data)
+
+    if backend == 'snapshot':
+        snapshot = await get_snapshot(owner, repo, ref)
+        if snapshot is not None:
+            data = await asyncio.to_thread(snapshot.read_file, path)
+            if data is None:
+                return None
+            return _decode_file(owner, repo, snapshot.commit_sha, path, data)
+
     try:
-        response = requests.get(url, headers=headers)
+        params = {'ref': ref} if ref else None
+        # Files come as raw bytes rather than base64 inside JSON,
+        # which is a third smaller and also works for files over 1 MB
+        response = await get_async_client().get(
+            f'/repos/{owner}/{repo}/contents/{path}', params=params, headers=RAW_HEADERS
+        )
         if response.status_code != 200:
             return None
-        
-        content = response.json()
-        
-        # Check if it's a binary file based on common extensions
-        if is_likely_binary_file(path):
-            # For binary files, return metadata instead of content
-            return {
-                "is_binary": True,
-                "size": content.get('size', 0),
-                "name": content.get('name', ''),
-                "download_url": content.get('download_url', ''),
-                "type": get_file_type(path),
-                "encoding": content.get('encoding', '')
-            }
-        
-        # For text files, try to decode the content
-        try:
-            if 'content' in content:
-                return base64.b64decode(content['content']).decode('utf-8')
-        except UnicodeDecodeError:
-            # If we can't decode as UTF-8, it's probably a binary file
-            return {
-                "is_binary": True,
-                "size": content.get('size', 0),
-                "name": content.get('name', ''),
-                "download_url": content.get('download_url', ''),
-                "type": "binary",
-                "encoding": content.get('encoding', '')
-            }
-        
-        return None
+        if response.headers.get('content-type', '').startswith('application/json'):
+            # Directories are still answered with a JSON listing
+            return None
+        return _decode_file(owner, repo, ref or 'HEAD', path, response.content)
     except Exception as e:
         print(f"Error reading file content: {e}")
         return None
 
-def is_likely_binary_file(path: str) -> bool:
-    """
-    Check if a file is likely binary based on its extension
-    """
-    binary_extensions = [
-        # Images
-        '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.svg', '.webp',
-        # Audio
-        '.mp3', '.wav', '.ogg', '.m4a',
-        # Video
-        '.mp4', '.avi', '.mov', '.mkv', '.webm',
-        # Documents
-        '.pdf', '.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx',
-        # Archives
-        '.zip', '.rar', '.tar', '.gz', '.7z',
-        # Compiled
-        '.exe', '.dll', '.so', '.class', '.pyc',
-        # Other binary
-        '.bin', '.dat', '.iso', '.img',
-        # ML models and data
-        '.pkl', '.model', '.onnx', '.pb'
-    ]
-    
-    return any(path.lower().endswith(ext) for ext in binary_extensions)
-
-def get_file_type(path: str) -> str:
-    """
-    Get the general file type based on extension
-    """
-    ext = path.lower().split('.')[-1] if '.' in path else ''
-    
-    # Images
-    if ext in ['jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg', 'webp']:
-        return 'image'
-    # Audio
-    elif ext in ['mp3', 'wav', 'ogg', 'm4a']:
-        return 'audio'
-    # Video
-    elif ext in ['mp4', 'avi', 'mov', 'mkv', 'webm']:
-        return 'video'
-    # Documents
-    elif ext in ['pdf', 'doc', 'docx', 'ppt', 'pptx', 'xls', 'xlsx']:
-        return 'document'
-    # Archives
-    elif ext in ['zip', 'rar', 'tar', 'gz', '7z']:
-        return 'archive'
-    # Other binary files
+def _raw_url(owner: str, repo: str, ref: str, path: str) -> str:
+    return f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{path}"
+
+def _decode_file(owner: str, repo: str, commit_sha: str, path: str, data: bytes):
+    """Decode downloaded file bytes, or describe them if they turn out to be binary"""
+    download_url = _raw_url(owner, repo, commit_sha, path)
+    sniff_bytes = Config.FILE_SNIFF_BYTES
+    is_binary, file_type = sniff(data[:sniff_bytes], complete=len(data) <= sniff_bytes)
+    if is_binary:
+        return _binary_file_info(path, len(data), download_url, file_type)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return _binary_file_info(path, len(data), download_url, "binary")
+
+async def stat_file(owner: str, repo: str, path: str, ref: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Size, mode and blob SHA of a file from the cached tree, or None if there is no such file"""
+    tree_data, tree = await get_tree_index(owner, repo, ref)
+    node = tree.find(path)
+    if node is None or tree.is_dir(node):
+        return None
+    return {
+        'path': tree.path(node),
+        'size': tree.size(node),
+        'sha': tree.sha(node),
+        'mode': tree.mode(node),
+        'ref': tree_data['ref']
+    }
+
+async def classify_file(owner: str, repo: str, path: str, ref: Optional[str] = None,
+                        sniff_small: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    stat_file plus whether the file is binary and its general type, decided
+    as cheaply as possible: from the tree entry's mode, size and extension,
+    and only if those are not enough from its first FILE_SNIFF_BYTES
+    fetched as a range. Results are cached per blob SHA.
+
+    Callers about to read the file anyway pass sniff_small=False: files
+    under FILE_SNIFF_MIN_SIZE are then not sniffed, and come back with
+    `is_binary` and `type` None for _decode_file to classify once read.
+    """
+    info = await stat_file(owner, repo, path, ref)
+    if info is None:
+        return None
+    info['download_url'] = _raw_url(owner, repo, info['ref'] or 'HEAD', info['path'])
+    blob_sha = info['sha']
+    result = _file_classes.get(blob_sha) if blob_sha else None
+    if result is not None:
+        _file_classes.move_to_end(blob_sha)
     else:
-        return 'binary'
+        result = classify_entry(path, info['mode'], info['size'])
+        if result is None and not sniff_small and info['size'] < Config.FILE_SNIFF_MIN_SIZE:
+            # A ranged sniff followed by a full read would fetch the file twice
+            info['is_binary'] = info['type'] = None
+            return info
+        if result is None:
+            head = bytearray()
+            try:
+                async for chunk in iter_file_bytes(owner, repo, path, ref, 0, Config.FILE_SNIFF_BYTES, blob_sha):
+                    head += chunk
+            except FileStreamError as e:
+                print(f"Error sniffing {owner}/{repo}/{path}: {e}")
+                # Sniff what arrived, but do not cache a guess made from a failed read
+                blob_sha = None
+            result = sniff(bytes(head), complete=info['size'] <= len(head))
+        if blob_sha:
+            _file_classes[blob_sha] = result
+            while len(_file_classes) > Config.FILE_CLASS_CACHE_SIZE:
+                _file_classes.popitem(last=False)
+    info['is_binary'], info['type'] = result
+    return info
 
-def get_directory_tree(owner, repo):
-    """Get complete directory structure of the repository"""
-    headers = {'Authorization': f'token {Config.GITHUB_TOKEN}'}
-    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/main?recursive=1"
-    
+async def describe_binary_file(owner: str, repo: str, path: str, ref: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Binary file metadata if classify_file finds the file binary without
+    sniffing a small file, else None; small files are classified when read.
+    """
+    info = await classify_file(owner, repo, path, ref, sniff_small=False)
+    if info is None or not info['is_binary']:
+        return None
+    return _binary_file_info(path, info['size'], info['download_url'], info['type'])
+
+async def iter_file_bytes(owner: str, repo: str, path: str, ref: Optional[str] = None,
+                          start: int = 0, end: Optional[int] = None,
+                          blob_sha: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Yield bytes [start, end) of a file in chunks of at most
+    RAW_FILE_CHUNK_BYTES, so memory per reader stays constant whatever the
+    file size. Mirrors stream the blob from git, snapshots read the range
+    from the archive, and the API backend streams the raw blob from GitHub.
+    Raises FileStreamError if the file cannot be read before any bytes are
+    yielded.
+    """
+    chunk_size = Config.RAW_FILE_CHUNK_BYTES
+    backend = get_repo_backend(owner, repo)
+    if blob_sha is None and backend != 'snapshot':
+        info = await stat_file(owner, repo, path, ref)
+        if info is None:
+            raise FileStreamError(f"{path} not found")
+        blob_sha = info['sha']
+
+    if backend == 'mirror':
+        mirror = await get_mirror(owner, repo)
+        if mirror is not None:
+            chunks = mirror.iter_blob(blob_sha, start, end, chunk_size)
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        return
+                    yield chunk
+            finally:
+                await asyncio.to_thread(chunks.close)
+
+    if backend == 'snapshot':
+        snapshot = await get_snapshot(owner, repo, ref)
+        if snapshot is not None:
+            position = start
+            while end is None or position < end:
+                chunk_end = position + chunk_size if end is None else min(position + chunk_size, end)
+                chunk = await asyncio.to_thread(snapshot.read_range, path, position, chunk_end)
+                if not chunk:
+                    return
+                yield chunk
+                position += len(chunk)
+            return
+
+    # GitHub may ignore the Range header, in which case the prefix is skipped here
+    headers = dict(RAW_HEADERS)
+    if start or end is not None:
+        headers['Range'] = f"bytes={start}-{'' if end is None else end - 1}"
+    async with get_async_client().stream(f'/repos/{owner}/{repo}/git/blobs/{blob_sha}', headers=headers) as response:
+        if response.status_code not in (200, 206):
+            raise FileStreamError(f"GitHub answered HTTP {response.status_code} for {path}")
+        position = start if response.status_code == 206 else 0
+        async for chunk in response.aiter_bytes(chunk_size):
+            chunk_end = position + len(chunk)
+            if chunk_end > start:
+                yield chunk[max(0, start - position):len(chunk) if end is None else max(0, min(len(chunk), end - position))]
+            position = chunk_end
+            if end is not None and position >= end:
+                return
+
+def _binary_file_info(path: str, size: int, download_url: str, file_type: str, encoding: str = '') -> Dict[str, Any]:
+    """Metadata returned in place of the content of a binary file"""
+    return {
+        "is_binary": True,
+        "size": size,
+        "name": path.rsplit('/', 1)[-1],
+        "download_url": download_url or '',
+        "type": file_type,
+        "encoding": encoding
+    }
+
+def get_repo_backend(owner: str, repo: str) -> str:
+    """Name of the backend serving a repository's files ('api', 'snapshot' or 'mirror')"""
+    return (
+        Config.REPO_BACKENDS.get(f"{owner}/{repo}")
+        or Config.REPO_BACKENDS.get(f"{owner}/*")
+        or Config.REPO_BACKEND
+    )
+
+def get_snapshot_store() -> SnapshotStore:
+    """Return the process-wide snapshot store, creating it on first use"""
+    global _snapshot_store
+    if _snapshot_store is None:
+        _snapshot_store = SnapshotStore(Config.SNAPSHOT_DIR, max_bytes=Config.SNAPSHOT_MAX_BYTES)
+    return _snapshot_store
+
+def get_mirror_store() -> GitMirrorStore:
+    """Return the process-wide git mirror store, creating it on first use"""
+    global _mirror_store
+    if _mirror_store is None:
+        _mirror_store = GitMirrorStore(
+            Config.GIT_MIRROR_DIR,
+            Config.GIT_MIRROR_URL,
+            auth_token=Config.GITHUB_TOKEN,
+            refresh_interval=Config.GIT_MIRROR_REFRESH_INTERVAL
+        )
+    return _mirror_store
+
+async def get_mirror(owner: str, repo: str) -> Optional[GitMirror]:
+    """Get the local mirror of a repository, cloning or fetching it when needed"""
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            tree_data = response.json()
-            tree = []
-            for item in tree_data.get('tree', []):
-                path_parts = item['path'].split('/')
-                current_level = tree
-                for i, part in enumerate(path_parts):
-                    # Find or create node at current level
-                    node = next((n for n in current_level if n['name'] == part), None)
-                    if node is None:
-                        node = {
-                            'name': part,
-                            'path': '/'.join(path_parts[:i+1]),
-                            'type': 'file' if i == len(path_parts)-1 and item['type'] == 'blob' else 'dir',
-                            'children': []
-                        }
-                        current_level.append(node)
-                    current_level = node['children']
-            return tree
-        return []
-    except requests.exceptions.RequestException:
-        return []
+        return await asyncio.to_thread(get_mirror_store().get, owner, repo)
+    except GitMirrorError as e:
+        print(f"Error preparing mirror for {owner}/{repo}: {e}")
+        return None
+
+def get_analysis_cache() -> AnalysisCache:
+    """Return the process-wide per-blob analysis cache"""
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache(
+            max_bytes=Config.ANALYSIS_CACHE_MAX_BYTES,
+            db_path=Config.ANALYSIS_CACHE_PATH or None
+        )
+    return _analysis_cache
+
+def close_backends():
+    """Stop the long-lived git processes and analysis workers"""
+    if _mirror_store is not None:
+        _mirror_store.close()
+    reset_process_pool()
+
+async def get_snapshot(owner: str, repo: str, ref: Optional[str] = None) -> Optional[SnapshotArchive]:
+    """Get the local snapshot of a repository at a ref, downloading it once per commit"""
+    commit_sha = await resolve_commit_sha(owner, repo, ref)
+    if commit_sha is None:
+        return None
+    return await get_snapshot_store().get(owner, repo, commit_sha, get_async_client())
+
+async def resolve_ref(owner: str, repo: str, ref: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve the ref to read the repository at.
+    An explicit branch, tag or SHA is used as given; otherwise the
+    repository's default branch is looked up (it is not always `main`).
+    """
+    if ref:
+        return ref
+    repo_info = await get_repo_info(owner, repo)
+    if isinstance(repo_info, tuple):
+        return None
+    return repo_info.get('default_branch') or 'main'
+
+async def resolve_commit_sha(owner: str, repo: str, ref: Optional[str] = None) -> Optional[str]:
+    """Resolve a ref (default branch if omitted) to the full commit SHA it points at"""
+    ref = await resolve_ref(owner, repo, ref)
+    if ref is None:
+        return None
+    if _SHA_RE.match(ref):
+        return ref
+    try:
+        response = await get_async_client().get(
+            f'/repos/{owner}/{repo}/commits/{ref}',
+            headers={'Accept': 'application/vnd.github.sha'}
+        )
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    sha = response.text.strip()
+    return sha if _SHA_RE.match(sha) else None
+
+@coalesced('get_tree_entries')
+async def get_tree_entries(owner: str, repo: str, ref: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get the flat list of git tree entries for a repository.
+    Returns a dict with:
+    - ref: the resolved ref
+    - sha: the root tree SHA (the commit SHA for snapshots and mirrors)
+    - commit: the commit SHA listed, or None if the API was given a branch or tag
+    - entries: GitHub tree items (path, type, mode, sha, size)
+    - truncated: True if some part of the listing could still not be fetched
+
+    GitHub truncates recursive listings of very large trees; when that
+    happens the tree is re-fetched subtree by subtree.
+    """
+    backend = get_repo_backend(owner, repo)
+    if backend == 'mirror':
+        mirror = await get_mirror(owner, repo)
+        if mirror is not None:
+            commit_sha = await asyncio.to_thread(mirror.resolve, ref)
+            if commit_sha is not None:
+                return {
+                    'ref': ref or commit_sha,
+                    'sha': commit_sha,
+                    'commit': commit_sha,
+                    'entries': await asyncio.to_thread(mirror.tree_entries, commit_sha),
+                    'truncated': False
+                }
+
+    if backend == 'snapshot':
+        snapshot = await get_snapshot(owner, repo, ref)
+        if snapshot is not None:
+            return {
+                'ref': ref or snapshot.commit_sha,
+                'sha': snapshot.commit_sha,
+                'commit': snapshot.commit_sha,
+                'entries': snapshot.tree_entries(),
+                'truncated': False
+            }
+
+    ref = await resolve_ref(owner, repo, ref)
+    result = {'ref': ref, 'sha': None, 'commit': ref if ref and _SHA_RE.match(ref) else None,
+              'entries': [], 'truncated': False}
+    if ref is None:
+        return result
 
-def analyze_complexity(owner, repo):
-    """Analyze code complexity of the repository"""
-    files = get_all_python_files(owner, repo)
-    complexity_data = {}
-    
-    for file_path in files:
-        content = read_file_content(owner, repo, file_path)
-        if content:
-            complexity_data[file_path] = {
-                'cyclomatic_complexity': calculate_cyclomatic_complexity(content),
-                'lines_of_code': len(content.splitlines()),
-                'functions': analyze_functions(content)
+    tree_data = await _fetch_tree(owner, repo, ref, recursive=True)
+    if tree_data is None:
+        return result
+    result['sha'] = tree_data.get('sha')
+
+    if not tree_data.get('truncated'):
+        result['entries'] = tree_data.get('tree', [])
+        return result
+
+    print(f"Tree listing for {owner}/{repo}@{ref} was truncated by GitHub, fetching per subtree")
+    semaphore = asyncio.Semaphore(Config.GITHUB_POOL_SIZE)
+    entries, truncated = await _fetch_subtrees(owner, repo, result['sha'] or ref, '', semaphore)
+    result['entries'] = entries
+    result['truncated'] = truncated
+    return result
+
+async def _fetch_tree(owner: str, repo: str, tree_ref: str, recursive: bool) -> Optional[Dict[str, Any]]:
+    params = {'recursive': 1} if recursive else None
+    try:
+        response = await get_async_client().get(f'/repos/{owner}/{repo}/git/trees/{tree_ref}', params=params)
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
+
+async def _fetch_subtrees(owner: str, repo: str, tree_sha: str, prefix: str,
+                          semaphore: asyncio.Semaphore) -> Tuple[List[Dict[str, Any]], bool]:
+    """List one tree level, then fetch each child tree recursively in parallel"""
+    async with semaphore:
+        level = await _fetch_tree(owner, repo, tree_sha, recursive=False)
+    if level is None:
+        return [], True
+
+    entries = []
+    subtrees = []
+    for item in level.get('tree', []):
+        item = {**item, 'path': prefix + item['path']}
+        entries.append(item)
+        if item['type'] == 'tree':
+            subtrees.append(item)
+
+    results = await asyncio.gather(*(
+        _fetch_subtree(owner, repo, item, semaphore) for item in subtrees
+    ))
+    truncated = bool(level.get('truncated'))
+    for sub_entries, sub_truncated in results:
+        entries.extend(sub_entries)
+        truncated = truncated or sub_truncated
+    return entries, truncated
+
+async def _fetch_subtree(owner: str, repo: str, item: Dict[str, Any],
+                         semaphore: asyncio.Semaphore) -> Tuple[List[Dict[str, Any]], bool]:
+    prefix = item['path'] + '/'
+    async with semaphore:
+        tree_data = await _fetch_tree(owner, repo, item['sha'], recursive=True)
+    if tree_data is None:
+        return [], True
+    if tree_data.get('truncated'):
+        # Still too large, descend one more level
+        return await _fetch_subtrees(owner, repo, item['sha'], prefix, semaphore)
+    return [{**entry, 'path': prefix + entry['path']} for entry in tree_data.get('tree', [])], False
+
+def build_tree(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build the nested directory tree from flat git tree entries.
+    Single pass: every directory node is indexed by path, so attaching a
+    child is a dict lookup regardless of directory fan-out.
+    """
+    tree = []
+    index = {}
+
+    def ensure_dir(path):
+        node = index.get(path)
+        if node is None:
+            parent, _, name = path.rpartition('/')
+            node = {'name': name, 'path': path, 'type': 'dir', 'children': []}
+            index[path] = node
+            (ensure_dir(parent)['children'] if parent else tree).append(node)
+        return node
+
+    for item in entries:
+        path = item['path']
+        if item['type'] == 'blob':
+            parent, _, name = path.rpartition('/')
+            node = {
+                'name': name,
+                'path': path,
+                'type': 'file',
+                'sha': item.get('sha'),
+                'size': item.get('size', 0),
+                'children': []
             }
-    
-    return complexity_data
+            (ensure_dir(parent)['children'] if parent else tree).append(node)
+        else:
+            node = ensure_dir(path)
+            node['sha'] = item.get('sha')
+    return tree
 
-def get_dependencies(owner, repo):
+async def get_directory_tree(owner, repo, ref: Optional[str] = None):
+    """Get complete directory structure of the repository"""
+    tree_data = await get_tree_entries(owner, repo, ref)
+    return build_tree(tree_data['entries'])
+
+@coalesced('get_tree_index')
+async def get_tree_index(owner: str, repo: str, ref: Optional[str] = None) -> Tuple[Dict[str, Any], CompactTree]:
+    """
+    Return (tree_data, CompactTree) for a ref, where tree_data holds the
+    ref, tree SHA, commit SHA and truncated flag but not the entries. Trees are built
+    once per commit and kept in a small LRU. On the api backend the ref is
+    resolved to its commit first, and since a commit's tree never changes a
+    known commit is answered without fetching or parsing its tree again.
+    """
+    commit_sha = None
+    if get_repo_backend(owner, repo) == 'api':
+        ref = await resolve_ref(owner, repo, ref)
+        commit_sha = await resolve_commit_sha(owner, repo, ref) if ref else None
+        cached = _tree_indexes.get((owner, repo, commit_sha)) if commit_sha else None
+        if cached is not None:
+            _tree_indexes.move_to_end((owner, repo, commit_sha))
+            # Several refs can point at the same commit
+            return {**cached[0], 'ref': ref}, cached[1]
+
+    tree_data = await get_tree_entries(owner, repo, commit_sha or ref)
+    ref = ref or tree_data['ref']
+    # Mirrors and snapshots report the commit SHA as the tree SHA
+    key = (owner, repo, commit_sha or tree_data['sha'])
+    cached = _tree_indexes.get(key)
+    if cached is not None:
+        _tree_indexes.move_to_end(key)
+        return {**cached[0], 'ref': ref}, cached[1]
+
+    index = await asyncio.to_thread(CompactTree, tree_data['entries'])
+    info = {
+        'ref': ref,
+        'sha': tree_data['sha'],
+        'commit': commit_sha or tree_data.get('commit'),
+        'truncated': tree_data['truncated']
+    }
+    if key[2]:
+        _tree_indexes[key] = (info, index)
+        while len(_tree_indexes) > Config.TREE_INDEX_CACHE_SIZE:
+            _tree_indexes.popitem(last=False)
+    return info, index
+
+class AnalysisProgress:
+    """Counters and failures of a running analysis, readable while it runs"""
+
+    def __init__(self):
+        self.files_total = 0
+        self.files_fetched = 0
+        self.files_analyzed = 0
+        self.files_cached = 0
+        self.failed: Dict[str, str] = {}
+        self.complete = False
+        # Per-file results so far, for reporting partial results
+        self.results: Dict[str, Any] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files_total": self.files_total,
+            "files_fetched": self.files_fetched,
+            "files_analyzed": self.files_analyzed,
+            "files_cached": self.files_cached,
+            "failed": dict(self.failed),
+            "complete": self.complete
+        }
+
+async def analyze_complexity(owner, repo, progress: Optional[AnalysisProgress] = None, ref: Optional[str] = None,
+                             timeout: Optional[float] = None):
+    """
+    Analyze code complexity of the repository.
+
+    Results are cached per blob SHA, so only files whose contents changed
+    since a previous analysis are fetched. Those are fetched concurrently
+    (bounded by ANALYSIS_FETCH_CONCURRENCY) and each one is analyzed in the
+    process pool as soon as it arrives, so analysis overlaps with the
+    remaining downloads. Files that time out or cannot be read are recorded
+    in `progress.failed`; if `timeout` (default ANALYSIS_TIMEOUT) expires
+    the partial result is returned.
+    """
+    progress = progress or AnalysisProgress()
+    tree_data, tree = await get_tree_index(owner, repo, ref)
+    file_entries = tree.files_with_extension('py')
+    # Read the commit the blob SHAs came from, so a branch moving mid-analysis
+    # cannot cache one version's metrics under another version's SHA
+    read_ref = tree_data['commit'] or ref
+    files = [path for path, _ in file_entries]
+    progress.files_total = len(files)
+    cache = get_analysis_cache()
+    complexity_data = progress.results
+    semaphore = asyncio.Semaphore(Config.ANALYSIS_FETCH_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+
+    async def process(file_path, blob_sha):
+        cached = await cache.get_async('complexity', ANALYZER_VERSION, blob_sha)
+        if cached is not None:
+            complexity_data[file_path] = cached
+            progress.files_cached += 1
+            progress.files_analyzed += 1
+            return
+
+        async with semaphore:
+            try:
+                content = await asyncio.wait_for(
+                    read_file_content(owner, repo, file_path, read_ref),
+                    timeout=Config.ANALYSIS_FILE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                progress.failed[file_path] = "timeout"
+                return
+            except Exception as e:
+                progress.failed[file_path] = str(e) or type(e).__name__
+                return
+        progress.files_fetched += 1
+        if not isinstance(content, str):
+            progress.failed[file_path] = "unreadable"
+            return
+        try:
+            result = await _run_analysis(loop, analyze_source, content)
+        except Exception as e:
+            progress.failed[file_path] = str(e) or type(e).__name__
+            return
+        await cache.set_async('complexity', ANALYZER_VERSION, blob_sha, result)
+        complexity_data[file_path] = result
+        progress.files_analyzed += 1
+
+    tasks = [asyncio.ensure_future(process(path, blob_sha)) for path, blob_sha in file_entries]
+    if tasks:
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=timeout or Config.ANALYSIS_TIMEOUT)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            for file_path in files:
+                if file_path not in complexity_data and file_path not in progress.failed:
+                    progress.failed[file_path] = "skipped"
+    progress.complete = True
+
+    # Keep tree order regardless of completion order
+    return {path: complexity_data[path] for path in files if path in complexity_data}
+
+async def _run_analysis(loop, func, *args) -> Dict[str, Any]:
+    """
+    Run a CPU-bound analysis function in the shared process pool. If the
+    pool breaks the call is retried once on a fresh pool; never in this
+    process, since the input may be what crashed the worker.
+    """
+    pool = get_process_pool(Config.ANALYSIS_WORKERS)
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        reset_process_pool(pool)
+        return await loop.run_in_executor(get_process_pool(Config.ANALYSIS_WORKERS), func, *args)
+
+async def get_file_outline(owner: str, repo: str, path: str, ref: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Symbol outline of a Python, JS/TS, Go or Java file, cached per blob SHA
+    so it is built once per version of the file. Returns None for missing,
+    binary or unsupported files.
+    """
+    language = outline_language(path)
+    if language is None:
+        return None
+    info = await stat_file(owner, repo, path, ref)
+    if info is None:
+        return None
+    blob_sha = info['sha']
+    cache = get_analysis_cache()
+    outline = await cache.get_async('outline', OUTLINE_VERSION, blob_sha) if blob_sha else None
+    if outline is None:
+        content = await read_file_content(owner, repo, path, ref)
+        if not isinstance(content, str):
+            return None
+        outline = await _run_analysis(asyncio.get_running_loop(), build_outline, content, language)
+        if blob_sha:
+            await cache.set_async('outline', OUTLINE_VERSION, blob_sha, outline)
+    return {'path': info['path'], 'sha': blob_sha, 'language': language, **outline}
+
+async def get_dependencies(owner, repo, ref: Optional[str] = None):
     """Extract dependencies from repository"""
+    _, tree = await get_tree_index(owner, repo, ref)
+    blob_shas = {}
+    for path in ('requirements.txt', 'package.json'):
+        node = tree.find(path)
+        if node is not None and not tree.is_dir(node):
+            blob_shas[path] = tree.sha(node)
+    python_deps, js_deps = await asyncio.gather(
+        get_python_dependencies(owner, repo, ref, blob_shas.get('requirements.txt')),
+        get_js_dependencies(owner, repo, ref, blob_shas.get('package.json'))
+    )
     dependencies = {
-        'python': get_python_dependencies(owner, repo),
-        'javascript': get_js_dependencies(owner, repo)
+        'python': python_deps,
+        'javascript': js_deps
     }
     return dependencies
 
-def get_commit_history(owner, repo):
-    """Get repository commit history"""
-    headers = {'Authorization': f'token {Config.GITHUB_TOKEN}'}
-    url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-    
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            commits = response.json()
-            return [{
+_LINK_NEXT_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+def _next_page_url(response) -> Optional[str]:
+    """URL of the next page from a response's Link header, if any"""
+    link = response.headers.get('link') or response.headers.get('Link')
+    match = _LINK_NEXT_RE.search(link) if link else None
+    return match.group(1) if match else None
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+async def iter_commit_history(
+    owner: str,
+    repo: str,
+    ref: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    path: Optional[str] = None,
+    author: Optional[str] = None,
+    per_page: int = 100
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield the repository's commits, newest first, fetching one page at a
+    time by following the Link header, so memory stays bounded however long
+    the history is and nothing past what the caller consumes is fetched.
+    Naive since/until datetimes are taken as UTC.
+    """
+    since, until = _utc(since), _utc(until)
+    if get_repo_backend(owner, repo) == 'mirror':
+        mirror = await get_mirror(owner, repo)
+        if mirror is not None:
+            commits = mirror.iter_commits(
+                ref,
+                since=int(since.timestamp()) if since else None,
+                until=int(until.timestamp()) if until else None,
+                path=path,
+                author=author
+            )
+            while True:
+                batch = await asyncio.to_thread(
+                    lambda: [format_commit(c) for c in itertools.islice(commits, per_page)]
+                )
+                for commit in batch:
+                    yield commit
+                if len(batch) < per_page:
+                    return
+
+    params = {'per_page': per_page}
+    for name, value in (('sha', ref), ('path', path), ('author', author)):
+        if value:
+            params[name] = value
+    for name, value in (('since', since), ('until', until)):
+        if value is not None:
+            params[name] = value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    url = f'/repos/{owner}/{repo}/commits'
+    while url:
+        try:
+            response = await get_async_client().get(url, params=params)
+        except httpx.HTTPError as e:
+            print(f"Error fetching commit history for {owner}/{repo}: {e}")
+            return
+        if response.status_code != 200:
+            return
+        for commit in response.json():
+            yield {
                 'sha': commit['sha'],
                 'author': commit['commit']['author']['name'],
                 'date': commit['commit']['author']['date'],
                 'message': commit['commit']['message']
-            } for commit in commits]
-        return []
-    except requests.exceptions.RequestException:
-        return []
+            }
+        # The next link already carries the query string
+        url = _next_page_url(response)
+        params = None
+
+async def get_commit_history(owner, repo, limit: int = 100, **filters):
+    """Get up to `limit` commits of the repository's history (see iter_commit_history for filters)"""
+    commits = []
+    history = iter_commit_history(owner, repo, per_page=min(limit, 100), **filters)
+    try:
+        async for commit in history:
+            commits.append(commit)
+            if len(commits) >= limit:
+                break
+    finally:
+        await history.aclose()
+    return commits
+
+async def get_python_file_entries(owner, repo, ref: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+    """Get (path, blob SHA) for every Python file in the repository"""
+    _, tree = await get_tree_index(owner, repo, ref)
+    return tree.files_with_extension('py')
 
-def get_all_python_files(owner, repo):
+async def get_all_python_files(owner, repo, ref: Optional[str] = None):
     """Get all Python files in the repository"""
-    tree = get_directory_tree(owner, repo)
-    python_files = []
-    
-    def traverse(node, files):
-        if node['type'] == 'file' and node['name'].endswith('.py'):
-            files.append(node['path'])
-        for child in node.get('children', []):
-            traverse(child, files)
-    
-    for node in tree:
-        traverse(node, python_files)
-    return python_files
-
-def calculate_cyclomatic_complexity(code):
-    """Calculate cyclomatic complexity of Python code"""
-    # Simple implementation - counts control flow statements
-    control_structures = len(re.findall(r'\b(if|for|while|except|with|def|class)\b', code))
-    return control_structures + 1
-
-def analyze_functions(code):
-    """Analyze functions in Python code"""
-    functions = []
-    for match in re.finditer(r'def\s+(\w+)\s*\((.*?)\):', code):
-        functions.append({
-            'name': match.group(1),
-            'parameters': [p.strip() for p in match.group(2).split(',') if p.strip()],
-            'line_number': len(code[:match.start()].splitlines()) + 1
-        })
-    return functions
-
-def get_python_dependencies(owner, repo):
+    return [path for path, _ in await get_python_file_entries(owner, repo, ref)]
+
+async def get_python_dependencies(owner, repo, ref: Optional[str] = None, blob_sha: Optional[str] = None):
     """Extract Python dependencies from requirements.txt"""
-    content = read_file_content(owner, repo, 'requirements.txt')
-    if content:
-        return [line.strip() for line in content.splitlines() if line.strip()]
+    cached = await get_analysis_cache().get_async('python_deps', DEPENDENCY_PARSER_VERSION, blob_sha)
+    if cached is not None:
+        return cached
+    content = await read_file_content(owner, repo, 'requirements.txt', ref)
+    if isinstance(content, str):
+        dependencies = [line.strip() for line in content.splitlines() if line.strip()]
+        await get_analysis_cache().set_async('python_deps', DEPENDENCY_PARSER_VERSION, blob_sha, dependencies)
+        return dependencies
     return []
 
-def get_js_dependencies(owner, repo):
+async def get_js_dependencies(owner, repo, ref: Optional[str] = None, blob_sha: Optional[str] = None):
     """Extract JavaScript dependencies from package.json"""
-    content = read_file_content(owner, repo, 'package.json')
-    if content:
+    cached = await get_analysis_cache().get_async('js_deps', DEPENDENCY_PARSER_VERSION, blob_sha)
+    if cached is not None:
+        return cached
+    content = await read_file_content(owner, repo, 'package.json', ref)
+    if isinstance(content, str):
         try:
-            import json
             data = json.loads(content)
-            return {
+            dependencies = {
                 'dependencies': data.get('dependencies', {}),
                 'devDependencies': data.get('devDependencies', {})
             }
         except json.JSONDecodeError:
             return {}
+        await get_analysis_cache().set_async('js_deps', DEPENDENCY_PARSER_VERSION, blob_sha, dependencies)
+        return dependencies
     return {}
@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .lru_cache import ByteLRUCache
+
+# Per-request cache controls
+CACHE_USE = 'use'          # serve from the cache, store new answers
+CACHE_REFRESH = 'refresh'  # skip the lookup but store the new answer
+CACHE_BYPASS = 'bypass'    # neither read nor write
+CACHE_MODES = (CACHE_USE, CACHE_REFRESH, CACHE_BYPASS)
+
+
+class LLMResponseCache:
+    """
+    Cache of LLM answers keyed by a hash of everything that determines them
+    (model, system prompt, user prompt, temperature, max_tokens).
+
+    Only requests at or below max_temperature are cached, since sampling at
+    higher temperatures is meant to vary. Entries expire after ttl seconds
+    and live in a byte-bounded LRU, optionally backed by a SQLite file.
+    Async callers use get_async/set_async, which run SQLite in a worker
+    thread.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, ttl: float = 86400,
+                 max_temperature: float = 0.3, db_path: Optional[str] = None):
+        self.memory = ByteLRUCache(max_bytes)
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.refreshed = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS llm_responses ('
+                'key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, system_message: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        payload = json.dumps([model, system_message, prompt, temperature, max_tokens])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def cacheable(self, temperature: float) -> bool:
+        return temperature <= self.max_temperature
+
+    def get(self, key: str, mode: str = CACHE_USE) -> Optional[str]:
+        """Return a fresh cached answer, honouring the request's cache mode"""
+        if mode == CACHE_BYPASS:
+            self.bypassed += 1
+            return None
+        if mode == CACHE_REFRESH:
+            self.refreshed += 1
+            return None
+
+        entry = self.memory.get(key)
+        if entry is None and self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT text, created FROM llm_responses WHERE key = ?', (key,)
+                ).fetchone()
+            if row is not None:
+                entry = (row[0], row[1])
+                self.memory.set(key, entry, size=len(row[0]))
+
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            self.memory.pop(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, text: str, mode: str = CACHE_USE):
+        if not text or mode == CACHE_BYPASS:
+            return
+        created = time.time()
+        self.memory.set(key, (text, created), size=len(text))
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO llm_responses (key, text, created) VALUES (?, ?, ?)',
+                    (key, text, created)
+                )
+                self._db.commit()
+
+    async def get_async(self, key: str, mode: str = CACHE_USE) -> Optional[str]:
+        if self._db is None or mode != CACHE_USE or key in self.memory:
+            return self.get(key, mode)
+        return await asyncio.to_thread(self.get, key, mode)
+
+    async def set_async(self, key: str, text: str, mode: str = CACHE_USE):
+        if self._db is None:
+            self.set(key, text, mode)
+        else:
+            await asyncio.to_thread(self.set, key, text, mode)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "refreshed": self.refreshed,
+            "persistent": self._db is not None,
+            **self.memory.stats()
+        }
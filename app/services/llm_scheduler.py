@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to one minute's worth"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (0 if available now)"""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        # A request bigger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def consume(self, amount: float):
+        """Take amount from the bucket; negative amounts give tokens back. May go into debt."""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class _Waiter:
+    __slots__ = ('priority', 'tokens', 'future', 'enqueued')
+
+    def __init__(self, priority: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls.
+
+    Calls wait in a priority queue until a concurrency slot is free and
+    both the requests-per-minute and tokens-per-minute buckets allow them;
+    interactive calls are always admitted before background ones. A 429
+    pauses admission for the provider's retry-after (or a jittered
+    exponential backoff) and the call is queued again.
+    """
+
+    def __init__(self, requests_per_minute: float = 30, tokens_per_minute: float = 12000,
+                 max_concurrency: int = 4, max_retries: int = 3, backoff_factor: float = 1.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.active = 0
+        self.paused_until = 0.0
+        self._queue: List = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self._waits = {p: [0, 0.0, 0.0] for p in _PRIORITY_NAMES}  # count, total, max
+
+    async def run(self, fn: Callable[[], Awaitable[Any]], priority: int = PRIORITY_BACKGROUND,
+                  tokens: int = 0) -> Any:
+        """Run one LLM call under the scheduler and return its result"""
+        result = await self._start(fn, priority, tokens)
+        self._release()
+        self.completed += 1
+        usage = getattr(result, 'usage', None)
+        if usage is not None and getattr(usage, 'total_tokens', None):
+            # Correct the estimate charged at admission with the real usage
+            self.tokens.consume(usage.total_tokens - tokens)
+        return result
+
+    async def stream(self, fn: Callable[[], Awaitable[Any]], priority: int = PRIORITY_INTERACTIVE,
+                     tokens: int = 0) -> AsyncIterator[Any]:
+        """Open a streamed LLM call and yield its chunks, holding a slot until it ends"""
+        stream = await self._start(fn, priority, tokens)
+        try:
+            async for chunk in stream:
+                yield chunk
+            self.completed += 1
+        finally:
+            try:
+                await stream.close()
+            finally:
+                self._release()
+
+    async def _start(self, fn, priority: int, tokens: int):
+        """Admit and call fn, retrying on rate limits; returns with the slot held"""
+        attempt = 0
+        while True:
+            await self._acquire(priority, tokens)
+            try:
+                return await fn()
+            except asyncio.CancelledError:
+                self._release()
+                raise
+            except Exception as e:
+                delay = self._rate_limit_delay(e, attempt)
+                if delay is not None:
+                    # Pause before the slot is handed on, so queued calls wait out the limit too
+                    self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                self._release()
+                if delay is None or attempt >= self.max_retries:
+                    self.failed += 1
+                    raise
+                self.rate_limited += 1
+                attempt += 1
+                print(f"LLM rate limited, retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+
+    def _rate_limit_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to back off after a 429, or None if the error is not a rate limit"""
+        if getattr(error, 'status_code', None) != 429:
+            return None
+        backoff = self.backoff_factor * (2 ** attempt)
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        try:
+            base = float(retry_after)
+        except (TypeError, ValueError):
+            # Full jitter when the provider does not say how long to wait
+            return random.uniform(0, backoff)
+        # Spread callers that were told the same retry-after
+        return base + random.uniform(0, min(backoff, base / 4 + 0.1))
+
+    async def _acquire(self, priority: int, tokens: int):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, tokens, loop.create_future())
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._pump()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we were cancelled; hand the slot back
+                self._release()
+            raise
+        waited = time.monotonic() - waiter.enqueued
+        stats = self._waits.setdefault(priority, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+
+    def _release(self):
+        self.active -= 1
+        self._pump()
+
+    def _pump(self):
+        """Admit queued calls in priority order while slots and buckets allow"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue and self.active < self.max_concurrency:
+            waiter = self._queue[0][2]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            delay = max(
+                self.paused_until - time.monotonic(),
+                self.requests.wait_time(1),
+                self.tokens.wait_time(waiter.tokens)
+            )
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+                return
+            heapq.heappop(self._queue)
+            self.requests.consume(1)
+            self.tokens.consume(waiter.tokens)
+            self.active += 1
+            waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        queued = {name: 0 for name in _PRIORITY_NAMES.values()}
+        for priority, _, waiter in self._queue:
+            if not waiter.future.done():
+                queued[_PRIORITY_NAMES.get(priority, str(priority))] += 1
+        waits = {}
+        for priority, (count, total, longest) in self._waits.items():
+            waits[_PRIORITY_NAMES.get(priority, str(priority))] = {
+                "admitted": count,
+                "avg_wait": round(total / count, 4) if count else 0.0,
+                "max_wait": round(longest, 4)
+            }
+        return {
+            "active": self.active,
+            "queue_depth": sum(queued.values()),
+            "queued": queued,
+            "wait": waits,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3)
+        }
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import Config
+from .github_service import classify_file, get_file_outline, read_file_content
+from .repo_context_service import context_cache
+from .retrieval_service import retrieval_store
+from .symbol_outline import outline_language
+
+
+class RepoPrefetcher:
+    """
+    Warms the caches a repository page is about to need.
+
+    Opening a repository page schedules one background prefetch: the
+    repository context (commit, tree index and README), then the key files
+    found by analyze_repo_structure, shallowest first and at most
+    `max_files` of them, each classified, read and outlined the way the
+    file viewer will request them. Directory listings are pages of
+    the tree index, so they are warm once the tree is. A repository is
+    prefetched at most once per `min_interval` seconds.
+
+    Repositories on the warm list are refreshed on a schedule, which also
+    rebuilds their context when the branch moved and starts their retrieval
+    index, so the first chat does not wait for it.
+    """
+
+    def __init__(self, min_interval: float = 60, concurrency: int = 8, max_file_bytes: int = 1024 * 1024,
+                 max_tracked: int = 1024, max_files: int = 10):
+        self.min_interval = min_interval
+        self.concurrency = concurrency
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.max_tracked = max_tracked
+        self._running: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._last: 'OrderedDict[Tuple[str, str], float]' = OrderedDict()
+        self.scheduled = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+        self.files_warmed = 0
+        self.last_duration = 0.0
+
+    def schedule(self, owner: str, repo: str) -> Optional[asyncio.Task]:
+        """Start prefetching in the background unless it ran recently; never waits"""
+        key = (owner, repo)
+        running = self._running.get(key)
+        if running is not None:
+            return running
+        last = self._last.get(key)
+        if last is not None and time.time() - last < self.min_interval:
+            self.skipped += 1
+            return None
+        self.scheduled += 1
+        task = asyncio.get_running_loop().create_task(self.prefetch(owner, repo))
+        self._running[key] = task
+
+        def done(task):
+            self._running.pop(key, None)
+            if not task.cancelled() and task.exception() is not None:
+                self.failed += 1
+                print(f"Error prefetching {owner}/{repo}: {task.exception()}")
+
+        task.add_done_callback(done)
+        return task
+
+    async def prefetch(self, owner: str, repo: str, warm: bool = False):
+        started = time.perf_counter()
+        key = (owner, repo)
+        self._last[key] = time.time()
+        self._last.move_to_end(key)
+        while len(self._last) > self.max_tracked:
+            self._last.popitem(last=False)
+
+        cached = await (context_cache.refresh(owner, repo) if warm else context_cache.get(owner, repo))
+        if warm and Config.RETRIEVAL_ENABLED and cached['sha']:
+            retrieval_store.get(owner, repo, cached['sha'])
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Monorepos can have dozens of manifests; the top-level ones matter most
+        key_files: List[str] = sorted(cached['summary']['key_files'], key=lambda path: path.count('/'))[:self.max_files]
+
+        async def warm_file(path: str):
+            async with semaphore:
+                # Small files are classified when read rather than sniffed first
+                info = await classify_file(owner, repo, path, sniff_small=False)
+                if info is None or info['is_binary'] or info['size'] > self.max_file_bytes:
+                    return
+                if outline_language(path):
+                    # Reads the file too
+                    await get_file_outline(owner, repo, path)
+                else:
+                    await read_file_content(owner, repo, path)
+                self.files_warmed += 1
+
+        results = await asyncio.gather(*(warm_file(path) for path in key_files), return_exceptions=True)
+        for path, result in zip(key_files, results):
+            if isinstance(result, Exception):
+                print(f"Error prefetching {owner}/{repo}/{path}: {result}")
+
+        self.completed += 1
+        self.last_duration = time.perf_counter() - started
+        print(f"Prefetched {owner}/{repo}: context and {len(key_files)} key files in {self.last_duration:.2f}s")
+
+    async def keep_warm(self, repos: List[str], interval: float):
+        """Refresh every "owner/repo" in `repos` every `interval` seconds, until cancelled"""
+        while True:
+            for full_name in repos:
+                owner, _, repo = full_name.partition('/')
+                try:
+                    await self.prefetch(owner, repo, warm=True)
+                except Exception as e:
+                    self.failed += 1
+                    print(f"Error warming {full_name}: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "scheduled": self.scheduled,
+            "skipped": self.skipped,
+            "running": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "files_warmed": self.files_warmed,
+            "last_duration": round(self.last_duration, 4)
+        }
+
+
+prefetcher = RepoPrefetcher(
+    min_interval=Config.PREFETCH_MIN_INTERVAL,
+    concurrency=Config.PREFETCH_CONCURRENCY,
+    max_file_bytes=Config.PREFETCH_MAX_FILE_BYTES,
+    max_files=Config.PREFETCH_MAX_FILES
+)
@@ -1,7 +1,18 @@
+import asyncio
+import time
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
-from .github_service import read_file_content, get_directory_tree
+from ..config import Config
+from .github_service import read_file_content, get_tree_index, resolve_commit_sha
+from .tree_index import CompactTree
 
-def extract_repo_summary(owner: str, repo: str) -> Dict[str, Any]:
+README_VARIANTS = [
+    "README.md", "readme.md", "Readme.md",
+    "README.txt", "readme.txt",
+    "README", "readme"
+]
+
+async def extract_repo_summary(owner: str, repo: str, ref: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract a comprehensive summary of a repository including:
     - README content
@@ -9,11 +20,10 @@ def extract_repo_summary(owner: str, repo: str) -> Dict[str, Any]:
     - Key file identification
     - Language statistics
     """
-    # Get README summary
-    readme_content = get_readme_content(owner, repo)
-    
-    # Get repo tree
-    repo_tree = get_directory_tree(owner, repo)
+    # Get the repo tree, then only the README variant it actually contains
+    _, repo_tree = await get_tree_index(owner, repo, ref)
+    top_level_files = {repo_tree.name(node) for node in repo_tree.children() if not repo_tree.is_dir(node)}
+    readme_content = await get_readme_content(owner, repo, ref, top_level_files if len(repo_tree) else None)
     
     # Get language statistics and key files
     language_stats, key_files, top_level_dirs = analyze_repo_structure(repo_tree)
@@ -29,64 +39,53 @@ def extract_repo_summary(owner: str, repo: str) -> Dict[str, Any]:
     
     return summary
 
-def get_readme_content(owner: str, repo: str) -> str:
-    """Get README content with fallbacks for different filenames"""
+async def get_readme_content(owner: str, repo: str, ref: Optional[str] = None,
+                             available_paths: Optional[set] = None) -> str:
+    """
+    Get README content with fallbacks for different filenames.
+    If the repository's top-level paths are known, only the variant that
+    exists is fetched instead of probing each one.
+    """
     # Try common README file names with different capitalizations
-    readme_variants = [
-        "README.md", "readme.md", "Readme.md", 
-        "README.txt", "readme.txt",
-        "README", "readme"
-    ]
+    readme_variants = README_VARIANTS
+    if available_paths is not None:
+        readme_variants = [variant for variant in README_VARIANTS if variant in available_paths]
     
     for variant in readme_variants:
-        content = read_file_content(owner, repo, variant)
-        if content:
+        content = await read_file_content(owner, repo, variant, ref)
+        if isinstance(content, str) and content:
             return content
     
     return ""
 
-def analyze_repo_structure(repo_tree: List) -> Tuple[Dict[str, int], List[str], List[str]]:
+IMPORTANT_FILES = frozenset({
+    'requirements.txt', 'setup.py', 'package.json',
+    'dockerfile', 'docker-compose.yml', '.env.example',
+    'main.py', 'app.py', 'index.py', 'run.py'
+})
+
+def analyze_repo_structure(repo_tree: CompactTree) -> Tuple[Dict[str, int], List[str], List[str]]:
     """
     Analyze repository structure to identify:
     - Languages used (based on file extensions)
     - Key files (important configuration files)
     - Top-level directories (important for understanding project organization)
     """
-    language_stats = {}
+    language_stats = repo_tree.extension_counts()
+
+    # Compare interned names once, then build paths only for the matches
+    important_ids = {
+        name_id for name_id, name in enumerate(repo_tree.names) if name.lower() in IMPORTANT_FILES
+    }
     key_files = []
-    top_level_dirs = []
-    
-    def count_file_types(tree, path=""):
-        nonlocal language_stats, key_files, top_level_dirs
-        
-        for item in tree:
-            current_path = f"{path}/{item['name']}" if path else item['name']
-            
-            # Track top-level directories
-            if not path and item['type'] == 'dir':
-                top_level_dirs.append(item['name'])
-            
-            if item['type'] == 'file':
-                # Extract file extension
-                if '.' in item['name']:
-                    ext = item['name'].split('.')[-1].lower()
-                    language_stats[ext] = language_stats.get(ext, 0) + 1
-                
-                # Identify key files
-                important_files = [
-                    'requirements.txt', 'setup.py', 'package.json', 
-                    'dockerfile', 'docker-compose.yml', '.env.example',
-                    'main.py', 'app.py', 'index.py', 'run.py'
-                ]
-                
-                if item['name'].lower() in important_files or current_path == 'app/__init__.py':
-                    key_files.append(current_path)
-            
-            # Recursively process directories
-            if 'children' in item:
-                count_file_types(item['children'], current_path)
-    
-    count_file_types(repo_tree)
+    for node, _ in repo_tree.walk():
+        if repo_tree.name_col[node] in important_ids and not repo_tree.is_dir(node):
+            key_files.append(repo_tree.path(node))
+    app_init = repo_tree.find('app/__init__.py')
+    if app_init is not None and not repo_tree.is_dir(app_init) and repo_tree.path(app_init) not in key_files:
+        key_files.append(repo_tree.path(app_init))
+
+    top_level_dirs = [repo_tree.name(node) for node in repo_tree.children() if repo_tree.is_dir(node)]
     return language_stats, key_files, top_level_dirs
 
 def format_repo_context_for_prompt(repo_summary: Dict[str, Any]) -> str:
@@ -114,20 +113,13 @@ def format_repo_context_for_prompt(repo_summary: Dict[str, Any]) -> str:
     # Format tree structure (simplified version)
     context += "\nRepository Structure:\n"
     
-    def format_tree(nodes, indent=0, max_depth=3, current_depth=0):
-        result = ""
-        if current_depth > max_depth:
-            return result
-            
-        for node in nodes:
-            node_type = "📄" if node.get('type') == 'file' else "📁"
-            result += f"{'  ' * indent}{node_type} {node.get('name', '')}\n"
-            if node.get('children') and current_depth < max_depth:
-                result += format_tree(node.get('children', []), indent + 1, max_depth, current_depth + 1)
-        return result
-    
-    if repo_summary.get("tree"):
-        context += format_tree(repo_summary["tree"])
+    tree = repo_summary.get("tree")
+    if tree:
+        lines = []
+        for node, depth in tree.walk(max_depth=3):
+            node_type = "📁" if tree.is_dir(node) else "📄"
+            lines.append(f"{'  ' * depth}{node_type} {tree.name(node)}\n")
+        context += "".join(lines)
     
     # Add README summary (first 2000 chars max)
     if repo_summary.get("readme"):
@@ -138,3 +130,125 @@ def format_repo_context_for_prompt(repo_summary: Dict[str, Any]) -> str:
         context += readme_summary
     
     return context
+
+
+class RepoContextCache:
+    """
+    Cache of built repository contexts keyed by (owner, repo, commit SHA).
+
+    Entries are evicted LRU beyond `max_entries`. Within `ttl` seconds of the
+    last check an entry is served as is; after that it is still served, while
+    a background task checks for a new commit and rebuilds only if the SHA
+    moved, so chat requests never wait on context building once warm.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._latest: Dict[Tuple[str, str], Tuple[str, float]] = {}
+        self._building: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._background: set = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_time_total = 0.0
+        self.last_build_time = 0.0
+
+    async def get(self, owner: str, repo: str) -> Dict[str, Any]:
+        """Return {'sha', 'summary', 'context'} for the repository's default branch"""
+        latest = self._latest.get((owner, repo))
+        if latest is not None:
+            sha, checked_at = latest
+            entry = self._entries.get((owner, repo, sha))
+            if entry is not None:
+                self._entries.move_to_end((owner, repo, sha))
+                if time.time() - checked_at < self.ttl:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self._refresh_in_background(owner, repo)
+                return entry
+
+        self.misses += 1
+        return await self._refresh(owner, repo)
+
+    async def refresh(self, owner: str, repo: str) -> Dict[str, Any]:
+        """Check for a new commit now, rebuilding the entry only if the branch moved"""
+        return await self._refresh(owner, repo)
+
+    def _refresh_in_background(self, owner: str, repo: str):
+        if (owner, repo) in self._building:
+            return
+        task = asyncio.ensure_future(self._refresh(owner, repo))
+        self._background.add(task)
+
+        def done(task):
+            self._background.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                print(f"Error refreshing repository context for {owner}/{repo}: {task.exception()}")
+
+        task.add_done_callback(done)
+
+    async def _refresh(self, owner: str, repo: str) -> Dict[str, Any]:
+        # Concurrent callers for the same repository share one build
+        task = self._building.get((owner, repo))
+        if task is None:
+            task = asyncio.ensure_future(self._build(owner, repo))
+            self._building[(owner, repo)] = task
+            task.add_done_callback(lambda _: self._building.pop((owner, repo), None))
+        return await asyncio.shield(task)
+
+    async def _build(self, owner: str, repo: str) -> Dict[str, Any]:
+        sha = await resolve_commit_sha(owner, repo)
+        if sha is not None:
+            entry = self._entries.get((owner, repo, sha))
+            if entry is not None:
+                # Branch has not moved, the cached context is still current
+                self._latest[(owner, repo)] = (sha, time.time())
+                return entry
+
+        started = time.perf_counter()
+        summary = await extract_repo_summary(owner, repo, sha)
+        entry = {
+            "sha": sha,
+            "summary": summary,
+            "context": format_repo_context_for_prompt(summary)
+        }
+        elapsed = time.perf_counter() - started
+        self.builds += 1
+        self.build_time_total += elapsed
+        self.last_build_time = elapsed
+
+        if sha is not None:
+            self._entries[(owner, repo, sha)] = entry
+            self._entries.move_to_end((owner, repo, sha))
+            self._latest[(owner, repo)] = (sha, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "builds": self.builds,
+            "avg_build_time": round(self.build_time_total / self.builds, 4) if self.builds else 0.0,
+            "last_build_time": round(self.last_build_time, 4)
+        }
+
+
+context_cache = RepoContextCache(
+    ttl=Config.REPO_CONTEXT_TTL,
+    max_entries=Config.REPO_CONTEXT_CACHE_SIZE
+)
+
+
+async def get_cached_repo_context(owner: str, repo: str) -> Dict[str, Any]:
+    """Cached repository summary and prompt context, shared by /context and /chat"""
+    return await context_cache.get(owner, repo)
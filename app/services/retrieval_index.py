@@ -0,0 +1,214 @@
+import heapq
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Bump when chunking or tokenization changes
+CHUNKER_VERSION = 1
+
+INDEXED_EXTENSIONS = frozenset({
+    'py', 'pyi', 'js', 'jsx', 'mjs', 'cjs', 'ts', 'tsx', 'go', 'java', 'kt', 'scala', 'rb', 'php',
+    'rs', 'c', 'h', 'cc', 'cpp', 'hpp', 'cs', 'swift', 'm', 'sh', 'bash', 'sql', 'lua', 'r',
+    'html', 'css', 'scss', 'vue', 'svelte', 'md', 'rst', 'txt', 'toml', 'yaml', 'yml', 'json',
+    'ini', 'cfg', 'xml', 'gradle'
+})
+INDEXED_NAMES = frozenset({'Dockerfile', 'Makefile', 'Procfile', 'Gemfile', 'Rakefile'})
+
+# Lines that start a new top-level definition, per language
+_BOUNDARY_PATTERNS = {
+    'py': r'^(?:@|(?:async\s+)?def\s|class\s)',
+    'js': r'^(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\b|class\b|(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?(?:\(|function\b|\w+\s*=>))',
+    'go': r'^(?:func|type)\s',
+    'java': r'^(?:\s{0,4})(?:public|private|protected|static|final|abstract|class|interface|enum)\b[^;=]*[({]\s*$',
+    'md': r'^#{1,3}\s',
+}
+_BOUNDARY_PATTERNS.update({
+    'pyi': _BOUNDARY_PATTERNS['py'],
+    'jsx': _BOUNDARY_PATTERNS['js'], 'mjs': _BOUNDARY_PATTERNS['js'], 'cjs': _BOUNDARY_PATTERNS['js'],
+    'ts': _BOUNDARY_PATTERNS['js'], 'tsx': _BOUNDARY_PATTERNS['js'],
+    'kt': _BOUNDARY_PATTERNS['java'], 'cs': _BOUNDARY_PATTERNS['java'], 'scala': _BOUNDARY_PATTERNS['java'],
+    'rst': _BOUNDARY_PATTERNS['md'],
+})
+_BOUNDARY_RES = {ext: re.compile(pattern, re.M) for ext, pattern in _BOUNDARY_PATTERNS.items()}
+
+MAX_CHUNK_LINES = 80
+MIN_CHUNK_LINES = 12
+WINDOW_LINES = 60
+
+_WORD_RE = re.compile(r'[A-Za-z][A-Za-z0-9]*')
+_CAMEL_RE = re.compile(r'[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])')
+# Crude suffix stripping so handle/handled/handler and authenticate/authentication meet
+_SUFFIXES = (
+    'ations', 'ation', 'ating', 'ated', 'ates', 'ate', 'ings', 'ing',
+    'ers', 'er', 'ed', 'es', 's', 'e'
+)
+
+
+def is_indexable(path: str) -> bool:
+    name = path.rpartition('/')[2]
+    if name in INDEXED_NAMES:
+        return True
+    return '.' in name and name.rpartition('.')[2].lower() in INDEXED_EXTENSIONS
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms. Identifiers are split on
+    underscores and camelCase humps too, so `getUserToken` also matches
+    "user" and "token", and common suffixes are stripped.
+    """
+    terms = []
+    for word in _WORD_RE.findall(text):
+        lower = word.lower()
+        terms.append(_stem(lower))
+        if lower != word and not word.isupper():
+            parts = _CAMEL_RE.findall(word)
+            if len(parts) > 1:
+                terms.extend(_stem(part.lower()) for part in parts)
+    return terms
+
+
+def chunk_file(path: str, text: str) -> List[Tuple[int, int, str, Dict[str, int]]]:
+    """
+    Split a file into chunks at top-level definitions (functions, classes,
+    markdown headings) where the language is known, falling back to fixed
+    windows. Returns (start_line, end_line, text, term counts) tuples.
+    """
+    lines = text.splitlines()
+    if not lines:
+        return []
+
+    ext = path.rpartition('.')[2].lower() if '.' in path else ''
+    boundary_re = _BOUNDARY_RES.get(ext)
+    starts = [0]
+    if boundary_re is not None:
+        offset_lines = 0
+        last_pos = 0
+        for match in boundary_re.finditer(text):
+            offset_lines += text.count('\n', last_pos, match.start())
+            last_pos = match.start()
+            if offset_lines - starts[-1] >= MIN_CHUNK_LINES:
+                starts.append(offset_lines)
+
+    spans = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(lines)
+        # Oversized definitions (or files without boundaries) become windows
+        while end - start > MAX_CHUNK_LINES:
+            spans.append((start, start + WINDOW_LINES))
+            start += WINDOW_LINES
+        if end > start:
+            spans.append((start, end))
+
+    chunks = []
+    for start, end in spans:
+        chunk_text = '\n'.join(lines[start:end])
+        if chunk_text.strip():
+            chunks.append((start + 1, end, chunk_text, dict(Counter(tokenize(chunk_text)))))
+    return chunks
+
+
+class BM25Index:
+    """
+    In-memory inverted index with BM25 ranking over file chunks.
+
+    Postings are kept per term as parallel arrays of chunk ids and term
+    frequencies; `finalize` precomputes per-chunk length normalisation so a
+    query only walks the postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: List[Tuple[str, int, int, str]] = []
+        self.lengths = array('I')
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._norms: List[float] = []
+
+    def add(self, path: str, chunks: Iterable[Tuple[int, int, str, Dict[str, int]]]):
+        # File path terms are added to every chunk so file names count
+        path_terms = Counter(tokenize(path))
+        for start, end, text, terms in chunks:
+            chunk_id = len(self.chunks)
+            self.chunks.append((path, start, end, text))
+            counts = Counter(terms)
+            counts.update(path_terms)
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array('I'), array('I'))
+                posting[0].append(chunk_id)
+                posting[1].append(tf)
+
+    def finalize(self):
+        avgdl = (sum(self.lengths) / len(self.lengths)) if self.lengths else 1.0
+        k1, b = self.k1, self.b
+        self._norms = [k1 * (1 - b + b * length / avgdl) for length in self.lengths]
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query: str, k: int = 8, max_df_ratio: float = 0.3,
+               max_postings: int = 20000) -> List[Dict[str, Any]]:
+        """
+        Return the top-k chunks for a query. Terms are scored rarest first;
+        terms found in more than max_df_ratio of all chunks carry almost no
+        signal and are skipped unless nothing else is left, and once
+        max_postings entries have been walked the remaining (commoner) terms
+        are dropped and no term walks more than max_postings entries, which
+        bounds query time on large indexes.
+        """
+        n = len(self.chunks)
+        if not n:
+            return []
+        terms = sorted(
+            (t for t in dict.fromkeys(tokenize(query)) if t in self.postings),
+            key=lambda t: len(self.postings[t][0])
+        )
+        selective = [t for t in terms if len(self.postings[t][0]) <= max_df_ratio * n]
+        terms = selective or terms[:1]
+        walked = 0
+        for i, term in enumerate(terms):
+            walked += len(self.postings[term][0])
+            if walked > max_postings and i > 0:
+                terms = terms[:i]
+                break
+
+        scores: Dict[int, float] = {}
+        norms = self._norms
+        k1_plus = self.k1 + 1
+        for term in terms:
+            ids, tfs = self.postings[term]
+            df = len(ids)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            if df > max_postings:
+                # Only the first term can get here; a term this common barely ranks, so score a prefix
+                ids, tfs = ids[:max_postings], tfs[:max_postings]
+            get = scores.get
+            for chunk_id, tf in zip(ids, tfs):
+                scores[chunk_id] = get(chunk_id, 0.0) + idf * tf * k1_plus / (tf + norms[chunk_id])
+
+        results = []
+        for chunk_id, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+            path, start, end, text = self.chunks[chunk_id]
+            results.append({
+                'path': path,
+                'start_line': start,
+                'end_line': end,
+                'text': text,
+                'score': round(score, 4)
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {"chunks": len(self.chunks), "terms": len(self.postings)}
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from .code_metrics import get_process_pool, reset_process_pool
+from .github_service import get_repo_backend, get_tree_entries, read_file_content
+from .lru_cache import ByteLRUCache
+from .retrieval_index import BM25Index, CHUNKER_VERSION, chunk_file, is_indexable
+from ..config import Config
+
+
+class RetrievalIndexStore:
+    """
+    BM25 indexes of repository chunks, one per (owner, repo, commit).
+
+    Indexes are built by background tasks. Chunks are cached per blob SHA,
+    so building the index for a new commit only fetches and chunks files
+    whose contents changed. While a commit's index is building, queries
+    are answered from the newest finished index of the same repository,
+    kept for the `max_latest` most recently indexed repositories.
+    """
+
+    def __init__(self, max_indexes: int = 4, chunk_cache_bytes: int = 64 * 1024 * 1024, max_latest: int = 16):
+        self.max_indexes = max_indexes
+        self.max_latest = max_latest
+        self.chunk_cache = ByteLRUCache(chunk_cache_bytes)
+        self._indexes: 'OrderedDict[Tuple[str, str, str], BM25Index]' = OrderedDict()
+        self._latest: 'OrderedDict[Tuple[str, str], BM25Index]' = OrderedDict()
+        self._building: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self.builds = 0
+        self.files_chunked = 0
+        self.files_reused = 0
+        self.queries = 0
+        self.query_time = 0.0
+
+    def get(self, owner: str, repo: str, commit_sha: str) -> Optional[BM25Index]:
+        """Return the best available index, starting a background build if the commit has none"""
+        key = (owner, repo, commit_sha)
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            return index
+        if key not in self._building:
+            task = asyncio.get_running_loop().create_task(self._build(owner, repo, commit_sha))
+            self._building[key] = task
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        latest = self._latest.get((owner, repo))
+        if latest is not None:
+            self._latest.move_to_end((owner, repo))
+        return latest
+
+    async def wait(self, owner: str, repo: str, commit_sha: str) -> Optional[BM25Index]:
+        """Build (or wait for) the index of a commit"""
+        self.get(owner, repo, commit_sha)
+        task = self._building.get((owner, repo, commit_sha))
+        if task is not None:
+            await asyncio.shield(task)
+        return self._indexes.get((owner, repo, commit_sha))
+
+    async def _build(self, owner: str, repo: str, commit_sha: str):
+        started = time.perf_counter()
+        try:
+            tree = await get_tree_entries(owner, repo, commit_sha)
+        except Exception as e:
+            print(f"Error listing {owner}/{repo}@{commit_sha} for indexing: {e}")
+            return
+        max_files = Config.RETRIEVAL_API_MAX_FILES if get_repo_backend(owner, repo) == 'api' else Config.RETRIEVAL_MAX_FILES
+        entries = [
+            entry for entry in tree['entries']
+            if entry.get('type') == 'blob' and is_indexable(entry['path'])
+            and entry.get('size', 0) <= Config.RETRIEVAL_MAX_FILE_BYTES
+        ][:max_files]
+
+        semaphore = asyncio.Semaphore(Config.ANALYSIS_FETCH_CONCURRENCY)
+        loop = asyncio.get_running_loop()
+        file_chunks: Dict[str, List] = {}
+
+        async def process(entry):
+            path, blob_sha = entry['path'], entry.get('sha')
+            cache_key = f"{CHUNKER_VERSION}:{blob_sha}"
+            chunks = self.chunk_cache.get(cache_key) if blob_sha else None
+            if chunks is not None:
+                self.files_reused += 1
+                file_chunks[path] = chunks
+                return
+            async with semaphore:
+                try:
+                    content = await asyncio.wait_for(
+                        read_file_content(owner, repo, path, commit_sha),
+                        timeout=Config.ANALYSIS_FILE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    return
+            if not isinstance(content, str):
+                return
+            chunks = await _run_chunker(loop, path, content)
+            self.files_chunked += 1
+            if blob_sha:
+                self.chunk_cache.set(cache_key, chunks, size=len(content) * 2)
+            file_chunks[path] = chunks
+
+        results = await asyncio.gather(*(process(entry) for entry in entries), return_exceptions=True)
+        for entry, result in zip(entries, results):
+            if isinstance(result, Exception):
+                print(f"Error indexing {entry['path']}: {result}")
+
+        # Posting lists for thousands of files take seconds to build; keep them off the event loop
+        index = await asyncio.to_thread(_assemble_index, entries, file_chunks)
+
+        key = (owner, repo, commit_sha)
+        self._indexes[key] = index
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        self._latest[(owner, repo)] = index
+        self._latest.move_to_end((owner, repo))
+        while len(self._latest) > self.max_latest:
+            self._latest.popitem(last=False)
+        self.builds += 1
+        print(f"Indexed {owner}/{repo}@{commit_sha[:12]}: {len(entries)} files, "
+              f"{len(index)} chunks in {time.perf_counter() - started:.2f}s")
+
+    def search(self, index: BM25Index, query: str, k: int) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        results = index.search(query, k)
+        self.queries += 1
+        self.query_time += time.perf_counter() - started
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "indexes": {f"{o}/{r}@{sha[:12]}": index.stats() for (o, r, sha), index in self._indexes.items()},
+            "building": len(self._building),
+            "builds": self.builds,
+            "files_chunked": self.files_chunked,
+            "files_reused": self.files_reused,
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_time * 1000 / self.queries, 3) if self.queries else 0.0,
+            "chunk_cache": self.chunk_cache.stats()
+        }
+
+
+def _assemble_index(entries: List[Dict[str, Any]], file_chunks: Dict[str, List]) -> BM25Index:
+    index = BM25Index()
+    # Add in tree order so chunk ids do not depend on fetch order
+    for entry in entries:
+        if entry['path'] in file_chunks:
+            index.add(entry['path'], file_chunks[entry['path']])
+    index.finalize()
+    return index
+
+
+async def _run_chunker(loop, path: str, content: str) -> List:
+    """Chunk and tokenize a file in the shared process pool, retrying once on a fresh pool if it broke"""
+    pool = get_process_pool(Config.ANALYSIS_WORKERS)
+    try:
+        return await loop.run_in_executor(pool, chunk_file, path, content)
+    except BrokenProcessPool:
+        reset_process_pool(pool)
+        return await loop.run_in_executor(get_process_pool(Config.ANALYSIS_WORKERS), chunk_file, path, content)
+
+
+retrieval_store = RetrievalIndexStore(
+    max_indexes=Config.RETRIEVAL_INDEX_CACHE_SIZE,
+    chunk_cache_bytes=Config.RETRIEVAL_CHUNK_CACHE_BYTES,
+    max_latest=Config.RETRIEVAL_LATEST_CACHE_SIZE
+)
+
+
+def retrieve_chunks(owner: str, repo: str, commit_sha: str, query: str,
+                    k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Top-k chunks of a repository for a query. Returns an empty list while
+    the first index for the repository is still being built.
+    """
+    if not Config.RETRIEVAL_ENABLED or not commit_sha:
+        return []
+    index = retrieval_store.get(owner, repo, commit_sha)
+    if index is None:
+        return []
+    return retrieval_store.search(index, query, k or Config.RETRIEVAL_TOP_K)
@@ -0,0 +1,118 @@
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the work; callers arriving while it is
+    in flight wait for and share its result (or exception). Works for
+    threads via `do` and for asyncio via `do_async`; async calls are
+    coalesced per event loop, and their shared work is cancelled once every
+    caller waiting for it has been cancelled or timed out.
+
+    Every caller receives the same result object, so results must be
+    treated as read-only. The async bookkeeping is not locked: `do_async`
+    may only be used from event loops running on a single thread, while
+    `do` is safe from any number of threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.executed = 0
+        self.deduplicated = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        task = self._tasks.get(task_key)
+        if task is None:
+            task = loop.create_task(fn(*args, **kwargs))
+            self._tasks[task_key] = task
+            task.add_done_callback(lambda done: self._forget(task_key, done))
+            with self._lock:
+                self.executed += 1
+        else:
+            with self._lock:
+                self.deduplicated += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shield so one caller being cancelled does not cancel the work others wait for
+            return await asyncio.shield(task)
+        finally:
+            remaining = self._waiters[task] - 1
+            if remaining:
+                self._waiters[task] = remaining
+            else:
+                del self._waiters[task]
+                if not task.done():
+                    # Nobody is waiting any more; stop the work and let a new caller start afresh
+                    task.cancel()
+                    self._forget(task_key, task)
+
+    def _forget(self, task_key: Tuple[int, Hashable], task: asyncio.Future):
+        if self._tasks.get(task_key) is task:
+            del self._tasks[task_key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._calls) + len(self._tasks)
+        }
+
+
+flights = SingleFlight()
+
+
+def coalesced(name: str):
+    """Decorator coalescing concurrent calls of an async function with equal arguments"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return await flights.do_async(key, fn, *args, **kwargs)
+        return wrapper
+    return decorator
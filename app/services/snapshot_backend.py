@@ -0,0 +1,281 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+INDEX_VERSION = 1
+CHUNK_BYTES = 1024 * 1024
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Compute the git blob SHA-1 for a file's contents"""
+    header = f"blob {len(data)}\0".encode('ascii')
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def git_blob_sha_of_stream(stream, size: int) -> str:
+    """git_blob_sha for `size` bytes read from a binary stream in chunks, without holding them in memory"""
+    digest = hashlib.sha1(f"blob {size}\0".encode('ascii'))
+    for chunk in iter(lambda: stream.read(CHUNK_BYTES), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SnapshotArchive:
+    """
+    A repository snapshot at one commit, stored as an uncompressed tar file
+    plus an offset index.
+
+    The index maps every path to the byte offset and size of its data inside
+    the tar, so single files are read with one seek instead of unpacking the
+    archive. Everything here is local; downloading is done by SnapshotStore.
+    """
+
+    def __init__(self, tar_path: str, index: Dict[str, Any]):
+        self.tar_path = tar_path
+        self.commit_sha = index['commit']
+        self.files: Dict[str, List] = index['files']
+        self.dirs: List[str] = index['dirs']
+        self._tree_entries: Optional[List[Dict[str, Any]]] = None
+
+    @staticmethod
+    def paths_for(directory: str, commit_sha: str) -> Tuple[str, str]:
+        return (
+            os.path.join(directory, f"{commit_sha}.tar"),
+            os.path.join(directory, f"{commit_sha}.index.json")
+        )
+
+    @classmethod
+    def open(cls, directory: str, commit_sha: str) -> Optional['SnapshotArchive']:
+        """Open a previously built snapshot, or return None if there is none"""
+        tar_path, index_path = cls.paths_for(directory, commit_sha)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get('version') != INDEX_VERSION or not os.path.exists(tar_path):
+            return None
+        try:
+            # The index's mtime is when the snapshot was last used, for SnapshotStore pruning
+            os.utime(index_path)
+        except OSError:
+            pass
+        return cls(tar_path, index)
+
+    @classmethod
+    def build(cls, tarball, directory: str, commit_sha: str) -> 'SnapshotArchive':
+        """
+        Build a snapshot from a (possibly gzip-compressed) tarball, given as a
+        path or a binary file object, such as the archive GitHub serves from
+        /repos/{owner}/{repo}/tarball/{ref}.
+        """
+        os.makedirs(directory, exist_ok=True)
+        tar_path, index_path = cls.paths_for(directory, commit_sha)
+        tmp_tar = f"{tar_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+        # Store the archive uncompressed so member data can be seeked to
+        source = open(tarball, 'rb') if isinstance(tarball, (str, os.PathLike)) else tarball
+        try:
+            magic = source.read(2)
+            source.seek(0)
+            reader = gzip.GzipFile(fileobj=source) if magic == b'\x1f\x8b' else source
+            with open(tmp_tar, 'wb') as out:
+                shutil.copyfileobj(reader, out, CHUNK_BYTES)
+        finally:
+            if source is not tarball:
+                source.close()
+
+        index = cls._index_tar(tmp_tar, commit_sha)
+        os.replace(tmp_tar, tar_path)
+        tmp_index = f"{index_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_index, index_path)
+        return cls(tar_path, index)
+
+    @staticmethod
+    def _index_tar(tar_path: str, commit_sha: str) -> Dict[str, Any]:
+        files = {}
+        dirs = set()
+        with tarfile.open(tar_path, 'r:') as tar:
+            for member in tar:
+                # GitHub archives put everything under a single
+                # "{owner}-{repo}-{sha}/" directory, which is stripped here
+                _, _, path = member.name.partition('/')
+                if not path or member.type == tarfile.XGLTYPE:
+                    continue
+                path = path.rstrip('/')
+                if member.isdir():
+                    dirs.add(path)
+                elif member.isfile():
+                    sha = git_blob_sha_of_stream(tar.extractfile(member), member.size)
+                    mode = '100755' if member.mode & 0o111 else '100644'
+                    files[path] = [member.offset_data, member.size, sha, mode]
+                elif member.issym():
+                    target = member.linkname.encode('utf-8')
+                    # Symlinks have no data in the tar; keep the target inline
+                    files[path] = [None, len(target), git_blob_sha(target), '120000', member.linkname]
+                else:
+                    continue
+                parent = path.rpartition('/')[0]
+                while parent and parent not in dirs:
+                    dirs.add(parent)
+                    parent = parent.rpartition('/')[0]
+        return {
+            'version': INDEX_VERSION,
+            'commit': commit_sha,
+            'files': files,
+            'dirs': sorted(dirs)
+        }
+
+    def read_file(self, path: str) -> Optional[bytes]:
+        """Read one file's bytes from the archive, or None if it is not present"""
+        entry = self.files.get(path.strip('/'))
+        if entry is None:
+            return None
+        offset, size = entry[0], entry[1]
+        if offset is None:
+            return entry[4].encode('utf-8')
+        with open(self.tar_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def read_range(self, path: str, start: int, end: int) -> Optional[bytes]:
+        """Read bytes [start, end) of one file, or None if it is not present"""
+        entry = self.files.get(path.strip('/'))
+        if entry is None:
+            return None
+        offset, size = entry[0], entry[1]
+        start, end = min(start, size), min(end, size)
+        if offset is None:
+            return entry[4].encode('utf-8')[start:end]
+        with open(self.tar_path, 'rb') as f:
+            f.seek(offset + start)
+            return f.read(end - start)
+
+    def tree_entries(self) -> List[Dict[str, Any]]:
+        """List the snapshot in the same shape as GitHub's git tree API"""
+        if self._tree_entries is None:
+            entries = [{'path': d, 'type': 'tree', 'mode': '040000', 'sha': None} for d in self.dirs]
+            entries.extend(
+                {'path': path, 'type': 'blob', 'mode': entry[3], 'sha': entry[2], 'size': entry[1]}
+                for path, entry in self.files.items()
+            )
+            entries.sort(key=lambda e: e['path'])
+            self._tree_entries = entries
+        return self._tree_entries
+
+
+class SnapshotStore:
+    """
+    Local cache of repository snapshots keyed by commit SHA.
+
+    Each commit's archive is downloaded once, then every read for that
+    commit is served from disk. After each download the least recently used
+    snapshots are deleted until the directory fits in `max_bytes` (0 keeps
+    everything); snapshots that are currently open are never deleted.
+    """
+
+    def __init__(self, cache_dir: str, max_open: int = 32, max_bytes: int = 0):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self._archives: Dict[Tuple[str, str, str], SnapshotArchive] = {}
+        self._locks: Dict[Tuple[str, str, str], asyncio.Lock] = {}
+
+    def repo_dir(self, owner: str, repo: str) -> str:
+        return os.path.join(self.cache_dir, owner, repo)
+
+    async def get(self, owner: str, repo: str, commit_sha: str, client) -> Optional[SnapshotArchive]:
+        """Return the snapshot for a commit, downloading its tarball on first use"""
+        key = (owner, repo, commit_sha)
+        archive = self._archives.get(key)
+        if archive is not None:
+            return archive
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            archive = self._archives.get(key)
+            downloaded = False
+            if archive is None:
+                directory = self.repo_dir(owner, repo)
+                archive = await asyncio.to_thread(SnapshotArchive.open, directory, commit_sha)
+                if archive is None:
+                    archive = await self._download(owner, repo, commit_sha, client)
+                    downloaded = archive is not None
+                if archive is not None:
+                    if len(self._archives) >= self.max_open:
+                        self._archives.pop(next(iter(self._archives)))
+                    self._archives[key] = archive
+            # Dropped while still held, so a later caller cannot start a second lock alongside it
+            if self._locks.get(key) is lock:
+                del self._locks[key]
+        if downloaded and self.max_bytes:
+            await asyncio.to_thread(self._prune, {a.tar_path for a in list(self._archives.values())})
+        return archive
+
+    def _prune(self, in_use):
+        """Delete the least recently used snapshots until the cache fits in max_bytes"""
+        snapshots = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith('.tar'):
+                    continue
+                tar_path = os.path.join(root, name)
+                index_path = f"{tar_path[:-len('.tar')]}.index.json"
+                try:
+                    size = os.path.getsize(tar_path) + os.path.getsize(index_path)
+                    last_used = os.path.getmtime(index_path)
+                except OSError:
+                    continue
+                total += size
+                snapshots.append((last_used, size, tar_path, index_path))
+
+        removed = 0
+        for last_used, size, tar_path, index_path in sorted(snapshots):
+            if total <= self.max_bytes:
+                break
+            if tar_path in in_use:
+                continue
+            try:
+                # Index first, so a half-deleted snapshot is never opened
+                os.remove(index_path)
+                os.remove(tar_path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            print(f"Pruned {removed} snapshots; {total} bytes kept")
+
+    async def _download(self, owner: str, repo: str, commit_sha: str, client) -> Optional[SnapshotArchive]:
+        directory = self.repo_dir(owner, repo)
+        await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+        download_path = os.path.join(directory, f"{commit_sha}.{os.getpid()}.{uuid.uuid4().hex}.tar.gz.download")
+        print(f"Downloading snapshot of {owner}/{repo}@{commit_sha}")
+        try:
+            async with client.stream(f'/repos/{owner}/{repo}/tarball/{commit_sha}') as response:
+                if response.status_code != 200:
+                    print(f"Snapshot download failed for {owner}/{repo}@{commit_sha}: {response.status_code}")
+                    return None
+                # Disk writes go to a worker thread so a slow disk does not stall the event loop
+                f = await asyncio.to_thread(open, download_path, 'wb')
+                try:
+                    async for chunk in response.aiter_bytes(CHUNK_BYTES):
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+            return await asyncio.to_thread(SnapshotArchive.build, download_path, directory, commit_sha)
+        except Exception as e:
+            print(f"Error building snapshot for {owner}/{repo}@{commit_sha}: {e}")
+            return None
+        finally:
+            if os.path.exists(download_path):
+                os.remove(download_path)
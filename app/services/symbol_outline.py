@@ -0,0 +1,173 @@
+import heapq
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+# Bump when the shape or meaning of build_outline output changes
+OUTLINE_VERSION = 1
+MAX_SYMBOLS = 5000
+MAX_SIGNATURE_CHARS = 200
+
+# Language family per extension, the same families _truncate_code handles
+LANGUAGES = {
+    **dict.fromkeys(('py', 'pyi', 'pyw'), 'py'),
+    **dict.fromkeys(('js', 'jsx', 'mjs', 'cjs', 'ts', 'tsx', 'mts', 'cts'), 'js'),
+    'go': 'go',
+    'java': 'java',
+}
+
+# Kinds whose members are reported as methods
+CONTAINER_KINDS = frozenset(('class', 'interface', 'enum', 'record', 'struct'))
+
+
+class LineIndex:
+    """
+    Start offset of every line of a text, computed once. Character offsets
+    (e.g. regex match positions) resolve to 1-based line numbers with a
+    binary search instead of re-counting newlines before each one.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # starts[i] is the offset of line i + 1; the last entry is one past the end
+        self.starts = list(accumulate(map((1).__add__, map(len, text.split('\n'))), initial=0))
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def line_of(self, offset: int) -> int:
+        return bisect_right(self.starts, offset)
+
+    def line(self, number: int) -> str:
+        return self.text[self.starts[number - 1]:self.starts[number] - 1]
+
+
+_JS_NAME = r'[\w$]+'
+_JS_NOT_KEYWORD = r'(?!(?:if|for|while|switch|catch|return|function|else|do|with|new|typeof|await)\b)'
+_JAVA_MODIFIERS = r'(?:(?:public|private|protected|static|final|abstract|sealed|non-sealed|strictfp|synchronized|native|default)[ \t]+)*'
+_JAVA_NOT_KEYWORD = r'(?!(?:return|new|else|throw|if|for|while|switch|case|catch|do|try|yield|assert|synchronized)\b)'
+
+# (kind, pattern) per language. Every pattern captures the line's `indent`
+# and the symbol `name`; a `kind` group, when present, overrides the kind.
+# 'method' patterns only count inside a container.
+_PATTERNS = {
+    'py': [
+        (None, r'^(?P<indent>[ \t]*)(?:async[ \t]+)?(?P<kind>def|class)[ \t]+(?P<name>\w+)'),
+    ],
+    'js': [
+        ('class', rf'^(?P<indent>[ \t]*)(?:export[ \t]+)?(?:default[ \t]+)?(?:declare[ \t]+)?(?:abstract[ \t]+)?class[ \t]+(?P<name>{_JS_NAME})'),
+        ('interface', rf'^(?P<indent>[ \t]*)(?:export[ \t]+)?(?:declare[ \t]+)?interface[ \t]+(?P<name>{_JS_NAME})'),
+        ('enum', rf'^(?P<indent>[ \t]*)(?:export[ \t]+)?(?:declare[ \t]+)?(?:const[ \t]+)?enum[ \t]+(?P<name>{_JS_NAME})'),
+        ('type', rf'^(?P<indent>[ \t]*)(?:export[ \t]+)?(?:declare[ \t]+)?type[ \t]+(?P<name>{_JS_NAME})[^=\n]*='),
+        ('function', rf'^(?P<indent>[ \t]*)(?:export[ \t]+)?(?:default[ \t]+)?(?:declare[ \t]+)?(?:async[ \t]+)?function\b[ \t]*\*?[ \t]*(?P<name>{_JS_NAME})'),
+        ('function', rf'^(?P<indent>[ \t]*)(?:export[ \t]+)?(?:const|let|var)[ \t]+(?P<name>{_JS_NAME})[ \t]*(?::[^=\n]+)?=[ \t]*(?:async[ \t]*)?'
+                     rf'(?:function\b|\([^)\n]*\)[ \t]*(?::[^=\n]+)?=>|{_JS_NAME}[ \t]*=>)'),
+        ('method', rf'^(?P<indent>[ \t]+)(?:(?:public|private|protected|static|readonly|abstract|override|async|get|set)[ \t]+)*\*?'
+                   rf'{_JS_NOT_KEYWORD}(?P<name>#?{_JS_NAME})[ \t]*(?:<[^>\n]*>)?\([^)\n]*\)[ \t]*(?::[^{{\n]+)?\{{'),
+    ],
+    'go': [
+        ('function', r'^(?P<indent>)func[ \t]+(?:\((?P<receiver>[^)]*)\)[ \t]*)?(?P<name>\w+)'),
+        ('type', r'^(?P<indent>)type[ \t]+(?P<name>\w+)(?:\[[^\]\n]*\])?[ \t]+(?P<kind>struct|interface)?'),
+    ],
+    'java': [
+        (None, rf'^(?P<indent>[ \t]*){_JAVA_MODIFIERS}(?P<kind>class|interface|enum|record|@interface)[ \t]+(?P<name>\w+)'),
+        ('method', rf'^(?P<indent>[ \t]+){_JAVA_MODIFIERS}(?:<[^>\n]+>[ \t]+)?'
+                   rf'(?:{_JAVA_NOT_KEYWORD}[\w.$]+(?:<[^;{{}}\n]*>)?(?:\[\])*[ \t]+)?'
+                   rf'{_JAVA_NOT_KEYWORD}(?P<name>\w+)[ \t]*\([^;{{}}\n]*\)[ \t]*(?:throws[ \t]+[\w.,<> \t]+)?\{{'),
+    ],
+}
+_COMPILED = {
+    language: [(kind, re.compile(pattern, re.M)) for kind, pattern in patterns]
+    for language, patterns in _PATTERNS.items()
+}
+
+
+def outline_language(path: str) -> Optional[str]:
+    """Language family of a path if outlines are supported for it"""
+    name = path.rpartition('/')[2]
+    return LANGUAGES.get(name.rpartition('.')[2].lower()) if '.' in name else None
+
+
+def build_outline(text: str, language: str) -> Dict[str, Any]:
+    """
+    Symbols defined in a source file, in source order, each with its kind,
+    1-based line, enclosing symbol, nesting depth and signature line. Nesting
+    follows indentation, so this works without parsing and on files that do
+    not compile.
+    """
+    lines = LineIndex(text)
+    # Each pattern's matches are already in order, so merge them lazily and
+    # stop scanning once MAX_SYMBOLS are found
+    matches = heapq.merge(*(
+        _iter_matches(regex, text, index, default_kind)
+        for index, (default_kind, regex) in enumerate(_COMPILED[language])
+    ))
+
+    symbols: List[Dict[str, Any]] = []
+    # Enclosing symbols as (indent, name, kind)
+    stack: List[tuple] = []
+    for start, _, default_kind, match in matches:
+        if len(symbols) >= MAX_SYMBOLS:
+            break
+        indent = len(match.group('indent'))
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        kind = _symbol_kind(match, default_kind, stack)
+        if kind is None:
+            continue
+        groups = match.groupdict()
+        parent = stack[-1][1] if stack else None
+        if groups.get('receiver'):
+            # Go methods are declared at top level; their receiver type is the parent
+            parent = groups['receiver'].split()[-1].lstrip('*').partition('[')[0]
+        line = lines.line_of(start)
+        symbols.append({
+            'name': match.group('name'),
+            'kind': kind,
+            'line': line,
+            'parent': parent,
+            'depth': len(stack),
+            'signature': lines.line(line).strip()[:MAX_SIGNATURE_CHARS]
+        })
+        stack.append((indent, match.group('name'), kind))
+    return {
+        'symbols': symbols,
+        'line_count': len(lines),
+        'truncated': len(symbols) >= MAX_SYMBOLS
+    }
+
+
+def _iter_matches(regex, text: str, index: int, default_kind: Optional[str]):
+    for match in regex.finditer(text):
+        yield match.start(), index, default_kind, match
+
+
+def _symbol_kind(match, default_kind: Optional[str], stack: List[tuple]) -> Optional[str]:
+    groups = match.groupdict()
+    kind = groups.get('kind') or default_kind
+    in_container = bool(stack) and stack[-1][2] in CONTAINER_KINDS
+    if kind == 'def':
+        return 'method' if in_container else 'function'
+    if kind == 'method':
+        # Calls and control flow can look like methods outside a class body
+        return 'method' if in_container else None
+    if kind == '@interface':
+        return 'interface'
+    if kind == 'function' and groups.get('receiver'):
+        return 'method'
+    return kind
+
+
+def format_outline(symbols: List[Dict[str, Any]], max_chars: Optional[int] = None) -> str:
+    """Render an outline as indented `line: signature` rows, cut at max_chars"""
+    rows = []
+    used = 0
+    for symbol in symbols:
+        row = f"{'  ' * symbol['depth']}{symbol['line']}: {symbol['signature']}"
+        if max_chars is not None and used + len(row) + 1 > max_chars:
+            rows.append('...')
+            break
+        rows.append(row)
+        used += len(row) + 1
+    return '\n'.join(rows)
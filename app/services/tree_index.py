@@ -0,0 +1,282 @@
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MAX_PAGE_SIZE = 1000
+MAX_DEPTH = 5
+
+FILE = 0
+DIR = 1
+
+_NO_SHA = bytes(20)
+
+
+class CompactTree:
+    """
+    A repository tree stored as parallel arrays instead of nested dicts.
+
+    Each node is an integer id with columns for its interned name, parent
+    id (-1 for top-level entries), kind, git mode, size and raw 20-byte
+    SHA. Nodes are renumbered so the children of every directory are
+    contiguous and sorted (directories first, then by name), which makes
+    listing a directory a slice and looking up a path a binary search per
+    segment. Paths are only built when asked for.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        names: List[str] = []
+        name_ids: Dict[str, int] = {}
+        name_col = array('I')
+        parent_col = array('i')
+        kind_col = bytearray()
+        size_col = array('q')
+        mode_col = array('I')
+        sha_col = bytearray()
+        by_path: Dict[str, int] = {}
+
+        def add_node(path: str, kind: int) -> int:
+            parent_path, _, name = path.rpartition('/')
+            parent = -1
+            if parent_path:
+                parent = by_path.get(parent_path)
+                if parent is None:
+                    # Directory without its own tree entry
+                    parent = add_node(parent_path, DIR)
+            name_id = name_ids.get(name)
+            if name_id is None:
+                name_id = name_ids[name] = len(names)
+                names.append(name)
+            node = by_path[path] = len(name_col)
+            name_col.append(name_id)
+            parent_col.append(parent)
+            kind_col.append(kind)
+            size_col.append(0)
+            mode_col.append(0)
+            sha_col.extend(_NO_SHA)
+            return node
+
+        for item in entries:
+            path = item['path']
+            node = by_path.get(path)
+            if node is None:
+                node = add_node(path, FILE if item['type'] == 'blob' else DIR)
+            if item.get('mode'):
+                mode_col[node] = int(item['mode'], 8)
+            if item.get('sha'):
+                sha_col[node * 20:node * 20 + 20] = bytes.fromhex(item['sha'])
+            if item['type'] == 'blob':
+                size_col[node] = item.get('size', 0) or 0
+        del by_path
+
+        # Renumber so siblings are contiguous and in display order
+        count = len(name_col)
+        ranks = array('I', bytes(4 * len(names)))
+        for rank, name_id in enumerate(sorted(range(len(names)), key=names.__getitem__)):
+            ranks[name_id] = rank
+        span = 2 * len(names)
+        order = sorted(range(count), key=lambda i: (
+            (parent_col[i] + 1) * span + (kind_col[i] == FILE) * len(names) + ranks[name_col[i]]
+        ))
+        new_id = array('i', bytes(4 * count))
+        for new, old in enumerate(order):
+            new_id[old] = new
+
+        self.names = names
+        self.name_col = array('I', (name_col[old] for old in order))
+        self.parent_col = array('i', (new_id[parent_col[old]] if parent_col[old] >= 0 else -1 for old in order))
+        self.kind_col = bytearray(kind_col[old] for old in order)
+        self.size_col = array('q', (size_col[old] for old in order))
+        self.mode_col = array('I', (mode_col[old] for old in order))
+        self.sha_col = b''.join(sha_col[old * 20:old * 20 + 20] for old in order)
+
+        # children of node p are child_start[p] .. child_start[p] + child_count[p];
+        # the first dir_count[p] of them are directories. Index `count` is the root.
+        self.child_start = array('i', bytes(4 * (count + 1)))
+        self.child_count = array('i', bytes(4 * (count + 1)))
+        self.dir_count = array('i', bytes(4 * (count + 1)))
+        previous = None
+        for node in range(count):
+            parent = self.parent_col[node]
+            slot = parent if parent >= 0 else count
+            if slot != previous:
+                self.child_start[slot] = node
+                previous = slot
+            self.child_count[slot] += 1
+            if self.kind_col[node] == DIR:
+                self.dir_count[slot] += 1
+
+        # Extension of every interned name, so filters compare small ints
+        self.extensions: Dict[str, int] = {}
+        self.name_ext = array('i', (
+            self.extensions.setdefault(name.rpartition('.')[2].lower(), len(self.extensions)) if '.' in name else -1
+            for name in names
+        ))
+
+    def __len__(self):
+        return len(self.name_col)
+
+    # Node accessors
+
+    def name(self, node: int) -> str:
+        return self.names[self.name_col[node]]
+
+    def is_dir(self, node: int) -> bool:
+        return node < 0 or self.kind_col[node] == DIR
+
+    def size(self, node: int) -> int:
+        return self.size_col[node]
+
+    def mode(self, node: int) -> Optional[str]:
+        mode = self.mode_col[node]
+        return f"{mode:06o}" if mode else None
+
+    def sha(self, node: int) -> Optional[str]:
+        raw = self.sha_col[node * 20:node * 20 + 20]
+        return None if raw == _NO_SHA else raw.hex()
+
+    def path(self, node: int) -> str:
+        parts = []
+        while node >= 0:
+            parts.append(self.names[self.name_col[node]])
+            node = self.parent_col[node]
+        return '/'.join(reversed(parts))
+
+    def children(self, node: int = -1) -> range:
+        """Child ids of a directory (-1 for the root), in display order"""
+        slot = node if node >= 0 else len(self.name_col)
+        start = self.child_start[slot]
+        return range(start, start + self.child_count[slot])
+
+    def find(self, path: str) -> Optional[int]:
+        """Node id for a path ('' is the root, -1), or None"""
+        node = -1
+        path = path.strip('/')
+        if not path:
+            return node
+        for name in path.split('/'):
+            node = self._find_child(node, name)
+            if node is None:
+                return None
+        return node
+
+    def _find_child(self, parent: int, name: str) -> Optional[int]:
+        slot = parent if parent >= 0 else len(self.name_col)
+        start = self.child_start[slot]
+        dirs_end = start + self.dir_count[slot]
+        # Directories and files are each sorted by name
+        names, name_col = self.names, self.name_col
+        for lo, end in ((start, dirs_end), (dirs_end, start + self.child_count[slot])):
+            hi = end
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if names[name_col[mid]] < name:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < end and names[name_col[lo]] == name:
+                return lo
+        return None
+
+    # Iteration and queries
+
+    def walk(self, node: int = -1, max_depth: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """Pre-order (node, depth) pairs below a directory, without building paths"""
+        stack = [(child, 0) for child in reversed(self.children(node))]
+        while stack:
+            child, depth = stack.pop()
+            yield child, depth
+            if self.kind_col[child] == DIR and (max_depth is None or depth < max_depth):
+                stack.extend((grandchild, depth + 1) for grandchild in reversed(self.children(child)))
+
+    def iter_paths(self, prefix: str = '', files_only: bool = False) -> Iterator[Tuple[int, str]]:
+        """(node, path) for everything under a directory prefix, each path built once from its parent's"""
+        root = self.find(prefix)
+        if root is None or not self.is_dir(root):
+            return
+        base = prefix.strip('/')
+        stack = [(child, base) for child in reversed(self.children(root))]
+        while stack:
+            node, parent_path = stack.pop()
+            name = self.names[self.name_col[node]]
+            path = f"{parent_path}/{name}" if parent_path else name
+            if self.kind_col[node] == DIR:
+                if not files_only:
+                    yield node, path
+                stack.extend((child, path) for child in reversed(self.children(node)))
+            else:
+                yield node, path
+
+    def files_with_extension(self, *extensions: str) -> List[Tuple[str, Optional[str]]]:
+        """(path, blob SHA) of every file with one of the given extensions"""
+        wanted = {self.extensions[ext] for ext in extensions if ext in self.extensions}
+        if not wanted:
+            return []
+        name_ext, name_col, kind_col = self.name_ext, self.name_col, self.kind_col
+        return [
+            (self.path(node), self.sha(node)) for node in range(len(name_col))
+            if kind_col[node] == FILE and name_ext[name_col[node]] in wanted
+        ]
+
+    def extension_counts(self) -> Dict[str, int]:
+        """Number of files per extension"""
+        counts = [0] * len(self.extensions)
+        name_ext, name_col, kind_col = self.name_ext, self.name_col, self.kind_col
+        for node in range(len(name_col)):
+            if kind_col[node] == FILE:
+                ext = name_ext[name_col[node]]
+                if ext >= 0:
+                    counts[ext] += 1
+        return {ext: counts[ext_id] for ext, ext_id in self.extensions.items() if counts[ext_id]}
+
+    # Paged listing for the /tree API
+
+    def list(self, path: str = '', depth: int = 1, cursor: Optional[str] = None,
+             limit: int = 200, max_entries: Optional[int] = None) -> Dict[str, Any]:
+        """
+        One page of a directory's children. With depth > 1, subdirectories
+        include their own first page of children down to that depth, in
+        order, until `max_entries` (default `limit`) entries are rendered in
+        total; directories beyond that come without children and are listed
+        when expanded. The cursor is the path of the last entry of the
+        previous page. Raises KeyError for unknown directories and
+        ValueError for cursors that do not belong to the directory.
+        """
+        budget = [limit if max_entries is None else max_entries]
+        return self._list(path.strip('/'), depth, cursor, limit, budget)
+
+    def _list(self, path: str, depth: int, cursor: Optional[str], limit: int, budget: List[int]) -> Dict[str, Any]:
+        node = self.find(path)
+        if node is None or not self.is_dir(node):
+            raise KeyError(path)
+        siblings = self.children(node)
+        start = 0
+        if cursor:
+            after = self.find(cursor)
+            if after is None or after < 0 or self.parent_col[after] != node:
+                raise ValueError(f"Invalid cursor for {path or '/'}: {cursor}")
+            start = after - siblings.start + 1
+        page = siblings[start:start + min(limit, budget[0])]
+        budget[0] -= len(page)
+        base = f"{path}/" if path else ''
+        entries = [self._render(child, base + self.name(child)) for child in page]
+        if depth > 1:
+            for rendered in entries:
+                if rendered['type'] == 'dir' and budget[0] > 0:
+                    listing = self._list(rendered['path'], depth - 1, None, limit, budget)
+                    rendered['children'] = listing['entries']
+                    rendered['next_cursor'] = listing['next_cursor']
+        return {
+            'path': path,
+            'entries': entries,
+            'total': len(siblings),
+            'next_cursor': entries[-1]['path'] if entries and start + len(page) < len(siblings) else None
+        }
+
+    def _render(self, node: int, path: str) -> Dict[str, Any]:
+        rendered = {'name': self.name(node), 'path': path, 'sha': self.sha(node)}
+        if self.kind_col[node] == DIR:
+            rendered['type'] = 'dir'
+            rendered['child_count'] = len(self.children(node))
+        else:
+            rendered['type'] = 'file'
+            rendered['size'] = self.size_col[node]
+        return rendered
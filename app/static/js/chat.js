@@ -83,31 +83,21 @@ document.addEventListener('DOMContentLoaded', function() {
             // Scroll to the bottom
             chatMessages.scrollTop = chatMessages.scrollHeight;
             
-            // Send the request
+            // Send the request and render the answer as it streams in
             console.log('Chat.js: Sending request to server');
-            fetch('/repo/chat', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    query: query,
-                    context: fileContext,
-                    repo_owner: repoOwner,
-                    repo_name: repoName
-                })
+            streamChat({
+                query: query,
+                context: fileContext,
+                repo_owner: repoOwner,
+                repo_name: repoName
+            }, function(text) {
+                aiMessage.innerHTML = formatResponse(text);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
             })
-            .then(response => {
-                console.log(`Chat.js: Response received, status: ${response.status}`);
-                if (!response.ok) {
-                    throw new Error(`Server responded with status ${response.status}`);
+            .then(timings => {
+                if (timings) {
+                    console.log(`Chat.js: First token after ${timings.ttft}s, done after ${timings.total}s`);
                 }
-                return response.json();
-            })
-            .then(data => {
-                console.log('Chat.js: Data parsed successfully');
-                aiMessage.innerHTML = formatResponse(data.text);
-                chatMessages.scrollTop = chatMessages.scrollHeight;
             })
             .catch(error => {
                 console.error('Chat.js: Error:', error);
@@ -119,6 +109,72 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Stream a chat answer over server-sent events, calling render with the text so far.
+// Re-renders are batched to one per animation frame. Resolves with the server timings.
+async function streamChat(payload, render) {
+    const response = await fetch('/repo/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify(payload)
+    });
+    console.log(`Chat.js: Response received, status: ${response.status}`);
+    if (!response.ok) {
+        throw new Error(`Server responded with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let text = '';
+    let timings = null;
+    let renderPending = false;
+
+    const scheduleRender = () => {
+        if (renderPending) return;
+        renderPending = true;
+        requestAnimationFrame(() => {
+            renderPending = false;
+            render(text);
+        });
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventType = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) eventType = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+
+            const parsed = JSON.parse(data);
+            if (eventType === 'error') {
+                throw new Error(parsed.error);
+            } else if (eventType === 'done') {
+                timings = parsed;
+            } else {
+                text += parsed.text;
+                scheduleRender();
+            }
+        }
+    }
+
+    render(text);
+    return timings;
+}
+
 // Format the response with enhanced markdown support
 function formatResponse(text) {
     if (!text) return '';
@@ -44,18 +44,24 @@ async function preloadRepoContext() {
     }
 }
 
-// Initialize tree view
+// Number of entries requested per directory page
+const TREE_PAGE_SIZE = 200;
+
+// Initialize tree view with the first page of the root directory;
+// folders load their children when they are first expanded
 async function initTreeView() {
     const treeContainer = document.getElementById('directory-tree');
     if (!treeContainer) return;
     
     try {
-        const response = await fetch(`/repo/${repoOwner}/${repoName}/tree`);
-        const data = await response.json();
+        // The page embeds the root (with top-level folders expanded) when it can
+        const embedded = document.getElementById('initial-tree');
+        const initial = embedded ? JSON.parse(embedded.textContent) : null;
+        const data = initial || await fetchTreePage('', null);
         
-        if (data && data.length > 0) {
+        if (data && data.entries.length > 0) {
             treeContainer.innerHTML = ''; // Clear loading message
-            renderTree(data, treeContainer);
+            renderTreePage(data, treeContainer, 0);
         } else {
             treeContainer.innerHTML = '<div class="error">No files found</div>';
         }
@@ -64,51 +70,92 @@ async function initTreeView() {
     }
 }
 
-// Render tree recursively
-function renderTree(nodes, container, level = 0) {
-    nodes.sort((a, b) => {
-        // Directories first, then alphabetically
-        if (a.type === 'dir' && b.type === 'file') return -1;
-        if (a.type === 'file' && b.type === 'dir') return 1;
-        return a.name.localeCompare(b.name);
-    });
+// Fetch one page of a directory's children
+async function fetchTreePage(path, cursor) {
+    const params = new URLSearchParams({ path: path, depth: 1, limit: TREE_PAGE_SIZE });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`/repo/${repoOwner}/${repoName}/tree?${params}`);
+    if (!response.ok) {
+        throw new Error(`Server responded with status ${response.status}`);
+    }
+    return response.json();
+}
+
+// Render a page of entries (already sorted by the server: directories
+// first, then by name), followed by a "load more" item if the directory
+// has further pages
+function renderTreePage(data, container, level) {
+    for (const node of data.entries) {
+        container.appendChild(renderTreeNode(node, level));
+    }
     
-    for (const node of nodes) {
-        const item = document.createElement('div');
-        const indent = '  '.repeat(level);
-        const icon = node.type === 'dir' ? '📁' : getFileIcon(node.name);
+    if (data.next_cursor) {
+        const more = document.createElement('div');
+        more.classList.add('file', 'load-more');
+        more.textContent = `${'  '.repeat(level)}… ${data.total - container.childElementCount} more`;
+        more.addEventListener('click', async function() {
+            more.textContent = `${'  '.repeat(level)}Loading...`;
+            try {
+                const next = await fetchTreePage(data.path, data.next_cursor);
+                more.remove();
+                renderTreePage(next, container, level);
+            } catch (error) {
+                more.textContent = `${'  '.repeat(level)}Error: ${error.message}`;
+            }
+        });
+        container.appendChild(more);
+    }
+}
+
+// Render a single file or folder
+function renderTreeNode(node, level) {
+    const item = document.createElement('div');
+    const indent = '  '.repeat(level);
+    const icon = node.type === 'dir' ? '📁' : getFileIcon(node.name);
+    
+    if (node.type === 'dir') {
+        item.classList.add('folder');
+        item.innerHTML = `
+            <div class="folder-header">
+                ${indent}${icon} ${node.name}
+            </div>
+            <div class="folder-content"></div>
+        `;
         
-        if (node.type === 'dir') {
-            item.classList.add('folder');
-            item.innerHTML = `
-                <div class="folder-header">
-                    ${indent}${icon} ${node.name}
-                </div>
-                <div class="folder-content"></div>
-            `;
-            
-            item.querySelector('.folder-header').addEventListener('click', function() {
-                item.classList.toggle('open');
-            });
-            
-            container.appendChild(item);
-            renderTree(node.children, item.querySelector('.folder-content'), level + 1);
-        } else {
-            item.classList.add('file');
-            item.setAttribute('data-path', node.path);
-            item.innerHTML = `${indent}${icon} ${node.name}`;
+        let loaded = false;
+        item.querySelector('.folder-header').addEventListener('click', async function() {
+            item.classList.toggle('open');
+            if (loaded) return;
+            loaded = true;
             
-            item.addEventListener('click', function() {
-                loadFile(node.path);
-                
-                // Highlight selected file
-                document.querySelectorAll('.file').forEach(f => f.classList.remove('selected'));
-                item.classList.add('selected');
-            });
+            const content = item.querySelector('.folder-content');
+            content.textContent = `${indent}  Loading...`;
+            try {
+                // Children may have come with the parent's page
+                const data = node.children
+                    ? { path: node.path, entries: node.children, next_cursor: node.next_cursor, total: node.child_count }
+                    : await fetchTreePage(node.path, null);
+                content.innerHTML = '';
+                renderTreePage(data, content, level + 1);
+            } catch (error) {
+                loaded = false;
+                content.textContent = `${indent}  Error loading folder: ${error.message}`;
+            }
+        });
+    } else {
+        item.classList.add('file');
+        item.setAttribute('data-path', node.path);
+        item.innerHTML = `${indent}${icon} ${node.name}`;
+        
+        item.addEventListener('click', function() {
+            loadFile(node.path);
             
-            container.appendChild(item);
-        }
+            // Highlight selected file
+            document.querySelectorAll('.file').forEach(f => f.classList.remove('selected'));
+            item.classList.add('selected');
+        });
     }
+    return item;
 }
 
 // Get appropriate icon for file type
@@ -131,6 +178,48 @@ function getFileIcon(filename) {
     return icons[extension] || '📄';
 }
 
+// Large files are fetched and shown in pages of this many bytes
+const FILE_PAGE_BYTES = 256 * 1024;
+
+// Fetch one byte range of a file; resolves to null for binary content
+async function fetchFilePage(path, start, decoder) {
+    const response = await fetch(`/repo/${repoOwner}/${repoName}/raw/${path}`, {
+        headers: { 'Range': `bytes=${start}-${start + FILE_PAGE_BYTES - 1}` }
+    });
+    if (response.status === 416) {
+        return { text: '', size: 0, end: 0 };
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP ${response.status}`);
+    }
+    if (response.headers.get('X-File-Binary') === '1') {
+        return null;
+    }
+    const size = parseInt(response.headers.get('X-File-Size'), 10);
+    const bytes = await response.arrayBuffer();
+    const end = start + bytes.byteLength;
+    try {
+        // stream: true keeps multi-byte characters split across pages intact
+        return { text: decoder.decode(bytes, { stream: end < size }), size: size, end: end };
+    } catch (error) {
+        return null;
+    }
+}
+
+// Show binary file metadata and keep its content out of the chat context
+async function loadBinaryFile(path, codeContent) {
+    const response = await fetch(`/repo/${repoOwner}/${repoName}/contents/${path}`);
+    const data = await response.json();
+    displayBinaryFile(data, codeContent);
+    window.dispatchEvent(new CustomEvent('fileLoaded', { 
+        detail: { 
+            path: path, 
+            content: `[Binary file: ${data.name} (${formatFileSize(data.size)})]`,
+            is_binary: true
+        }
+    }));
+}
+
 // Load file content
 async function loadFile(path) {
     const codeContent = document.getElementById('code-content');
@@ -140,60 +229,129 @@ async function loadFile(path) {
     
     currentFilePath.textContent = path;
     codeContent.textContent = 'Loading...';
+    const previousMore = document.getElementById('file-load-more');
+    if (previousMore) previousMore.remove();
+    const outline = document.getElementById('file-outline');
+    if (outline) outline.hidden = true;
     
     try {
-        const response = await fetch(`/repo/${repoOwner}/${repoName}/contents/${path}`);
-        const data = await response.json();
+        const decoder = new TextDecoder('utf-8', { fatal: true });
+        const page = await fetchFilePage(path, 0, decoder);
         
         // Check if it's a binary file
-        if (data.is_binary) {
-            displayBinaryFile(data, codeContent);
+        if (page === null) {
+            await loadBinaryFile(path, codeContent);
+            return;
+        }
+        
+        codeContent.textContent = page.text;
+        if (page.end < page.size) {
+            // Huge file: show it page by page, without highlighting
+            showMoreButton(path, codeContent, decoder, page);
+        } else if (window.hljs) {
+            // Highlight code if hljs is available
+            hljs.highlightElement(codeContent);
             
-            // Don't pass binary files to chat context
-            window.dispatchEvent(new CustomEvent('fileLoaded', { 
-                detail: { 
-                    path: path, 
-                    content: `[Binary file: ${data.name} (${formatFileSize(data.size)})]`,
-                    is_binary: true
-                }
-            }));
-        } else {
-            // It's a text file
-            if (data.content) {
-                codeContent.textContent = data.content;
-                
-                // Highlight code if hljs is available
-                if (window.hljs) {
-                    hljs.highlightElement(codeContent);
-                    
-                    // Fix blue text colors after highlighting (for f-strings etc)
-                    setTimeout(() => {
-                        // Target all blue-colored spans and force them yellow
-                        const blueSpans = codeContent.querySelectorAll('span[style*="color: blue"], span[style*="color:#0000FF"], span.hljs-string');
-                        blueSpans.forEach(span => {
-                            span.style.color = '#ffcb6b';
-                        });
-                        console.log(`Fixed colors for ${blueSpans.length} spans in ${path}`);
-                    }, 100);
-                }
-                
-                // Signal that a new file has been loaded
-                window.dispatchEvent(new CustomEvent('fileLoaded', { 
-                    detail: { 
-                        path: path, 
-                        content: data.content,
-                        is_binary: false
-                    }
-                }));
-            } else {
-                codeContent.textContent = 'Unable to load file content';
-            }
+            // Fix blue text colors after highlighting (for f-strings etc)
+            setTimeout(() => {
+                // Target all blue-colored spans and force them yellow
+                const blueSpans = codeContent.querySelectorAll('span[style*="color: blue"], span[style*="color:#0000FF"], span.hljs-string');
+                blueSpans.forEach(span => {
+                    span.style.color = '#ffcb6b';
+                });
+                console.log(`Fixed colors for ${blueSpans.length} spans in ${path}`);
+            }, 100);
         }
+        
+        // Signal that a new file has been loaded
+        window.dispatchEvent(new CustomEvent('fileLoaded', { 
+            detail: { 
+                path: path, 
+                content: page.text,
+                is_binary: false
+            }
+        }));
+        loadOutline(path, codeContent);
     } catch (error) {
         codeContent.textContent = `Error loading file: ${error.message}`;
     }
 }
 
+// Fill the outline dropdown with the file's classes and functions
+async function loadOutline(path, codeContent) {
+    const select = document.getElementById('file-outline');
+    if (!select) return;
+    try {
+        const response = await fetch(`/repo/${repoOwner}/${repoName}/outline/${path}`);
+        if (!response.ok || document.getElementById('current-file-path').textContent !== path) return;
+        const data = await response.json();
+        if (!data.symbols.length) return;
+
+        select.innerHTML = '';
+        select.appendChild(new Option(`Outline (${data.symbols.length}${data.truncated ? '+' : ''} symbols)`, ''));
+        data.symbols.forEach(symbol => {
+            const indent = '\u00a0'.repeat(symbol.depth * 2);
+            select.appendChild(new Option(`${indent}${symbol.kind} ${symbol.name} :${symbol.line}`, symbol.line));
+        });
+        select.onchange = function() {
+            if (select.value) scrollToLine(codeContent, parseInt(select.value, 10));
+            select.selectedIndex = 0;
+        };
+        select.hidden = false;
+    } catch (error) {
+        console.log(`No outline for ${path}: ${error.message}`);
+    }
+}
+
+// Scroll the code viewer to a 1-based line; wrapped lines make pixel maths unreliable,
+// so the line's first character is located in the (possibly highlighted) text nodes
+function scrollToLine(codeContent, line) {
+    const walker = document.createTreeWalker(codeContent, NodeFilter.SHOW_TEXT);
+    let remaining = line - 1;
+    let node;
+    while ((node = walker.nextNode())) {
+        let index = -1;
+        while (remaining > 0) {
+            index = node.data.indexOf('\n', index + 1);
+            if (index === -1) break;
+            remaining--;
+        }
+        if (remaining === 0) {
+            const range = document.createRange();
+            range.setStart(node, Math.min(index + 1, node.length));
+            const container = codeContent.closest('.code-scroll-container');
+            const top = range.getBoundingClientRect().top - container.getBoundingClientRect().top;
+            container.scrollTop += top - 16;
+            return;
+        }
+    }
+}
+
+// Button below the code viewer that appends the next page of a large file
+function showMoreButton(path, codeContent, decoder, page) {
+    const more = document.createElement('button');
+    more.id = 'file-load-more';
+    more.classList.add('load-more');
+    more.textContent = `Load more (${formatFileSize(page.end)} of ${formatFileSize(page.size)} shown)`;
+    more.addEventListener('click', async function() {
+        more.disabled = true;
+        more.textContent = 'Loading...';
+        try {
+            const next = await fetchFilePage(path, page.end, decoder);
+            more.remove();
+            if (next === null || document.getElementById('current-file-path').textContent !== path) return;
+            codeContent.appendChild(document.createTextNode(next.text));
+            if (next.end < next.size) {
+                showMoreButton(path, codeContent, decoder, next);
+            }
+        } catch (error) {
+            more.disabled = false;
+            more.textContent = `Error loading more: ${error.message}`;
+        }
+    });
+    codeContent.closest('.code-scroll-container').appendChild(more);
+}
+
 // Display binary file information
 function displayBinaryFile(fileInfo, container) {
     const fileType = fileInfo.type;
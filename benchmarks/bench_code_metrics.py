@@ -0,0 +1,95 @@
+"""
+Benchmark of the AST metrics engine (code_metrics.analyze_source) against
+the regex heuristics analyze_complexity used before it, per file and over
+a synthetic repository analysed serially and in the process pool:
+
+    python benchmarks/bench_code_metrics.py [--files 2000]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from app.services.code_metrics import analyze_source
+
+
+def legacy_metrics(code):
+    """The regex version: keyword hits anywhere, single-line signatures, prefix re-splitting per match"""
+    functions = []
+    for match in re.finditer(r'def\s+(\w+)\s*\((.*?)\):', code):
+        functions.append({
+            'name': match.group(1),
+            'parameters': [p.strip() for p in match.group(2).split(',') if p.strip()],
+            'line_number': len(code[:match.start()].splitlines()) + 1
+        })
+    return {
+        'cyclomatic_complexity': len(re.findall(r'\b(if|for|while|except|with|def|class)\b', code)) + 1,
+        'lines_of_code': len(code.splitlines()),
+        'functions': functions
+    }
+
+
+def make_module(functions):
+    parts = ['"""Synthetic module: if, for and while in a docstring do not count."""', 'import os', '']
+    for i in range(functions):
+        if i % 4 == 0:
+            parts.append(f'async def fetch_{i}(\n    url,\n    retries=3,\n):')
+        else:
+            parts.append(f'def handler_{i}(request, *args, limit={i}, **kwargs):')
+        parts.append(f'    # while we wait, for each item, if needed')
+        parts.append(f'    for item in range(limit if {i % 3} else 1):')
+        parts.append(f'        if item % 2 and item > {i % 7}:')
+        parts.append(f'            continue')
+        parts.append(f'    return {i}')
+        parts.append('')
+    return '\n'.join(parts)
+
+
+def best_of(func, arg, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(arg)
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def main(files):
+    print(f"{'file size':>10}{'regex ms':>12}{'ast ms':>10}{'regex fns':>11}{'ast fns':>9}")
+    for functions in (20, 200, 2000, 5000):
+        code = make_module(functions)
+        legacy_time, legacy = best_of(legacy_metrics, code)
+        ast_time, result = best_of(analyze_source, code)
+        print(f"{len(code) // 1024:>8}KB{legacy_time * 1000:>12.2f}{ast_time * 1000:>10.2f}"
+              f"{len(legacy['functions']):>11}{len(result['functions']):>9}")
+
+    modules = [make_module(20 + i % 40) for i in range(files)]
+    total_kb = sum(map(len, modules)) // 1024
+    started = time.perf_counter()
+    for code in modules:
+        analyze_source(code)
+    serial = time.perf_counter() - started
+
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Start the workers before timing
+        list(pool.map(analyze_source, modules[:workers]))
+        started = time.perf_counter()
+        list(pool.map(analyze_source, modules, chunksize=16))
+        pooled = time.perf_counter() - started
+    print(f"\n{files} files ({total_kb} KB): serial {serial:.2f}s, "
+          f"process pool ({workers} workers) {pooled:.2f}s, {serial / pooled:.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, default=2000)
+    main(parser.parse_args().files)
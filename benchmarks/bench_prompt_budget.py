@@ -0,0 +1,94 @@
+"""
+Benchmark of the prompt budgeter: estimate_tokens and pack_prompt on
+sections of up to 1 MB, and the whole chat prompt assembly
+(_build_chat_prompt) with a 1 MB open file, 1 MB of repository context
+and retrieved chunks:
+
+    python benchmarks/bench_prompt_budget.py [--repeat 200]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from app.config import Config
+from app.services.ai_service import (
+    PromptSection, _build_chat_prompt, _degrade_file, estimate_tokens, pack_prompt
+)
+
+MB = 1024 * 1024
+
+
+def make_code(size):
+    unit = ('import os\n\n\nclass Handler:\n    """Handles a request."""\n\n'
+            '    def handle(self, request):\n        value = os.getenv("KEY")\n'
+            '        if value:\n            return request\n        return None\n\n\n')
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def make_context(size):
+    unit = 'src/service/handlers/request_handler.py (python, 4 KB)\n'
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def timed(func, repeat):
+    """Median and max seconds per call"""
+    samples = []
+    # Degrading a file logs that it was truncated
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples[len(samples) // 2], samples[-1]
+
+
+def report(name, func, repeat):
+    median, worst = timed(func, repeat)
+    print(f"{name:<56}{median * 1000:>10.3f}{worst * 1000:>10.3f}")
+
+
+def main(repeat):
+    code, context = make_code(MB), make_context(MB)
+    chunks = [
+        {'path': f'src/module_{i}.py', 'start_line': 1, 'end_line': 60, 'text': make_code(2000)}
+        for i in range(8)
+    ]
+    budget = Config.LLM_PROMPT_TOKEN_BUDGET
+    print(f"{'operation (1 MB inputs)':<56}{'median ms':>10}{'max ms':>10}")
+    report('estimate_tokens, 1 MB', lambda: estimate_tokens(code), repeat)
+
+    def sections(degrade):
+        return [
+            PromptSection('system', 'You are a helpful assistant.', required=True),
+            PromptSection('question', 'Where is the request handled?', required=True),
+            PromptSection('file', code, priority=0, degrade=degrade),
+            PromptSection('repository context', context, priority=2, min_tokens=1500),
+        ]
+
+    report('pack_prompt, 2 x 1 MB, cut to size', lambda: pack_prompt(sections(None), budget), repeat)
+    report('pack_prompt, 2 x 1 MB, file degraded to its structure',
+           lambda: pack_prompt(sections(lambda text, chars: _degrade_file(text, 'handler.py', '', chars)), budget),
+           repeat)
+    report('_build_chat_prompt, 1 MB file + 1 MB context',
+           lambda: _build_chat_prompt('Where is the request handled?', code, 'handler.py', context, chunks),
+           repeat)
+    packed = pack_prompt(sections(None), budget)
+    print(f"\nbudget {budget} tokens; packed "
+          f"{sum(estimate_tokens(text) for text in packed.values())} tokens from "
+          f"{estimate_tokens(code) + estimate_tokens(context)} tokens of input")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    main(parser.parse_args().repeat)
@@ -0,0 +1,99 @@
+"""
+Benchmark of the BM25 retrieval index: chunking and index assembly time for
+a synthetic repository, then query latency against the finished index:
+
+    python benchmarks/bench_retrieval.py [--files 3000] [--queries 500]
+
+Queries should stay well under 10 ms at p99 on tens of thousands of chunks.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from app.services.retrieval_index import BM25Index, chunk_file
+
+WORDS = [
+    'user', 'token', 'session', 'request', 'response', 'cache', 'handler', 'config', 'parse',
+    'render', 'commit', 'branch', 'tree', 'blob', 'retry', 'limit', 'queue', 'worker', 'stream',
+    'payload', 'header', 'schema', 'index', 'query', 'score', 'chunk', 'route', 'model', 'client'
+]
+# Plus a long tail of project-specific identifiers, drawn Zipf-like as in real code
+RARE_WORDS = [f'{a}{b}' for a in ('alpha', 'gamma', 'delta', 'omega', 'kappa', 'sigma', 'theta', 'zeta')
+              for b in ('bolt', 'crane', 'drift', 'ember', 'flint', 'grove', 'haven', 'quill',
+                        'raven', 'spire', 'thorn', 'vault', 'wisp', 'yarrow', 'lumen', 'marrow')]
+VOCABULARY = WORDS + RARE_WORDS
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+QUERIES = [
+    'where is the session token refreshed',
+    'how does the retry queue handle rate limits',
+    'parse commit tree blob',
+    'render response header schema',
+    'which worker streams chunk payloads',
+    'getUserToken',
+    'flint vault drift',
+    'where is sigmaquill used with the token cache',
+]
+
+
+def make_file(rng, functions):
+    lines = ['"""Synthetic module."""', 'import os', '']
+    for i in range(functions):
+        a, b, c = rng.choices(VOCABULARY, WEIGHTS, k=3)
+        lines.append(f'def {a}_{b}_{i}({c}, {rng.choice(WORDS)}=None):')
+        lines.append(f'    """{a.title()} the {b} for a {c}."""')
+        for _ in range(rng.randint(4, 20)):
+            x, y, z = rng.choices(VOCABULARY, WEIGHTS, k=3)
+            lines.append(f'    {x} = {y}.{z}({c})')
+        lines.append(f'    return {c}')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(files, queries):
+    rng = random.Random(0)
+    sources = {f'src/pkg_{i % 50}/module_{i}.py': make_file(rng, rng.randint(5, 30)) for i in range(files)}
+    total_mb = sum(map(len, sources.values())) / 1024 / 1024
+
+    started = time.perf_counter()
+    file_chunks = {path: chunk_file(path, text) for path, text in sources.items()}
+    chunked = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = BM25Index()
+    for path, chunks in file_chunks.items():
+        index.add(path, chunks)
+    index.finalize()
+    assembled = time.perf_counter() - started
+    stats = index.stats()
+    print(f"{files} files ({total_mb:.1f} MB): {stats['chunks']} chunks, {stats['terms']} terms")
+    print(f"chunking {chunked:.2f}s, index assembly {assembled:.2f}s")
+
+    samples = []
+    for i in range(queries):
+        query = QUERIES[i % len(QUERIES)]
+        started = time.perf_counter()
+        index.search(query)
+        samples.append(time.perf_counter() - started)
+    p50, p99 = percentile(samples, 0.5), percentile(samples, 0.99)
+    print(f"{queries} queries: p50 {p50 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms, max {max(samples) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, default=3000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+    main(args.files, args.queries)
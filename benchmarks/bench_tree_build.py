@@ -0,0 +1,99 @@
+"""
+Benchmark of tree construction from flat git tree entries: build_tree and
+CompactTree against the nested scan get_directory_tree used before, which
+looked each path component up with a linear search of its siblings, on
+synthetic trees of 10k, 100k and 500k entries with wide directories:
+
+    python benchmarks/bench_tree_build.py [--fanout 500] [--legacy-max 100000]
+
+Linear construction shows as a roughly constant time per entry.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from app.services.github_service import build_tree
+from app.services.tree_index import CompactTree
+
+SIZES = (10_000, 100_000, 500_000)
+
+
+def make_entries(count, fanout=500):
+    """Git tree entries for `count` files spread over directories of `fanout` files each, with their parents"""
+    entries = []
+    for d in range((count + fanout - 1) // fanout):
+        directory = f'packages/group_{d // fanout}/package_{d}'
+        if d % fanout == 0:
+            entries.append({'path': f'packages/group_{d // fanout}', 'type': 'tree', 'mode': '040000', 'sha': f'{d:040x}'})
+        entries.append({'path': directory, 'type': 'tree', 'mode': '040000', 'sha': f'{d:040x}'})
+        for f in range(min(fanout, count - d * fanout)):
+            ext = ('py', 'js', 'md', 'json')[f % 4]
+            entries.append({
+                'path': f'{directory}/file_{f}.{ext}', 'type': 'blob', 'mode': '100644',
+                'sha': f'{d * fanout + f:040x}', 'size': 1000 + f
+            })
+    entries.insert(0, {'path': 'packages', 'type': 'tree', 'mode': '040000', 'sha': 'f' * 40})
+    return entries
+
+
+def legacy_build(entries):
+    """The nested scan get_directory_tree did before build_tree"""
+    tree = []
+    for item in entries:
+        path_parts = item['path'].split('/')
+        current_level = tree
+        for i, part in enumerate(path_parts):
+            node = next((n for n in current_level if n['name'] == part), None)
+            if node is None:
+                node = {
+                    'name': part,
+                    'path': '/'.join(path_parts[:i + 1]),
+                    'type': 'file' if i == len(path_parts) - 1 and item['type'] == 'blob' else 'dir',
+                    'children': []
+                }
+                current_level.append(node)
+            current_level = node['children']
+    return tree
+
+
+def timed(func, arg, repeat=1):
+    """Best of `repeat` runs, with the cyclic garbage collector paused since its passes grow with the heap, not the tree"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            func(arg)
+            times.append(time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return min(times)
+
+
+def main(fanout, legacy_max):
+    print(f"{'entries':>9}{'legacy s':>10}{'build_tree s':>14}{'CompactTree s':>15}{'build_tree us/entry':>21}{'CompactTree us/entry':>22}")
+    for count in SIZES:
+        entries = make_entries(count, fanout)
+        legacy = f"{timed(legacy_build, entries):>10.2f}" if count <= legacy_max else f"{'-':>10}"
+        nested = timed(build_tree, entries, 3)
+        compact = timed(CompactTree, entries, 3)
+        n = len(entries)
+        print(f"{n:>9}{legacy}{nested:>14.2f}{compact:>15.2f}{nested / n * 1e6:>21.2f}{compact / n * 1e6:>22.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--fanout', type=int, default=500)
+    parser.add_argument('--legacy-max', type=int, default=100_000,
+                        help='largest tree to run the quadratic legacy build on')
+    args = parser.parse_args()
+    main(args.fanout, args.legacy_max)
@@ -0,0 +1,78 @@
+"""
+Memory benchmark of CompactTree against the nested dict tree (build_tree)
+it replaced as the cached form of a repository tree, plus the walks the
+analysis code does over it, on synthetic trees of up to 300k entries:
+
+    python benchmarks/bench_tree_memory.py [--fanout 500]
+
+Memory is what the tree keeps alive once the git tree entries it was
+built from are gone, measured with tracemalloc.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from app.services.github_service import build_tree
+from app.services.tree_index import CompactTree
+from bench_tree_build import make_entries
+
+SIZES = (10_000, 100_000, 300_000)
+
+
+def retained_bytes(build, count, fanout):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        entries = make_entries(count, fanout)
+        tree = build(entries)
+        del entries
+        gc.collect()
+        return tree, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def dict_python_files(nodes, found):
+    """The recursive walk get_all_python_files did over the dict tree"""
+    for node in nodes:
+        if node['type'] == 'file' and node['path'].endswith('.py'):
+            found.append(node['path'])
+        dict_python_files(node['children'], found)
+    return found
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main(fanout):
+    print(f"{'entries':>9}{'dict tree MB':>14}{'CompactTree MB':>16}{'ratio':>7}"
+          f"{'dict .py walk ms':>18}{'compact .py ms':>16}{'prefix ms':>11}")
+    for count in SIZES:
+        nested, nested_bytes = retained_bytes(build_tree, count, fanout)
+        compact, compact_bytes = retained_bytes(CompactTree, count, fanout)
+        dict_walk = timed(dict_python_files, nested, [])
+        compact_walk = timed(compact.files_with_extension, 'py')
+        prefix = timed(lambda: list(compact.iter_paths('packages/group_0/package_1', files_only=True)))
+        print(f"{count:>9}{nested_bytes / 2 ** 20:>14.1f}{compact_bytes / 2 ** 20:>16.1f}"
+              f"{nested_bytes / compact_bytes:>6.1f}x{dict_walk * 1000:>18.1f}{compact_walk * 1000:>16.1f}"
+              f"{prefix * 1000:>11.2f}")
+        del nested, compact
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--fanout', type=int, default=500)
+    main(parser.parse_args().fanout)
@@ -0,0 +1,111 @@
+"""
+Benchmark of truncate_large_text against the version it replaced, which
+split each file into lines several times and scanned them with nested
+pattern checks, over code, markdown, JSON and dictionary files of 1 KB to
+20 MB:
+
+    python benchmarks/bench_truncation.py [--max-mb 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from app.services.ai_service import truncate_large_text
+
+LEGACY_IMPORTS = {'py': ['import ', 'from '], 'js': ['import ', 'require(', 'from '], 'go': ['import ']}
+LEGACY_DEFINITIONS = {'py': ['def ', 'class '], 'js': ['function ', 'class ', 'const ', 'let ', 'var '],
+                      'go': ['func ', 'type ']}
+
+
+def legacy_truncate(content, file_path, max_chars=10000):
+    """The previous truncate_large_text, without its logging"""
+    if len(content) <= max_chars:
+        return content
+    sample = content[:1000]
+    if sum(1 for c in sample if ord(c) < 32 and c not in '\n\r\t') / len(sample) > 0.10:
+        return f"[Binary file detected: {file_path} - {len(content)} bytes]"
+    ext = file_path.split('.')[-1].lower() if '.' in file_path else ''
+    lines = content.split('\n')
+    if ext == 'md':
+        headers = [line for line in lines if line.strip().startswith('#')]
+        result = '\n'.join(lines[:max(10, max_chars // 200)]) + "\n\n...\n\n"
+        return result + ''.join(f"{h}\n" for h in headers[:20])
+    if ext in LEGACY_DEFINITIONS:
+        imports = [line for line in lines if any(line.strip().startswith(p) for p in LEGACY_IMPORTS[ext])]
+        definitions = [line for line in lines
+                       if any(p in line for p in LEGACY_DEFINITIONS[ext]) and '{' in line or '):' in line]
+        result = '\n'.join(lines[:min(30, len(lines) // 10)]) + "\n\n...\n\n"
+        return result + ''.join(f"{line}\n" for line in imports[:20] + definitions[:30])
+    if ext == 'json':
+        keys = re.findall(r'"([^"]+)"\s*:', content)
+        result = '\n'.join(lines[:max(15, max_chars // 200)]) + "\n\n...\n\n"
+        return result + ''.join(f'- "{key}"\n' for key in sorted(set(keys))[:20])
+    if ext == 'txt':
+        n = len(lines)
+        return '\n'.join(lines[:10] + lines[n // 2 - 5:n // 2 + 5] + lines[n - 10:])
+    half = max_chars // 2
+    return content[:half] + "\n\n...\n\n" + content[-half:]
+
+
+def make_python(size):
+    unit = ('import os\nfrom typing import Any\n\n\nclass Handler:\n    """Handles a request."""\n\n'
+            '    def handle(self, request: Any) -> Any:\n        value = os.getenv("KEY")\n'
+            '        if value:\n            return request\n        return None\n\n\n')
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def make_markdown(size):
+    unit = '## Section\n\nSome prose about the project, with `code` and a [link](https://example.com).\n\n'
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def make_json(size):
+    unit = '  {"id": 1, "name": "entry", "tags": ["a", "b"], "nested": {"value": 2.5}},\n'
+    return '[\n' + (unit * (size // len(unit) + 1))[:size] + '\n]'
+
+
+def make_dictionary(size):
+    unit = ''.join(f'token{i} {i}\n' for i in range(1000))
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+KINDS = [('module.py', make_python), ('README.md', make_markdown), ('data.json', make_json), ('vocab.txt', make_dictionary)]
+
+
+def best_of(func, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main(max_mb):
+    sizes = [s for s in (1024, 100 * 1024, 1024 * 1024, 5 * 1024 * 1024, 20 * 1024 * 1024) if s <= max_mb * 1024 * 1024]
+    print(f"{'file':<12}{'size':>10}{'legacy ms':>12}{'current ms':>12}{'speedup':>9}")
+    for name, make in KINDS:
+        for size in sizes:
+            content = make(size)
+            legacy = best_of(legacy_truncate, content, name)
+            # truncate_large_text logs each file it truncates
+            with contextlib.redirect_stdout(io.StringIO()):
+                current = best_of(truncate_large_text, content, name)
+            label = f"{size // 1024 // 1024} MB" if size >= 1024 * 1024 else f"{size // 1024} KB"
+            print(f"{name:<12}{label:>10}{legacy * 1000:>12.2f}{current * 1000:>12.3f}{legacy / current:>8.1f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--max-mb', type=int, default=20)
+    main(parser.parse_args().max_mb)
@@ -0,0 +1,146 @@
+"""
+Load test: latency of GET /repo/{owner}/{repo}/contents/{path} on its own,
+then again while slow /repo/chat calls are in flight.
+
+GitHub is replaced by an httpx.MockTransport that answers after
+GITHUB_LATENCY seconds and Groq by a fake client whose completions take
+longer than the measurement, so it runs offline against the real app and routes:
+
+    python benchmarks/load_contents_during_chat.py [--duration 5] [--viewers 20] [--chats 50]
+
+With a non-blocking I/O path the p99 of /contents stays close to its
+baseline however many chats are waiting on the model.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('GITHUB_TOKEN', 'benchmark')
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+# Every /contents request goes to the (fake) network rather than the response cache
+os.environ['GITHUB_CACHE_ENABLED'] = '0'
+os.environ['RETRIEVAL_ENABLED'] = '0'
+os.environ['REPO_BACKEND'] = 'api'
+
+import httpx
+
+from app.services import ai_service, github_client
+
+GITHUB_LATENCY = 0.02
+FILES = 200
+COMMIT_SHA = 'a' * 40
+
+
+async def fake_github(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(GITHUB_LATENCY)
+    path = request.url.path
+    if path == '/repos/octo/demo':
+        return httpx.Response(200, json={'default_branch': 'main', 'full_name': 'octo/demo'})
+    if path.startswith('/repos/octo/demo/git/trees/'):
+        tree = [{'path': 'src', 'type': 'tree', 'mode': '040000', 'sha': 'b' * 40}]
+        tree += [
+            {'path': f'src/module_{i}.py', 'type': 'blob', 'mode': '100644', 'sha': f'{i:040x}', 'size': 2000}
+            for i in range(FILES)
+        ]
+        return httpx.Response(200, json={'sha': 'c' * 40, 'tree': tree, 'truncated': False})
+    if path.startswith('/repos/octo/demo/commits/'):
+        return httpx.Response(200, text=COMMIT_SHA)
+    if path.startswith('/repos/octo/demo/contents/src/module_'):
+        body = ''.join(f'def function_{i}(x):\n    return x + {i}\n\n' for i in range(60))
+        return httpx.Response(200, content=body.encode(), headers={'content-type': 'text/plain'})
+    return httpx.Response(404, json={'message': 'Not Found'})
+
+
+class FakeCompletions:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.seconds)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='An answer.'))])
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def view_files(client, stop_at, samples, viewer):
+    request_number = 0
+    while time.perf_counter() < stop_at:
+        path = f'src/module_{(viewer * 7 + request_number) % FILES}.py'
+        request_number += 1
+        started = time.perf_counter()
+        response = await client.get(f'/repo/octo/demo/contents/{path}')
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text
+
+
+async def chat(client):
+    response = await client.post('/repo/chat', json={
+        'query': 'Where is function_3 defined?',
+        'repo_owner': 'octo',
+        'repo_name': 'demo',
+        'cache': 'bypass'
+    }, timeout=None)
+    assert response.status_code == 200, response.text
+
+
+async def measure(client, duration, viewers, chats):
+    samples = []
+    chat_tasks = [asyncio.ensure_future(chat(client)) for _ in range(chats)]
+    # Let the chats reach the model before measuring
+    await asyncio.sleep(0.5 if chats else 0)
+    stop_at = time.perf_counter() + duration
+    await asyncio.gather(*(view_files(client, stop_at, samples, viewer) for viewer in range(viewers)))
+    in_flight = sum(not task.done() for task in chat_tasks)
+    for task in chat_tasks:
+        task.cancel()
+    await asyncio.gather(*chat_tasks, return_exceptions=True)
+    return samples, in_flight
+
+
+async def main(duration, viewers, chats):
+    from run import app
+
+    github_client._async_client = github_client.AsyncGitHubClient(
+        token='benchmark', transport=httpx.MockTransport(fake_github)
+    )
+    # Chats outlast the measurement, so they are all in flight throughout
+    ai_service.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(duration + 5)))
+    # Admit every chat at once so they are all waiting on the model
+    ai_service.scheduler.max_concurrency = chats or 1
+    ai_service.scheduler.requests.rate = ai_service.scheduler.tokens.rate = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://gitsage') as client:
+        # Warm the tree index so both phases do the same work per request
+        await client.get('/repo/octo/demo/contents/src/module_0.py')
+        rows = []
+        # The routes log every chat; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, concurrent_chats in (('contents only', 0), (f'contents + {chats} slow chats', chats)):
+                samples, in_flight = await measure(client, duration, viewers, concurrent_chats)
+                rows.append((name, len(samples), percentile(samples, 0.5), percentile(samples, 0.99), in_flight))
+    print(f"{'phase':<28}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}{'chats':>8}")
+    for name, count, p50, p99, in_flight in rows:
+        print(f"{name:<28}{count:>10}{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}{in_flight:>8}")
+    baseline, loaded = rows[0][3], rows[1][3]
+    print(f"p99 ratio under chat load: {loaded / baseline:.2f}x")
+    await github_client.close_clients()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--viewers', type=int, default=20)
+    parser.add_argument('--chats', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.duration, args.viewers, args.chats))
@@ -2,10 +2,32 @@ from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from app.routes import repo_routes, analysis_routes
+from app.services.github_client import close_clients
+from app.services.github_service import close_backends
+from app.services.analysis_jobs import analysis_jobs
+from app.services.prefetch_service import prefetcher
+from app.config import Config
+from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 from pathlib import Path
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep the configured repositories warm for as long as the app runs
+    warm_task = None
+    if Config.WARM_REPOS:
+        warm_task = asyncio.create_task(prefetcher.keep_warm(Config.WARM_REPOS, Config.WARM_REPOS_INTERVAL))
+    yield
+    if warm_task is not None:
+        warm_task.cancel()
+    # Stop background analyses, then release pooled GitHub connections and
+    # local git processes on shutdown
+    await analysis_jobs.close()
+    await close_clients()
+    close_backends()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure static files
 static_dir = Path(__file__).parent / "app" / "static"
@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing app loads its settings, which require these
+os.environ.setdefault('GITHUB_TOKEN', 'test')
+os.environ.setdefault('GROQ_API_KEY', 'test')
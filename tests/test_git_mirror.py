@@ -0,0 +1,133 @@
+import os
+import subprocess
+
+import pytest
+
+from app.services.git_mirror import GitMirrorStore, format_commit
+
+GIT_ENV = {
+    'GIT_AUTHOR_NAME': 'Ada Lovelace', 'GIT_AUTHOR_EMAIL': 'ada@example.com',
+    'GIT_COMMITTER_NAME': 'Ada Lovelace', 'GIT_COMMITTER_EMAIL': 'ada@example.com',
+    'GIT_CONFIG_GLOBAL': os.devnull, 'GIT_CONFIG_NOSYSTEM': '1',
+}
+
+
+def git(cwd, *args, date=None):
+    env = {**os.environ, **GIT_ENV}
+    if date is not None:
+        env['GIT_AUTHOR_DATE'] = env['GIT_COMMITTER_DATE'] = f'{date} +0000'
+    return subprocess.run(['git', *args], cwd=cwd, env=env, check=True,
+                          stdout=subprocess.PIPE).stdout.decode().strip()
+
+
+def commit(source, files, message, date):
+    for path, data in files.items():
+        target = source / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    git(source, 'add', '-A')
+    git(source, 'commit', '-q', '-m', message, date=date)
+    return git(source, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def source(tmp_path):
+    """A local repository at <tmp>/src/octo/demo with three commits"""
+    repo = tmp_path / 'src' / 'octo' / 'demo'
+    repo.mkdir(parents=True)
+    git(repo, 'init', '-q', '-b', 'main')
+    commit(repo, {'README.md': b'# Demo\n', 'src/app.py': b'print(1)\n'}, 'Initial commit', 1_700_000_000)
+    commit(repo, {'docs/user guide.md': b'Spaces in paths\n'}, 'Add docs', 1_700_000_100)
+    commit(repo, {'src/app.py': b'print(2)\n'}, 'Change app', 1_700_000_200)
+    return repo
+
+
+@pytest.fixture
+def store(tmp_path, source):
+    store = GitMirrorStore(str(tmp_path / 'mirrors'), f"file://{tmp_path / 'src'}/{{owner}}/{{repo}}",
+                           refresh_interval=3600)
+    yield store
+    store.close()
+
+
+def test_mirror_resolves_refs_and_reads_files(store, source):
+    mirror = store.get('octo', 'demo')
+    head = git(source, 'rev-parse', 'HEAD')
+
+    assert mirror.resolve() == head
+    assert mirror.resolve('main') == head
+    assert mirror.resolve('no-such-branch') is None
+    assert mirror.read_file(head, 'src/app.py') == b'print(2)\n'
+    assert mirror.read_file(head, 'docs/user guide.md') == b'Spaces in paths\n'
+    assert mirror.read_file(git(source, 'rev-parse', 'HEAD~2'), 'src/app.py') == b'print(1)\n'
+    assert mirror.read_file(head, 'missing.txt') is None
+    # A directory is not a file
+    assert mirror.read_file(head, 'src') is None
+
+
+def test_reads_share_one_cat_file_process(store, source):
+    mirror = store.get('octo', 'demo')
+    head = mirror.resolve()
+    mirror.read_file(head, 'README.md')
+    process = mirror._batch
+    for _ in range(20):
+        mirror.read_file(head, 'src/app.py')
+    assert mirror._batch is process and process.poll() is None
+
+
+def test_tree_entries_match_git_ls_tree(store, source):
+    mirror = store.get('octo', 'demo')
+    entries = mirror.tree_entries(mirror.resolve())
+
+    by_path = {entry['path']: entry for entry in entries}
+    assert sorted(by_path) == ['README.md', 'docs', 'docs/user guide.md', 'src', 'src/app.py']
+    assert by_path['src'] == {'path': 'src', 'mode': '040000', 'type': 'tree', 'sha': git(source, 'rev-parse', 'HEAD:src')}
+    assert by_path['src/app.py'] == {
+        'path': 'src/app.py', 'mode': '100644', 'type': 'blob',
+        'sha': git(source, 'rev-parse', 'HEAD:src/app.py'), 'size': 9
+    }
+
+
+def test_iter_blob_streams_byte_ranges(store, source):
+    data = bytes(range(256)) * 1000
+    commit(source, {'assets/data.bin': data}, 'Add data', 1_700_000_300)
+    mirror = store.get('octo', 'demo')
+    mirror.fetch()
+    blob_sha = git(source, 'rev-parse', 'HEAD:assets/data.bin')
+
+    assert b''.join(mirror.iter_blob(blob_sha, chunk_size=4096)) == data
+    assert b''.join(mirror.iter_blob(blob_sha, 5000, 70000, chunk_size=4096)) == data[5000:70000]
+    assert all(len(chunk) <= 4096 for chunk in mirror.iter_blob(blob_sha, chunk_size=4096))
+
+
+def test_iter_commits_filters_by_path_author_and_date(store):
+    mirror = store.get('octo', 'demo')
+
+    messages = [c['message'] for c in mirror.iter_commits()]
+    assert messages == ['Change app', 'Add docs', 'Initial commit']
+    assert [c['message'] for c in mirror.iter_commits(path='src/app.py')] == ['Change app', 'Initial commit']
+    assert [c['message'] for c in mirror.iter_commits(path='docs')] == ['Add docs']
+    assert [c['message'] for c in mirror.iter_commits(since=1_700_000_050)] == ['Change app', 'Add docs']
+    assert [c['message'] for c in mirror.iter_commits(until=1_700_000_050)] == ['Initial commit']
+    assert len(list(mirror.iter_commits(author='ADA@example.com'))) == 3
+    assert list(mirror.iter_commits(author='someone else')) == []
+
+    latest = format_commit(next(mirror.iter_commits()))
+    assert latest['author'] == 'Ada Lovelace'
+    assert latest['date'] == '2023-11-14T22:16:40Z'
+    assert latest['message'] == 'Change app'
+
+
+def test_refresh_fetches_new_commits_incrementally(tmp_path, source):
+    store = GitMirrorStore(str(tmp_path / 'mirrors'), f"file://{tmp_path / 'src'}/{{owner}}/{{repo}}",
+                           refresh_interval=0)
+    try:
+        mirror = store.get('octo', 'demo')
+        old_head = mirror.resolve()
+        new_head = commit(source, {'CHANGELOG.md': b'v2\n'}, 'Release', 1_700_000_400)
+
+        assert store.get('octo', 'demo') is mirror
+        assert mirror.resolve() == new_head != old_head
+        assert mirror.read_file(new_head, 'CHANGELOG.md') == b'v2\n'
+    finally:
+        store.close()
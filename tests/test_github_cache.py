@@ -0,0 +1,134 @@
+import asyncio
+
+import httpx
+
+from app.services.github_cache import GitHubResponseCache
+from app.services.github_client import AsyncGitHubClient
+
+URL = '/repos/octo/demo/contents/README.md'
+
+
+class FakeGitHub:
+    """Serves one file with an ETag and answers matching If-None-Match with 304"""
+
+    def __init__(self, body=b'# Demo\n', etag='"v1"'):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if request.headers.get('If-None-Match') == self.etag:
+            return httpx.Response(304, headers={'ETag': self.etag})
+        return httpx.Response(200, content=self.body, headers={'ETag': self.etag, 'Content-Type': 'text/plain'})
+
+
+def run(github, cache, *paths):
+    async def scenario():
+        client = AsyncGitHubClient(token=None, transport=httpx.MockTransport(github), cache=cache, backoff_factor=0)
+        try:
+            return [await client.get(path) for path in paths]
+        finally:
+            await client.aclose()
+    return asyncio.run(scenario())
+
+
+def test_stale_entries_are_revalidated_with_their_etag():
+    github = FakeGitHub()
+    cache = GitHubResponseCache(ttls={'default': 0})
+    first, second = run(github, cache, URL, URL)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == b'# Demo\n'
+    assert second.from_cache
+    assert 'If-None-Match' not in github.requests[0].headers
+    assert github.requests[1].headers['If-None-Match'] == '"v1"'
+    assert (cache.misses, cache.not_modified) == (1, 1)
+
+
+def test_changed_resources_replace_the_cached_body():
+    github = FakeGitHub()
+    cache = GitHubResponseCache(ttls={'default': 0})
+    run(github, cache, URL)
+    github.body, github.etag = b'# Demo v2\n', '"v2"'
+
+    response, = run(github, cache, URL)
+    assert response.content == b'# Demo v2\n'
+    again, = run(github, cache, URL)
+    assert again.content == b'# Demo v2\n' and again.from_cache
+
+
+def test_fresh_entries_are_served_without_a_request():
+    github = FakeGitHub()
+    cache = GitHubResponseCache(ttls={'contents': 60})
+    first, second = run(github, cache, URL, URL)
+
+    assert len(github.requests) == 1
+    assert second.from_cache and cache.hits == 1
+
+
+def test_trees_by_sha_never_expire():
+    github = FakeGitHub(body=b'{"sha": "t", "tree": []}')
+    cache = GitHubResponseCache(ttls={'default': 0}, immutable_ttl=86400)
+    tree_url = '/repos/octo/demo/git/trees/' + 'a' * 40
+    run(github, cache, tree_url, tree_url, '/repos/octo/demo/git/trees/main', '/repos/octo/demo/git/trees/main')
+
+    # The SHA-addressed tree is fetched once; the branch is revalidated
+    assert [r.url.path.rsplit('/', 1)[1] for r in github.requests] == ['a' * 40, 'main', 'main']
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    body = bytes(range(256))
+    github = FakeGitHub(body=body)
+    run(github, GitHubResponseCache(ttls={'default': 0}, disk_dir=str(tmp_path)), URL)
+
+    restarted = GitHubResponseCache(ttls={'default': 0}, disk_dir=str(tmp_path))
+    response, = run(github, restarted, URL)
+    assert github.requests[-1].headers['If-None-Match'] == '"v1"'
+    assert response.content == body
+    assert restarted.disk_hits == 1
+
+
+def test_a_304_for_an_evicted_entry_is_fetched_again_in_full():
+    github = FakeGitHub()
+    cache = GitHubResponseCache(ttls={'default': 0})
+
+    def evicting(request):
+        if 'If-None-Match' in request.headers:
+            cache.clear()
+        return github(request)
+
+    run(github, cache, URL)
+    response, = run(evicting, cache, URL)
+    assert response.status_code == 200 and response.content == b'# Demo\n'
+    assert ['If-None-Match' in r.headers for r in github.requests] == [False, True, False]
+
+
+def test_identical_concurrent_requests_share_one_round_trip():
+    calls = []
+
+    async def slow(request):
+        calls.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={'default_branch': 'main'})
+
+    async def scenario():
+        client = AsyncGitHubClient(token=None, transport=httpx.MockTransport(slow))
+        try:
+            return await asyncio.gather(*(client.get('/repos/octo/demo') for _ in range(5)))
+        finally:
+            await client.aclose()
+
+    responses = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(r.json() == {'default_branch': 'main'} for r in responses)
+
+
+def test_server_errors_are_retried():
+    statuses = [502, 503, 200]
+
+    def flaky(request):
+        return httpx.Response(statuses.pop(0), json={})
+
+    response, = run(flaky, None, '/repos/octo/demo')
+    assert response.status_code == 200 and statuses == []
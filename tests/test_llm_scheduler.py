@@ -0,0 +1,268 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import groq
+import pytest
+
+from app.services.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    A local OpenAI-compatible chat completions endpoint. `failures` is a
+    list of (status, headers) answered before normal completions, which
+    take `delay` seconds; requests are recorded in arrival order.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.failures = []
+        self.delay = 0.0
+        self.usage_tokens = 10
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with server.lock:
+            server.requests.append(body)
+            failure = server.failures.pop(0) if server.failures else None
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if failure is not None:
+                status, headers = failure
+                self._send(status, {'error': {'message': 'slow down', 'type': 'rate_limit'}}, headers)
+                return
+            time.sleep(server.delay)
+            content = body['messages'][-1]['content']
+            if body.get('stream'):
+                self._stream(content)
+            else:
+                self._send(200, {
+                    'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': f'echo: {content}'}}],
+                    'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': server.usage_tokens}
+                })
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for word in ['echo:', *content.split()]:
+            chunk = {'id': 'chatcmpl-1', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'fake',
+                     'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]}
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.flush()
+            time.sleep(0.02)
+        self.wfile.write(b'data: [DONE]\n\n')
+
+
+@pytest.fixture
+def server():
+    server = FakeLLMServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def completion(client, text, **kwargs):
+    return lambda: client.chat.completions.create(
+        model='fake', messages=[{'role': 'user', 'content': text}], max_tokens=10, **kwargs
+    )
+
+
+def run(server, scenario):
+    async def main():
+        client = groq.AsyncGroq(api_key='test', base_url=server.url, max_retries=0)
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_rate_limited_calls_wait_for_retry_after(server):
+    server.failures = [(429, {'retry-after': '0.3'})]
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, backoff_factor=0.01)
+
+    async def scenario(client):
+        started = time.monotonic()
+        result = await scheduler.run(completion(client, 'hello'))
+        return result, time.monotonic() - started
+
+    result, elapsed = run(server, scenario)
+    assert result.choices[0].message.content == 'echo: hello'
+    assert len(server.requests) == 2
+    assert 0.3 <= elapsed < 2
+    assert scheduler.stats()['rate_limited'] == 1
+
+
+def test_rate_limits_pause_every_queued_call(server):
+    server.failures = [(429, {'retry-after': '0.3'})]
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1, backoff_factor=0.01)
+    arrivals = []
+
+    async def scenario(client):
+        started = time.monotonic()
+
+        async def call(text):
+            await scheduler.run(completion(client, text))
+            arrivals.append((text, time.monotonic() - started))
+
+        await asyncio.gather(call('first'), call('second'))
+
+    run(server, scenario)
+    # The second call was queued behind the 429 and only admitted after the pause
+    assert [body['messages'][-1]['content'] for body in server.requests] == ['first', 'second', 'first']
+    assert all(elapsed >= 0.3 for _, elapsed in arrivals)
+
+
+def test_gives_up_after_max_retries(server):
+    server.failures = [(429, {'retry-after': '0.01'})] * 3
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_retries=2, backoff_factor=0.01)
+
+    with pytest.raises(groq.RateLimitError):
+        run(server, lambda client: scheduler.run(completion(client, 'hello')))
+    assert len(server.requests) == 3
+    stats = scheduler.stats()
+    assert (stats['failed'], stats['rate_limited'], stats['active']) == (1, 2, 0)
+
+
+def test_other_errors_are_not_retried(server):
+    server.failures = [(500, {})]
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0)
+
+    with pytest.raises(groq.InternalServerError):
+        run(server, lambda client: scheduler.run(completion(client, 'hello')))
+    assert len(server.requests) == 1
+    assert scheduler.stats()['active'] == 0
+
+
+def test_concurrency_is_capped(server):
+    server.delay = 0.1
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=2)
+
+    async def scenario(client):
+        return await asyncio.gather(*(scheduler.run(completion(client, f'call {i}')) for i in range(6)))
+
+    results = run(server, scenario)
+    assert len(results) == 6
+    assert server.max_in_flight == 2
+    assert scheduler.stats()['completed'] == 6
+
+
+def test_interactive_calls_jump_the_background_queue(server):
+    server.delay = 0.1
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1)
+
+    async def scenario(client):
+        running = asyncio.ensure_future(scheduler.run(completion(client, 'running')))
+        await asyncio.sleep(0.02)
+        background = [asyncio.ensure_future(scheduler.run(completion(client, f'batch {i}'), PRIORITY_BACKGROUND))
+                      for i in range(3)]
+        await asyncio.sleep(0.02)
+        interactive = asyncio.ensure_future(scheduler.run(completion(client, 'chat'), PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.02)
+        stats = scheduler.stats()
+        await asyncio.gather(running, interactive, *background)
+        return stats
+
+    stats = run(server, scenario)
+    assert [body['messages'][-1]['content'] for body in server.requests] == [
+        'running', 'chat', 'batch 0', 'batch 1', 'batch 2'
+    ]
+    # Queue depth is visible while calls wait
+    assert stats['queue_depth'] == 4
+    assert stats['queued'] == {'interactive': 1, 'background': 3}
+    waits = scheduler.stats()['wait']
+    assert waits['interactive']['admitted'] == 1
+    assert waits['background']['max_wait'] >= 0.3
+
+
+def test_token_budget_delays_calls(server):
+    # 6000 tokens a minute is 100 a second
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=6000)
+    server.usage_tokens = 6000
+
+    async def scenario(client):
+        await scheduler.run(completion(client, 'large'), tokens=6000)
+        started = time.monotonic()
+        await scheduler.run(completion(client, 'small'), tokens=30)
+        return time.monotonic() - started
+
+    assert run(server, scenario) >= 0.25
+
+
+def test_reported_usage_refunds_overestimates(server):
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=6000)
+    server.usage_tokens = 10
+
+    async def scenario(client):
+        # Charged 6000 at admission but only 10 were used, so the next call need not wait
+        await scheduler.run(completion(client, 'large'), tokens=6000)
+        started = time.monotonic()
+        await scheduler.run(completion(client, 'small'), tokens=30)
+        return time.monotonic() - started
+
+    assert run(server, scenario) < 0.2
+
+
+def test_streams_hold_their_slot_until_closed(server):
+    scheduler = LLMScheduler(requests_per_minute=0, tokens_per_minute=0, max_concurrency=1)
+
+    async def scenario(client):
+        order = []
+
+        async def stream():
+            text = ''
+            async for chunk in scheduler.stream(completion(client, 'one two three', stream=True)):
+                text += chunk.choices[0].delta.content
+            order.append('stream')
+            return text
+
+        async def call():
+            await asyncio.sleep(0.01)
+            await scheduler.run(completion(client, 'after'))
+            order.append('call')
+
+        text, _ = await asyncio.gather(stream(), call())
+        return text, order
+
+    text, order = run(server, scenario)
+    assert text == 'echo: one two three '
+    assert order == ['stream', 'call']
+    assert scheduler.stats()['active'] == 0
@@ -0,0 +1,143 @@
+import asyncio
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+
+import httpx
+
+from app.services.github_client import AsyncGitHubClient
+from app.services.snapshot_backend import SnapshotArchive, SnapshotStore
+
+COMMIT = 'f' * 40
+PREFIX = f'octo-demo-{COMMIT[:7]}'
+FILES = {
+    'README.md': b'# Demo\n',
+    'src/app.py': b'print("hello")\n',
+    'src/pkg/big.bin': os.urandom(3 * 1024 * 1024 + 17),
+    'bin/run.sh': b'#!/bin/sh\necho run\n',
+}
+
+
+def git_hash(data):
+    """What `git hash-object` prints for these bytes"""
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def make_tarball():
+    """A gzipped tarball laid out like GitHub's /tarball archives"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as tar:
+        # GitHub archives start with a pax header carrying the commit
+        tar.addfile(tarfile.TarInfo('pax_global_header'))
+        for directory in (PREFIX, f'{PREFIX}/src', f'{PREFIX}/src/pkg', f'{PREFIX}/bin', f'{PREFIX}/empty'):
+            info = tarfile.TarInfo(directory)
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+        for path, data in FILES.items():
+            info = tarfile.TarInfo(f'{PREFIX}/{path}')
+            info.size = len(data)
+            info.mode = 0o755 if path.endswith('.sh') else 0o644
+            tar.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo(f'{PREFIX}/latest')
+        link.type = tarfile.SYMTYPE
+        link.linkname = 'src/app.py'
+        tar.addfile(link)
+    return gzip.compress(buffer.getvalue())
+
+
+def test_build_indexes_files_dirs_and_symlinks(tmp_path):
+    tarball = tmp_path / 'demo.tar.gz'
+    tarball.write_bytes(make_tarball())
+    archive = SnapshotArchive.build(str(tarball), str(tmp_path / 'snapshots'), COMMIT)
+
+    assert archive.commit_sha == COMMIT
+    assert set(archive.dirs) == {'src', 'src/pkg', 'bin', 'empty'}
+    for path, data in FILES.items():
+        assert archive.read_file(path) == data
+        assert archive.files[path][1] == len(data)
+        assert archive.files[path][2] == git_hash(data)
+    assert archive.files['bin/run.sh'][3] == '100755'
+    assert archive.files['src/app.py'][3] == '100644'
+    assert archive.files['latest'][2:4] == [git_hash(b'src/app.py'), '120000']
+    assert archive.read_file('latest') == b'src/app.py'
+    assert archive.read_file('missing.txt') is None
+
+
+def test_read_range_seeks_into_the_archive(tmp_path):
+    tarball = tmp_path / 'demo.tar.gz'
+    tarball.write_bytes(make_tarball())
+    archive = SnapshotArchive.build(str(tarball), str(tmp_path), COMMIT)
+    big = FILES['src/pkg/big.bin']
+
+    assert archive.read_range('src/pkg/big.bin', 1024 * 1024 - 5, 1024 * 1024 + 5) == big[1024 * 1024 - 5:1024 * 1024 + 5]
+    assert archive.read_range('src/pkg/big.bin', len(big) - 3, len(big) + 100) == big[-3:]
+    assert archive.read_range('latest', 4, 100) == b'app.py'
+
+
+def test_tree_entries_match_the_git_tree_api_shape(tmp_path):
+    tarball = tmp_path / 'demo.tar.gz'
+    tarball.write_bytes(make_tarball())
+    entries = SnapshotArchive.build(str(tarball), str(tmp_path), COMMIT).tree_entries()
+
+    assert [entry['path'] for entry in entries] == sorted(entry['path'] for entry in entries)
+    by_path = {entry['path']: entry for entry in entries}
+    assert by_path['src/pkg'] == {'path': 'src/pkg', 'type': 'tree', 'mode': '040000', 'sha': None}
+    assert by_path['README.md'] == {
+        'path': 'README.md', 'type': 'blob', 'mode': '100644', 'sha': git_hash(FILES['README.md']), 'size': 7
+    }
+
+
+def test_open_reuses_a_built_snapshot(tmp_path):
+    tarball = tmp_path / 'demo.tar.gz'
+    tarball.write_bytes(make_tarball())
+    built = SnapshotArchive.build(str(tarball), str(tmp_path), COMMIT)
+
+    reopened = SnapshotArchive.open(str(tmp_path), COMMIT)
+    assert reopened.files == built.files
+    assert reopened.read_file('src/app.py') == FILES['src/app.py']
+    assert SnapshotArchive.open(str(tmp_path), 'e' * 40) is None
+
+
+def test_store_downloads_each_commit_once(tmp_path):
+    tarball = make_tarball()
+    downloads = []
+
+    def github(request):
+        assert request.url.path == f'/repos/octo/demo/tarball/{COMMIT}'
+        downloads.append(request.url.path)
+        return httpx.Response(200, content=tarball)
+
+    async def scenario():
+        client = AsyncGitHubClient(token=None, transport=httpx.MockTransport(github))
+        store = SnapshotStore(str(tmp_path))
+        try:
+            first, second = await asyncio.gather(
+                store.get('octo', 'demo', COMMIT, client),
+                store.get('octo', 'demo', COMMIT, client)
+            )
+            # A new store finds the snapshot on disk
+            third = await SnapshotStore(str(tmp_path)).get('octo', 'demo', COMMIT, client)
+        finally:
+            await client.aclose()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first is second
+    assert third.read_file('src/pkg/big.bin') == FILES['src/pkg/big.bin']
+    assert len(downloads) == 1
+    # Only the snapshot itself is left behind, no partial download
+    assert sorted(os.listdir(tmp_path / 'octo' / 'demo')) == [f'{COMMIT}.index.json', f'{COMMIT}.tar']
+
+
+def test_store_returns_none_when_the_download_fails(tmp_path):
+    async def scenario():
+        client = AsyncGitHubClient(token=None, transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+        try:
+            return await SnapshotStore(str(tmp_path)).get('octo', 'demo', COMMIT, client)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) is None
+    assert os.listdir(tmp_path / 'octo' / 'demo') == []
@@ -0,0 +1,183 @@
+from app.services.symbol_outline import (
+    MAX_SYMBOLS, LineIndex, build_outline, format_outline, outline_language
+)
+
+PYTHON = '''import os
+
+
+@decorator
+class Repo:
+    """A repository."""
+
+    def __init__(self, name):
+        self.name = name
+
+    async def fetch(self):
+        def helper():
+            return 1
+        return helper()
+
+
+def main():
+    if True:
+        pass
+'''
+
+TYPESCRIPT = '''import x from "y";
+
+export class Client extends Base {
+  constructor(token) {
+    super();
+  }
+
+  async get(path) {
+    if (path) {
+      return fetch(path);
+    }
+  }
+}
+
+export function connect(url) {
+  return new Client(url);
+}
+
+const retry = async (fn) => {
+  return fn();
+};
+
+export interface Options {
+  timeout: number;
+}
+
+type Handler = (req: Request) => void;
+'''
+
+GO = '''package main
+
+type Server struct {
+	addr string
+}
+
+type Handler interface {
+	Serve()
+}
+
+func (s *Server) Start() error {
+	return nil
+}
+
+func main() {
+	s := &Server{}
+	s.Start()
+}
+'''
+
+JAVA = '''package demo;
+
+public class Repo {
+    private final String name;
+
+    public Repo(String name) {
+        this.name = name;
+    }
+
+    public List<String> files() throws IOException {
+        if (name != null) {
+            return List.of();
+        }
+        return null;
+    }
+
+    enum Kind { FILE, DIR }
+}
+'''
+
+
+def summary(text, language):
+    return [(s['name'], s['kind'], s['line'], s['parent'], s['depth']) for s in build_outline(text, language)['symbols']]
+
+
+def test_python_nesting_follows_indentation():
+    assert summary(PYTHON, 'py') == [
+        ('Repo', 'class', 5, None, 0),
+        ('__init__', 'method', 8, 'Repo', 1),
+        ('fetch', 'method', 11, 'Repo', 1),
+        ('helper', 'function', 12, 'fetch', 2),
+        ('main', 'function', 17, None, 0),
+    ]
+    assert build_outline(PYTHON, 'py')['symbols'][2]['signature'] == 'async def fetch(self):'
+
+
+def test_typescript_skips_control_flow_and_calls():
+    assert summary(TYPESCRIPT, 'js') == [
+        ('Client', 'class', 3, None, 0),
+        ('constructor', 'method', 4, 'Client', 1),
+        ('get', 'method', 8, 'Client', 1),
+        ('connect', 'function', 15, None, 0),
+        ('retry', 'function', 19, None, 0),
+        ('Options', 'interface', 23, None, 0),
+        ('Handler', 'type', 27, None, 0),
+    ]
+
+
+def test_go_methods_belong_to_their_receiver():
+    assert summary(GO, 'go') == [
+        ('Server', 'struct', 3, None, 0),
+        ('Handler', 'interface', 7, None, 0),
+        ('Start', 'method', 11, 'Server', 0),
+        ('main', 'function', 15, None, 0),
+    ]
+
+
+def test_java_members_and_nested_types():
+    assert summary(JAVA, 'java') == [
+        ('Repo', 'class', 3, None, 0),
+        ('Repo', 'method', 6, 'Repo', 1),
+        ('files', 'method', 10, 'Repo', 1),
+        ('Kind', 'enum', 17, 'Repo', 1),
+    ]
+
+
+def test_files_that_do_not_compile_still_get_an_outline():
+    broken = 'def ok():\n    return (\n\nclass Later:\n    def method(self):\n'
+    assert summary(broken, 'py') == [
+        ('ok', 'function', 1, None, 0),
+        ('Later', 'class', 4, None, 0),
+        ('method', 'method', 5, 'Later', 1),
+    ]
+
+
+def test_symbol_count_is_capped():
+    text = ''.join(f'def f{i}():\n    pass\n' for i in range(MAX_SYMBOLS + 10))
+    outline = build_outline(text, 'py')
+    assert len(outline['symbols']) == MAX_SYMBOLS
+    assert outline['truncated']
+    assert outline['symbols'][-1]['line'] == 2 * MAX_SYMBOLS - 1
+
+
+def test_outline_language_by_extension():
+    assert outline_language('src/app.py') == 'py'
+    assert outline_language('web/App.TSX') == 'js'
+    assert outline_language('cmd/main.go') == 'go'
+    assert outline_language('Main.java') == 'java'
+    assert outline_language('README.md') is None
+    assert outline_language('Makefile') is None
+    assert outline_language('.config/py') is None
+
+
+def test_format_outline_indents_and_cuts():
+    symbols = build_outline(PYTHON, 'py')['symbols']
+    assert format_outline(symbols).splitlines()[:3] == [
+        '5: class Repo:',
+        '  8: def __init__(self, name):',
+        '  11: async def fetch(self):',
+    ]
+    cut = format_outline(symbols, max_chars=46)
+    assert cut == '5: class Repo:\n  8: def __init__(self, name):\n...'
+
+
+def test_line_index_maps_offsets_to_lines():
+    lines = LineIndex('a\nbb\n\nccc')
+    assert len(lines) == 4
+    assert [lines.line_of(offset) for offset in (0, 1, 2, 4, 5, 6, 9)] == [1, 1, 2, 2, 3, 4, 4]
+    assert [lines.line(n) for n in (1, 2, 3)] == ['a', 'bb', '']